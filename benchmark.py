@@ -0,0 +1,525 @@
+# benchmark.py
+
+"""
+Micro-benchmarks for the hardware server hot paths.
+Runs without hardware, using the simulation-mode SLMManager or the simulated
+SLM/stage backends (sim_hardware.py).
+
+Usage:
+    python benchmark.py ingest [--frames 200]
+    python benchmark.py phase2gray [--frames 50]
+    python benchmark.py transport [--frames 200]
+    python benchmark.py encoding [--frames 50]
+    python benchmark.py e2e [--frames 50] [--json results.json]
+    python benchmark.py contention [--frames 200]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import config
+from hardware import SLMManager
+
+
+def _time_per_frame(fn, frames):
+    """Run fn(i) for every frame index, return (seconds per frame, bytes allocated per frame)"""
+    fn(0)  # warm up
+    tracemalloc.start()
+    start_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    for i in range(frames):
+        fn(i)
+    elapsed = time.perf_counter() - t0
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / frames, max(peak_bytes - start_bytes, 0)
+
+
+@contextlib.contextmanager
+def _count_copies():
+    """
+    Count the bytes copied by np.copyto and np.array while active.
+
+    Yields a dict whose 'bytes' grows by the size of every destination written
+    by np.copyto and every np.array result that does not share memory with its
+    input (views and np.frombuffer wraps are free).
+    """
+    counter = {'bytes': 0}
+    copyto, array = np.copyto, np.array
+
+    def counting_copyto(dst, src, *args, **kwargs):
+        copyto(dst, src, *args, **kwargs)
+        counter['bytes'] += dst.nbytes
+
+    def counting_array(obj, *args, **kwargs):
+        result = array(obj, *args, **kwargs)
+        if not (isinstance(obj, np.ndarray) and np.shares_memory(result, obj)):
+            counter['bytes'] += result.nbytes
+        return result
+
+    np.copyto, np.array = counting_copyto, counting_array
+    try:
+        yield counter
+    finally:
+        np.copyto, np.array = copyto, array
+
+
+def bench_ingest(frames=200, shape=config.SLM_SHAPE):
+    """
+    Compare the legacy upload_frame ingestion against SLMManager.upload_bytes.
+
+    The legacy path wrapped the received bytes with np.frombuffer, then
+    SLM.set_phase copied them with np.array and again with np.copyto into the
+    display buffer. The new path copies the received buffer once into display.
+    Both go through SLMManager.upload with the simulation-mode display buffer,
+    so they carry the same bookkeeping; bytes copied are counted at the numpy
+    copy sites (see _count_copies), outside the timed loop.
+    """
+    manager = SLMManager(sim_mode=True)
+    rng = np.random.default_rng(0)
+    payloads = [rng.integers(0, 256, size=shape, dtype=np.uint8).tobytes() for _ in range(4)]
+    nbytes = len(payloads[0])
+
+    def legacy(i):
+        array = np.frombuffer(payloads[i % 4], dtype=np.uint8).reshape(shape)
+        manager.upload(np.array(array), verbose=False)
+
+    def zero_copy(i):
+        manager.upload_bytes(payloads[i % 4], shape, 'uint8', verbose=False)
+
+    results = {}
+    for name, fn in (('legacy', legacy), ('upload_bytes', zero_copy)):
+        with _count_copies() as copied:
+            fn(0)
+        seconds, allocated = _time_per_frame(fn, frames)
+        results[name] = {
+            'ms_per_frame': seconds * 1e3,
+            'bytes_copied_per_frame': copied['bytes'],
+            'bytes_allocated_peak': allocated,
+            'MB_per_s': nbytes / seconds / 1e6,
+        }
+    assert results['upload_bytes']['bytes_copied_per_frame'] == nbytes, results['upload_bytes']
+
+    print(f"\nFrame ingestion, {shape} uint8 ({nbytes / 1e6:.2f} MB), {frames} frames")
+    for name, r in results.items():
+        print(f"  {name:>12}: {r['ms_per_frame']:7.3f} ms/frame, "
+              f"{r['bytes_copied_per_frame'] / 1e6:5.2f} MB copied, "
+              f"{r['bytes_allocated_peak'] / 1e6:5.2f} MB allocated, "
+              f"{r['MB_per_s']:8.1f} MB/s")
+    return results
+
+
+def _phase2gray_legacy(slm, phase, out):
+    """The np.amax/np.rint/np.mod implementation of SLM._phase2gray, kept as reference (mutates phase)."""
+    if slm.phase_scaling == 1:
+        factor = -(slm.bitresolution / 2 / np.pi)
+        phase *= factor
+        maximum = np.amax(phase)
+        if maximum >= 0:
+            toshift = slm.bitresolution * 2 * np.ceil(maximum / slm.bitresolution)
+            phase -= toshift
+        np.rint(phase, out=phase)
+        np.copyto(out, phase, casting="unsafe")
+        phase *= 1 / factor
+        out -= 1
+        if slm.bitresolution != 8 and slm.bitresolution != 16:
+            np.bitwise_and(out, int(slm.bitresolution - 1), out=out)
+    else:
+        factor = -(slm.bitresolution * slm.phase_scaling / 2 / np.pi)
+        phase *= factor
+        if np.amin(phase) <= -slm.bitresolution or np.amax(phase) > 0:
+            phase -= 1
+            np.mod(phase, slm.bitresolution * slm.phase_scaling, out=phase)
+            phase += slm.bitresolution * (1 - slm.phase_scaling)
+            if slm.phase_scaling > 1:
+                phase[phase < 0] = slm.bitresolution - 1
+        else:
+            phase += slm.bitresolution - 1
+        np.copyto(out, phase, casting="unsafe")
+        phase *= 1 / factor
+    return out
+
+
+def _make_slm(shape, phase_scaling):
+    """Hardware-free SLM with the given phase_scaling"""
+    from slm import SLM
+
+    class _BenchSLM(SLM):
+        def _set_phase_hw(self, display):
+            pass
+
+        def close(self):
+            pass
+
+    return _BenchSLM((shape[1], shape[0]), wav_um=1, wav_design_um=1 / phase_scaling)
+
+
+def bench_phase2gray(frames=50, shape=config.SLM_SHAPE):
+    """
+    Compare SLM._phase2gray (fixed-point index + gray-level table) against the
+    legacy float routine, and check that both agree for every phase_scaling branch.
+
+    Agreement is exact for phase_scaling == 1. Otherwise the table entries are
+    sampled at PHASE_LUT_OVERSAMPLING steps per gray level, so pixels within
+    half a step of a boundary differ: by one gray level at a rounding boundary,
+    or by the full jump at the phase_scaling > 1 truncation edge. Levels are
+    compared cyclically, as the top and bottom of the range both encode 2*pi.
+    Fails if the differences exceed these bounds.
+    """
+    rng = np.random.default_rng(0)
+    wrapped = rng.uniform(-20, 20, size=shape)           # forces the np.mod branch
+    in_range = rng.uniform(0, 2 * np.pi, size=shape)     # single-period data
+
+    results = {}
+    print(f"\n_phase2gray, {shape} float64, {frames} frames")
+    for phase_scaling in (1.0, 0.8, 1.25):
+        slm = _make_slm(shape, phase_scaling)
+        for label, data in (('wrapped', wrapped), ('in_range', in_range)):
+            legacy_out = _phase2gray_legacy(slm, data.copy(), np.zeros(shape, slm.dtype))
+            before = data.copy()
+            lut_out = slm._phase2gray(data, out=np.zeros(shape, slm.dtype))
+            assert np.array_equal(data, before), "_phase2gray mutated its input"
+
+            # Gray levels are cyclic with a period of bitresolution * phase_scaling.
+            period = slm.bitresolution * phase_scaling
+            diff = np.abs(lut_out.astype(float) - legacy_out.astype(float))
+            diff = np.rint(np.minimum(diff, np.abs(period - diff)))
+            results[f"s={phase_scaling}/{label}"] = r = {
+                'max_level_diff': int(diff.max()),
+                'mismatch_fraction': float(np.mean(diff > 0)),
+            }
+            if phase_scaling == 1:
+                assert r['max_level_diff'] == 0, f"{label}: {r} (expected exact agreement)"
+            else:
+                # One level at a rounding boundary, the truncated span plus one at the edge
+                max_diff = max(1, int(np.ceil(slm.bitresolution * (phase_scaling - 1))) + 1)
+                assert r['max_level_diff'] <= max_diff, f"{label}: {r} (expected <= {max_diff})"
+                # Only pixels within half a table step of a boundary may differ
+                assert r['mismatch_fraction'] <= 1 / slm.PHASE_LUT_OVERSAMPLING, f"{label}: {r}"
+
+        work = wrapped.copy()
+        out = np.zeros(shape, slm.dtype)
+        legacy_s, _ = _time_per_frame(lambda i: _phase2gray_legacy(slm, work, out), frames)
+        lut_s, _ = _time_per_frame(lambda i: slm._phase2gray(wrapped, out=out), frames)
+        wrapped32 = wrapped.astype(np.float32)
+        lut32_s, _ = _time_per_frame(lambda i: slm._phase2gray(wrapped32, out=out), frames)
+        results[f"s={phase_scaling}/timing"] = {
+            'legacy_ms': legacy_s * 1e3,
+            'lut_ms': lut_s * 1e3,
+            'lut_float32_ms': lut32_s * 1e3,
+        }
+        print(f"  phase_scaling={phase_scaling}: legacy {legacy_s * 1e3:7.2f} ms, "
+              f"LUT {lut_s * 1e3:7.2f} ms, LUT float32 {lut32_s * 1e3:7.2f} ms")
+        for label in ('wrapped', 'in_range'):
+            r = results[f"s={phase_scaling}/{label}"]
+            print(f"      {label:>8}: max diff {r['max_level_diff']} level(s), "
+                  f"{100 * r['mismatch_fraction']:.3f}% pixels differ")
+    return results
+
+
+def _start_local_server():
+    """Run HardwareService on simulated hardware in this process, on free loopback ports"""
+    import run_local_server
+    server = run_local_server.start_background_server(port=0, simulate=True)
+    return server, run_local_server
+
+
+def bench_transport(frames=200, shape=config.SLM_SHAPE):
+    """
+    Compare frame upload throughput over rpyc (upload_frame) and the raw frame
+    channel (stream_frame) on loopback, against a server on simulated hardware.
+    """
+    from client import HardwareClient
+
+    server, service = _start_local_server()
+    client = HardwareClient(port=server.port, encode_frames=False)
+    frame = np.random.default_rng(0).integers(0, 256, size=shape, dtype=np.uint8)
+    nbytes = frame.nbytes
+
+    def rpyc_upload(i):
+        client.call('upload_frame', frame.tobytes(), shape, frame.dtype.str)
+
+    def raw_ack(i):
+        client.stream_frame(frame)
+
+    def raw_pipelined(i):
+        # Only the last frame of the run waits for its ACK
+        client.stream_frame(frame, ack=(i == frames - 1))
+
+    results = {}
+    print(f"\nTransport, {shape} uint8 ({nbytes / 1e6:.2f} MB), {frames} frames, loopback")
+    try:
+        for name, fn in (('rpyc', rpyc_upload), ('raw', raw_ack), ('raw_no_ack', raw_pipelined)):
+            seconds, _ = _time_per_frame(fn, frames)
+            results[name] = {
+                'ms_per_frame': seconds * 1e3,
+                'frames_per_s': 1 / seconds,
+                'MB_per_s': nbytes / seconds / 1e6,
+            }
+            r = results[name]
+            print(f"  {name:>12}: {r['ms_per_frame']:7.3f} ms/frame, "
+                  f"{r['frames_per_s']:7.1f} frames/s, {r['MB_per_s']:8.1f} MB/s")
+    finally:
+        client.close()
+        server.close()
+        service.cleanup()
+    return results
+
+
+def bench_contention(frames=200, shape=config.SLM_SHAPE, deadline_s=60.0):
+    """
+    Encoded upload_frame and display_and_trigger from two clients at the same
+    time, against a server on simulated hardware. Both reach the SLM executor
+    (display_and_trigger runs its upload on it), so a lock held across the
+    executor hand-off deadlocks here; every call must finish within deadline_s.
+    """
+    import threading
+    from client import HardwareClient
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        server, service = _start_local_server()
+    clients = [HardwareClient(port=server.port, encode_frames=True) for _ in range(2)]
+    rng = np.random.default_rng(0)
+    payloads = [rng.integers(0, 256, size=shape, dtype=np.uint8) for _ in range(4)]
+    counts = {'upload_frame': 0, 'display_and_trigger': 0}
+    errors = []
+
+    def run(name, fn):
+        try:
+            for i in range(frames):
+                if not fn(payloads[i % 4]):
+                    raise RuntimeError(f"{name} failed at frame {i}")
+                counts[name] += 1
+        except Exception as e:
+            errors.append(e)
+
+    workers = [
+        threading.Thread(target=run, args=('upload_frame', clients[0].upload_frame), daemon=True),
+        threading.Thread(target=run, args=('display_and_trigger',
+                                           lambda f: clients[1].display_and_trigger(f, settle_s=0)),
+                         daemon=True),
+    ]
+    print(f"\nContention, {shape} uint8, {frames} encoded uploads + {frames} display_and_trigger")
+    try:
+        t0 = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(max(deadline_s - (time.perf_counter() - t0), 0))
+        elapsed = time.perf_counter() - t0
+        stuck = [w for w in workers if w.is_alive()]
+        assert not stuck, (f"Deadlock: {counts} after {elapsed:.1f} s, "
+                           f"SLM executor {service.global_slm_manager.executor.stats()}")
+        assert not errors, errors[0]
+        print(f"  {2 * frames} calls in {elapsed:.2f} s ({2 * frames / elapsed:.1f} calls/s)")
+        return dict(counts, seconds=elapsed)
+    finally:
+        if not any(w.is_alive() for w in workers):
+            with contextlib.redirect_stdout(io.StringIO()):
+                for client in clients:
+                    client.close()
+                server.close()
+                service.cleanup()
+
+
+def _sweep_frames(shape, frames, kind, rng):
+    """Synthetic sweep: a random hologram whose ROI window (or global offset) changes"""
+    base = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    n = config.COMMON_DEFAULTS['N']
+    cy = config.COMMON_DEFAULTS['roi_center_y']
+    cx = config.COMMON_DEFAULTS['roi_center_x']
+    window = (slice(cy - n // 2, cy + n // 2), slice(cx - n // 2, cx + n // 2))
+    for i in range(frames):
+        frame = base.copy()
+        if kind == 'roi':
+            frame[window] = rng.integers(0, 256, size=(n, n), dtype=np.uint8)
+        elif kind == 'roi_lens':
+            # Smooth phase change (e.g. a focus sweep) inside the ROI
+            y, x = np.ogrid[-n // 2:n // 2, -n // 2:n // 2]
+            frame[window] += ((x * x + y * y) * (i + 1) * 1e-4).astype(np.uint8)
+        elif kind == 'offset':
+            frame += np.uint8(i)
+        elif kind == 'random':
+            frame = rng.integers(0, 256, size=shape, dtype=np.uint8)
+        yield frame
+
+
+def bench_encoding(frames=50, shape=config.SLM_SHAPE):
+    """
+    Bytes on the wire and encode/decode time of frame_codec for sweep workloads,
+    checking that every decoded frame matches the original.
+    """
+    from frame_codec import FrameEncoder, FrameDecoder
+
+    rng = np.random.default_rng(0)
+    results = {}
+    print(f"\nFrame encoding, {shape} uint8, {frames} frames per workload")
+    for kind in ('roi', 'roi_lens', 'offset', 'random'):
+        encoder, decoder = FrameEncoder(), FrameDecoder()
+        encode_s = decode_s = 0.0
+        encodings = {}
+        for frame in _sweep_frames(shape, frames, kind, rng):
+            t0 = time.perf_counter()
+            payload, encoding, meta = encoder.encode(frame)
+            t1 = time.perf_counter()
+            decoded = decoder.decode(payload, frame.shape, frame.dtype.str, encoding, meta)
+            decode_s += time.perf_counter() - t1
+            encode_s += t1 - t0
+            assert np.array_equal(decoded, frame), f"{encoding} round trip failed"
+            encodings[encoding] = encodings.get(encoding, 0) + 1
+        stats = encoder.stats()
+        results[kind] = dict(stats, encode_ms=encode_s / frames * 1e3,
+                             decode_ms=decode_s / frames * 1e3, encodings=encodings)
+        print(f"  {kind:>9}: ratio {stats['ratio']:7.1f}x, "
+              f"encode {encode_s / frames * 1e3:6.2f} ms, decode {decode_s / frames * 1e3:6.2f} ms, "
+              f"{encodings}")
+    return results
+
+
+def _latency_stats(samples, elapsed):
+    """p50/p99/mean/max latency in ms and sustained rate of a run"""
+    samples = np.asarray(samples) * 1e3
+    return {
+        'n': len(samples),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'mean_ms': float(samples.mean()),
+        'max_ms': float(samples.max()),
+        'rate_per_s': len(samples) / elapsed,
+    }
+
+
+def _measure(fn, iterations, warmup=2):
+    """Latency of each fn(i) call and the sustained rate over all of them"""
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    t_start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return _latency_stats(samples, time.perf_counter() - t_start)
+
+
+def _use_slm(service, shape):
+    """Swap the server SLM for a simulated one of the given (height, width)"""
+    manager = SLMManager(simulate=True, shape=shape)
+    service.global_slm_manager = manager
+    service.global_sequence_player.slm_manager = manager
+    if service.global_frame_channel is not None:
+        service.global_frame_channel.slm_manager = manager
+    return manager
+
+
+def bench_e2e(frames=50, resolutions=((512, 512), (1024, 1024), config.SLM_SHAPE),
+              dtypes=('uint8', 'float32', 'float64'), stage_type=2):
+    """
+    End-to-end latency through HardwareService, on simulated hardware in-process.
+
+    Covers upload_frame over rpyc and the raw frame channel for each resolution
+    and dtype (uint8 frames are copied to the display, float frames are phase in
+    radians converted by _phase2gray), stage_get_position and stage_move_to round
+    trips, and an interleaved scan step (async move, upload, wait for the stage).
+    """
+    from client import HardwareClient
+
+    rng = np.random.default_rng(0)
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        server, service = _start_local_server()
+    client = HardwareClient(port=server.port, encode_frames=False)
+
+    def report(name, stats):
+        results[name] = stats
+        print(f"  {name:<44} p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms  "
+              f"{stats['rate_per_s']:8.1f} /s")
+
+    print(f"\nEnd-to-end through HardwareService (simulated hardware), {frames} iterations")
+    try:
+        for shape in resolutions:
+            with contextlib.redirect_stdout(io.StringIO()):
+                _use_slm(service, shape)
+            for dtype in dtypes:
+                if dtype == 'uint8':
+                    payloads = [rng.integers(0, 256, size=shape, dtype=np.uint8) for _ in range(4)]
+                else:
+                    payloads = [rng.uniform(0, 2 * np.pi, size=shape).astype(dtype) for _ in range(4)]
+                label = f"{shape[0]}x{shape[1]} {dtype}"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    rpyc_stats = _measure(lambda i: client.upload_frame(payloads[i % 4]), frames)
+                    raw_stats = _measure(lambda i: client.stream_frame(payloads[i % 4]), frames)
+                report(f"upload_frame {label}", rpyc_stats)
+                report(f"stream_frame {label}", raw_stats)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            _use_slm(service, config.SLM_SHAPE)
+            frame = rng.integers(0, 256, size=config.SLM_SHAPE, dtype=np.uint8)
+            step_um = 0.5
+            get_stats = _measure(lambda i: client.stage_get_position(stage_type), frames)
+            move_stats = _measure(
+                lambda i: client.stage_move_to((i % 2) * step_um * 1e-3, stage_type), frames
+            )
+
+            def scan_step(i):
+                client.stage_move_to_async((i % 2) * step_um * 1e-3, stage_type)
+                client.stream_frame(frame)
+                client.stage_wait_motion(stage_type)
+
+            def scan_step_serial(i):
+                client.stage_move_to((i % 2) * step_um * 1e-3, stage_type)
+                client.upload_frame(frame)
+
+            scan_stats = _measure(scan_step, frames)
+            serial_stats = _measure(scan_step_serial, frames)
+        report("stage_get_position", get_stats)
+        report(f"stage_move_to {step_um} um (move + settle)", move_stats)
+        report("scan step, overlapped (async move + stream)", scan_stats)
+        report("scan step, serial (move_to + upload_frame)", serial_stats)
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.close()
+            server.close()
+            service.cleanup()
+    return results
+
+
+BENCHMARKS = {
+    'ingest': bench_ingest,
+    'phase2gray': bench_phase2gray,
+    'transport': bench_transport,
+    'encoding': bench_encoding,
+    'e2e': bench_e2e,
+    'contention': bench_contention,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS) + ['all'])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--json', help="write the results to this file for trend tracking")
+    args = parser.parse_args()
+
+    names = sorted(BENCHMARKS) if args.benchmark == 'all' else [args.benchmark]
+    results = {name: BENCHMARKS[name](frames=args.frames) for name in names}
+
+    if args.json:
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'frames': args.frames,
+            'results': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
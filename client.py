@@ -0,0 +1,850 @@
+# client.py
+
+"""
+Client library for the hardware server (run_local_server.py).
+
+Keeps a pool of persistent rpyc connections to HardwareService. Every call leases
+one connection for its duration, so calls issued from different threads, or
+issued asynchronously, run in parallel on the server (which serves each
+connection in its own thread). Calls are retried on a fresh connection if the
+server dropped the previous one.
+
+Example:
+    with HardwareClient() as hw:
+        pending = hw.upload_frame_async(frame)
+        z = hw.stage_get_position(2)      # overlaps with the upload
+        pending.wait()
+"""
+
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import numpy as np
+import rpyc
+from rpyc.core.stream import SocketStream
+from rpyc.utils.factory import connect_stream
+from frame_channel import FrameChannelClient
+from frame_codec import FrameEncoder
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 18861
+# Hosts whose frame channel Unix socket (if any) is reachable from this machine
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+# rpyc reports a dropped connection as EOFError. Anything else, including
+# AsyncResultTimeout (a TimeoutError, hence an OSError) and OSErrors raised by
+# the server, may come from a call that ran, so it must not be retried.
+CONNECTION_ERRORS = (EOFError,)
+
+
+def _dropped(conn, error):
+    """True if ``error`` means ``conn`` is gone and the call can be re-issued"""
+    if isinstance(error, rpyc.AsyncResultTimeout):
+        return False
+    return isinstance(error, CONNECTION_ERRORS) or conn.closed
+
+
+def _local(value):
+    """Copy a dict returned by the server into a local dict (netrefs are remote proxies)"""
+    if isinstance(value, (type(None), bool, int, float, str, bytes, tuple)) or not hasattr(value, 'items'):
+        return value
+    return {k: _local(v) for k, v in value.items()}
+
+
+def _frame_args(frame):
+    """Raw bytes, shape and dtype string of an array, in the form upload_frame expects"""
+    frame = np.ascontiguousarray(frame)
+    return frame.tobytes(), tuple(frame.shape), frame.dtype.str
+
+
+def _schedule(value):
+    """Per-frame schedules must be tuples to be sent by value"""
+    if value is None or np.isscalar(value):
+        return value
+    return tuple(None if v is None else (tuple(v) if np.ndim(v) else v) for v in value)
+
+
+class ConnectionPool:
+    """Bounded pool of persistent rpyc connections to one server"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, size=4, request_timeout=300):
+        self.host = host
+        self.port = port
+        self.size = int(size)
+        self.config = {
+            'allow_public_attrs': True,
+            'sync_request_timeout': request_timeout,
+        }
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._connections = set()
+        self.reconnects = 0
+
+    def _connect(self):
+        # Small requests must not wait for delayed ACKs (Nagle adds ~40 ms per call)
+        stream = SocketStream.connect(self.host, self.port, nodelay=True, keepalive=True)
+        conn = connect_stream(stream, config=self.config)
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def acquire(self, timeout=None):
+        """
+        Lease a connection, opening one if no idle connection is available.
+
+        Args:
+            timeout: Maximum wait in seconds for a free slot, None to wait indefinitely
+
+        Returns:
+            rpyc.Connection: Connection to pass back to :meth:`release`
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No free connection in pool of {self.size}")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if not conn.closed:
+                    return conn
+                self._forget(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        """
+        Return a leased connection to the pool.
+
+        Args:
+            conn: Connection from :meth:`acquire`
+            broken: Close the connection instead of reusing it
+        """
+        try:
+            if broken or conn.closed:
+                self._forget(conn)
+                self.reconnects += 1
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def detach(self, conn):
+        """
+        Free the slot of a leased connection that still waits for a reply
+        (a timed-out PendingCall), so other calls can open a new connection.
+        Hand it back with :meth:`reattach` once the reply arrived.
+        """
+        self._slots.release()
+
+    def reattach(self, conn, broken=False):
+        """Return a connection given up with :meth:`detach`"""
+        if broken or conn.closed or self._idle.qsize() >= self.size:
+            self._forget(conn)
+        else:
+            self._idle.put(conn)
+
+    def _forget(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close every connection, leased ones included"""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+
+class PendingCall:
+    """
+    Handle of a call issued with ``rpyc.async_``.
+
+    The connection stays leased until the result has been collected with
+    :meth:`wait` (or :attr:`ready` turns True), so always collect results.
+    When :meth:`wait` times out the connection gives up its pool slot, so other
+    calls are not held up; the call can still be waited for again.
+    """
+
+    def __init__(self, client, name, args, kwargs, retry, resend=None):
+        self._client = client
+        self._name = name
+        self._args = args
+        self._kwargs = kwargs
+        self._resend = resend           # arguments to re-issue the call with once if it returns False
+        self._attempts_left = client.retries if retry else 0
+        self._conn = None
+        self._detached = False          # the pool slot was given up after a timeout
+        self._arrived = None            # set by the AsyncResult callback
+        self._async_result = None
+        self._done = False
+        self._value = None
+        self._error = None
+        self._issue()
+
+    def _issue(self):
+        pool = self._client.pool
+        while True:
+            conn = pool.acquire()
+            try:
+                method = getattr(conn.root, self._name)
+                arrived = threading.Event()
+                self._async_result = rpyc.async_(method)(*self._args, **self._kwargs)
+                self._async_result.add_callback(lambda result: arrived.set())
+                self._arrived = arrived
+                self._conn = conn
+                self._detached = False
+                return
+            except Exception as e:
+                if not _dropped(conn, e):
+                    pool.release(conn)
+                    raise
+                pool.release(conn, broken=True)
+                if self._attempts_left <= 0:
+                    raise
+                self._attempts_left -= 1
+                time.sleep(self._client.retry_delay)
+
+    def _release(self, broken=False):
+        if self._conn is None:
+            return
+        if self._detached:
+            self._client.pool.reattach(self._conn, broken)
+        else:
+            self._client.pool.release(self._conn, broken)
+        self._conn = None
+
+    def _finish(self):
+        """Collect the settled result, re-issuing the call if the connection dropped"""
+        try:
+            self._value = self._async_result.value
+        except Exception as e:
+            if not _dropped(self._conn, e):
+                self._error = e
+            else:
+                self._release(broken=True)
+                if self._attempts_left > 0:
+                    self._attempts_left -= 1
+                    time.sleep(self._client.retry_delay)
+                    self._issue()
+                    return False
+                self._error = e
+        else:
+            if self._value is False and self._resend is not None:
+                self._args, self._resend = self._resend, None
+                self._release()
+                self._issue()
+                return False
+        self._release()
+        self._done = True
+        return True
+
+    @property
+    def ready(self):
+        """True once the result (or error) is available"""
+        while not self._done:
+            try:
+                settled = self._async_result.ready
+            except CONNECTION_ERRORS:
+                settled = True
+            if not settled or not self._finish():
+                break
+        return self._done
+
+    def wait(self, timeout=None):
+        """
+        Block until the call returns.
+
+        Args:
+            timeout: Maximum wait in seconds, None to wait indefinitely
+
+        Returns:
+            Return value of the exposed method (dicts are copied locally)
+
+        Raises:
+            TimeoutError: If the call did not return in time
+            Exception: Whatever the server call raised
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self._done:
+            # Wait on our own event: expiring the shared AsyncResult would drop the reply
+            arrived = self._arrived
+            try:
+                while not arrived.is_set():
+                    remaining = 1.0 if deadline is None else deadline - time.perf_counter()
+                    if remaining <= 0:
+                        if not self._detached:
+                            self._client.pool.detach(self._conn)
+                            self._detached = True
+                        raise TimeoutError(f"{self._name} did not return within {timeout} s")
+                    self._conn.serve(remaining, waiting=lambda: not arrived.is_set())
+            except EOFError:
+                pass
+            self._finish()
+        if self._error is not None:
+            raise self._error
+        return _local(self._value)
+
+
+class EventSubscription:
+    """
+    Server events delivered to a callback, on a dedicated connection served by
+    a background thread. Close it (or use it as a context manager) to unsubscribe.
+    """
+
+    def __init__(self, pool, callback, topics=None, max_pending=1000):
+        self.callback = callback
+        self._pool = pool
+        self._conn = pool._connect()
+        self._thread = rpyc.BgServingThread(self._conn)
+        topics = None if topics is None else tuple(topics)
+        self.id = self._conn.root.subscribe(topics, self._deliver, max_pending)
+
+    def _deliver(self, events_json):
+        # Called by the server with a JSON batch; runs in the serving thread
+        for event in json.loads(events_json):
+            self.callback(event)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._conn.closed:
+            return
+        try:
+            self._conn.root.unsubscribe(self.id)
+        except CONNECTION_ERRORS:
+            pass
+        self._thread.stop()
+        self._pool._forget(self._conn)
+
+
+class HardwareClient:
+    """
+    Typed client for HardwareService.
+
+    Each method mirrors the ``exposed_`` method of the same name and returns its
+    value. ``upload_frame_async``, ``display_frame_async`` and
+    ``stage_get_position_async`` return a :class:`PendingCall` immediately;
+    ``stage_move_to_async``/``stage_home_async`` mirror the server methods that
+    start a motion and return, to be followed by ``stage_wait_motion``.
+
+    Calls to a device that is still initializing, or failed to, raise the
+    server's DeviceNotReady (see :meth:`get_readiness` and :meth:`retry_device`).
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, pool_size=4,
+                 retries=2, retry_delay=0.5, request_timeout=300, encode_frames=False):
+        """
+        Args:
+            host: Server address
+            port: Server port
+            pool_size: Maximum number of concurrent connections (and in-flight calls)
+            retries: Reconnect attempts per call after a dropped connection
+            retry_delay: Pause in seconds before reconnecting
+            request_timeout: Server-side time limit of one call in seconds
+                (homing and sequence playback can take minutes)
+            encode_frames: Send upload_frame payloads delta-encoded/compressed
+                (see frame_codec.py) instead of raw. Pays off on slow links with
+                similar consecutive frames.
+        """
+        self.pool = ConnectionPool(host, port, pool_size, request_timeout)
+        self.retries = int(retries)
+        self.retry_delay = retry_delay
+        self._frame_channel = None
+        self._frame_channel_lock = threading.Lock()
+        self.encoder = FrameEncoder() if encode_frames else None
+        # Selects this client's decoder on the server, whichever connection is used
+        self._stream = uuid.uuid4().hex
+        self._encoder_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Close all pooled connections and the frame channel"""
+        with self._frame_channel_lock:
+            if self._frame_channel is not None:
+                self._frame_channel.close()
+                self._frame_channel = None
+        self.pool.close()
+
+    def call(self, name, *args, retry=True, **kwargs):
+        """
+        Call an exposed method by name and wait for its result.
+
+        Args:
+            name: Method name without the ``exposed_`` prefix
+            retry: Reconnect and call again if the connection dropped. Disable for
+                calls that must not run twice (e.g. clicks).
+
+        Returns:
+            Return value of the exposed method (dicts are copied locally)
+        """
+        attempts_left = self.retries if retry else 0
+        while True:
+            conn = self.pool.acquire()
+            try:
+                value = _local(getattr(conn.root, name)(*args, **kwargs))
+            except Exception as e:
+                if not _dropped(conn, e):
+                    # A timed out call may still answer later, so the connection is not reused
+                    self.pool.release(conn, broken=isinstance(e, rpyc.AsyncResultTimeout))
+                    raise
+                self.pool.release(conn, broken=True)
+                if attempts_left <= 0:
+                    raise
+                attempts_left -= 1
+                time.sleep(self.retry_delay)
+                continue
+            except BaseException:
+                self.pool.release(conn)
+                raise
+            self.pool.release(conn)
+            return value
+
+    def call_async(self, name, *args, retry=True, **kwargs):
+        """
+        Issue an exposed method call without waiting for it.
+
+        Returns:
+            PendingCall: Handle whose :meth:`PendingCall.wait` returns the result
+        """
+        return PendingCall(self, name, args, kwargs, retry)
+
+    def ping(self):
+        """True if the server answers"""
+        try:
+            conn = self.pool.acquire(timeout=5)
+        except (TimeoutError, *CONNECTION_ERRORS):
+            return False
+        try:
+            conn.ping(timeout=5)
+        except Exception:
+            self.pool.release(conn, broken=True)
+            return False
+        self.pool.release(conn)
+        return True
+
+    # ============== SLM Functions ==============
+    def _encoded_frame_args(self, frame):
+        """upload_frame arguments, encoded against the previous frame if enabled"""
+        if self.encoder is None:
+            return _frame_args(frame)
+        frame = np.ascontiguousarray(frame)
+        payload, encoding, meta = self.encoder.encode(frame)
+        meta['stream'] = self._stream
+        return payload, tuple(frame.shape), frame.dtype.str, encoding, tuple(meta.items())
+
+    def _full_frame_args(self, frame, args):
+        """
+        upload_frame arguments sending ``frame`` in full, to replace the encoded
+        ``args`` if the server rejects them. The encoder state is left alone: the
+        frame stays the base of the next delta either way.
+        """
+        meta = dict(args[4])
+        full_meta = (('crc', meta['crc']), ('stream', self._stream))
+        return _frame_args(frame) + ('full', full_meta)
+
+    def upload_frame(self, frame: np.ndarray) -> bool:
+        """
+        Upload a frame to the SLM.
+
+        With frame encoding on, a rejected delta (the server holds another base
+        frame, e.g. after a restart) is retried once as a full frame.
+        """
+        with self._encoder_lock:
+            if self.call('upload_frame', *self._encoded_frame_args(frame)):
+                return True
+            if self.encoder is None:
+                return False
+            self.encoder.reset()
+            return self.call('upload_frame', *self._encoded_frame_args(frame))
+
+    def upload_frame_async(self, frame: np.ndarray) -> PendingCall:
+        """
+        Upload a frame without waiting for the SLM write.
+
+        With frame encoding on, a rejected delta is resent as a full frame before
+        the call completes. Encoded frames must be applied in order, so wait for
+        this call before uploading the next frame; a False result means the frame
+        was not shown.
+        """
+        with self._encoder_lock:
+            args = self._encoded_frame_args(frame)
+            if self.encoder is None or args[3].startswith('full'):
+                return self.call_async('upload_frame', *args)
+            return PendingCall(self, 'upload_frame', args, {}, True,
+                               resend=self._full_frame_args(frame, args))
+
+    def frame_encoding_stats(self) -> dict:
+        """Bytes before and after encoding on this client, None if encoding is off"""
+        return None if self.encoder is None else self.encoder.stats()
+
+    def frame_codec_stats(self) -> dict:
+        """Server-side counters of encoded uploads"""
+        return self.call('frame_codec_stats')
+
+    def frame_channel_info(self) -> dict:
+        """Parameters of the raw frame channel, None if the server has none"""
+        return self.call('frame_channel_info')
+
+    def stream_frame(self, frame: np.ndarray, ack: bool = True) -> int:
+        """
+        Upload a frame over the raw frame channel instead of rpyc.
+
+        The channel is opened on first use and reopened once if it was dropped.
+        Clients on the server's machine use its Unix socket when it has one.
+
+        Args:
+            frame: Frame to display
+            ack: Wait until the server handed the frame to the SLM
+
+        Returns:
+            int: Sequence id of the frame
+        """
+        with self._frame_channel_lock:
+            for attempt in range(2):
+                if self._frame_channel is None:
+                    info = self.frame_channel_info()
+                    if info is None:
+                        raise ConnectionError("Server has no frame channel")
+                    unix_path = info['unix_path']
+                    if self.pool.host not in LOCAL_HOSTS or not (unix_path and os.path.exists(unix_path)):
+                        unix_path = None
+                    self._frame_channel = FrameChannelClient(self.pool.host, info['port'], unix_path)
+                try:
+                    return self._frame_channel.send_frame(frame, ack)
+                except (EOFError, OSError):
+                    self._frame_channel.close()
+                    self._frame_channel = None
+                    if attempt:
+                        raise
+
+    def register_frame(self, frame: np.ndarray) -> str:
+        """Store a frame in the server frame cache, returns its digest"""
+        return self.call('register_frame', *_frame_args(frame))
+
+    def display_frame(self, digest: str) -> bool:
+        """Display a cached frame, False if it is not cached"""
+        return self.call('display_frame', digest)
+
+    def display_frame_async(self, digest: str) -> PendingCall:
+        return self.call_async('display_frame', digest)
+
+    def has_frame(self, digest: str) -> bool:
+        return self.call('has_frame', digest)
+
+    def frame_cache_stats(self) -> dict:
+        return self.call('frame_cache_stats')
+
+    # ============== Pattern generation ==============
+    def generate_pattern(self, pattern_type: str, display: bool = True, **params) -> str:
+        """
+        Have the server compute and (optionally) display a pattern, e.g.
+        ``generate_pattern('microlens', M=7, focal_length=0.06)``.
+
+        Returns:
+            str: Frame cache digest of the pattern, or None on error
+        """
+        params = dict(params, type=pattern_type)
+        return self.call('generate_pattern', tuple(params.items()), display)
+
+    def pattern_types(self) -> dict:
+        return self.call('pattern_types')
+
+    # ============== Display-then-trigger ==============
+    def set_trigger(self, spec=None):
+        """Default trigger of display_and_trigger: None/'none' or ('click', x, y)"""
+        return self.call('set_trigger', spec)
+
+    def display_and_trigger(self, frame: np.ndarray, trigger=None, settle_s: float = None) -> dict:
+        """
+        Display a frame and fire the trigger once the SLM has settled, on the server.
+
+        Returns:
+            dict: Server-side timings including jitter_s, or None on error
+        """
+        with self._encoder_lock:
+            for attempt in range(2):
+                args = self._encoded_frame_args(frame)
+                data_bytes, shape, dtype_str = args[:3]
+                encoding, meta = args[3:] or (None, None)
+                result = self.call('display_and_trigger', data_bytes, shape, dtype_str,
+                                   trigger, settle_s, encoding, meta, retry=False)
+                if result is not None or self.encoder is None:
+                    return result
+                # Possibly a rejected delta, resend in full
+                self.encoder.reset()
+            return None
+
+    def display_frame_and_trigger(self, digest: str, trigger=None, settle_s: float = None) -> dict:
+        """display_and_trigger for a frame registered with register_frame"""
+        return self.call('display_frame_and_trigger', digest, trigger, settle_s, retry=False)
+
+    def frame_cache_clear(self) -> bool:
+        return self.call('frame_cache_clear')
+
+    # ============== Sequence Functions ==============
+    def upload_sequence(self, frames: np.ndarray) -> str:
+        """Upload an N x H x W frame stack, returns the sequence id"""
+        return self.call('upload_sequence', *_frame_args(frames))
+
+    def play_sequence(self, sequence_id: str, dwell_s=0.0, positions=None, clicks=None,
+                      stage_type: int = 2, timeout: int = 60000, wait: bool = True,
+                      timeout_s: float = None):
+        """Play a stored sequence, see HardwareService.exposed_play_sequence"""
+        return self.call('play_sequence', sequence_id, _schedule(dwell_s), _schedule(positions),
+                         _schedule(clicks), stage_type, timeout, wait, timeout_s, retry=False)
+
+    def sequence_result(self) -> dict:
+        return self.call('sequence_result')
+
+    def sequence_is_playing(self) -> bool:
+        return self.call('sequence_is_playing')
+
+    def stop_sequence(self) -> bool:
+        return self.call('stop_sequence')
+
+    def delete_sequence(self, sequence_id: str) -> bool:
+        return self.call('delete_sequence', sequence_id)
+
+    # ============== Scans ==============
+    def scan_plan(self, spec: dict) -> dict:
+        """Planned visiting order of a scan spec (see scan.py): scan_id, path, total, positions"""
+        return self.call('scan_plan', json.dumps(spec))
+
+    def scan_start(self, spec: dict, resume: bool = False, wait: bool = False) -> dict:
+        """Start a server-side scan; with resume, continue the checkpoint of the same spec"""
+        return self.call('scan_start', json.dumps(spec), resume, wait, retry=False)
+
+    def scan_resume(self, scan_id: str = None, wait: bool = False) -> dict:
+        return self.call('scan_resume', scan_id, wait, retry=False)
+
+    def scan_status(self, since: int = 0) -> dict:
+        """Scan progress; pass the last seen point count as since to get only new points"""
+        return self.call('scan_status', since)
+
+    def scan_stop(self) -> bool:
+        return self.call('scan_stop', retry=False)
+
+    def scan_progress(self, poll_s: float = 0.2):
+        """Yield per-point records of the running scan as they complete, until it ends"""
+        seen = 0
+        while True:
+            status = self.scan_status(seen)
+            if status is None:
+                return
+            for point in status['points']:
+                seen = point[0] + 1
+                yield point
+            if status['state'] != 'running':
+                return
+            time.sleep(poll_s)
+
+    # ============== Frame Banks ==============
+    def register_frame_bank(self, path: str, name: str = None, frame_shape=None,
+                            dtype_str: str = '|u1', offset: int = 0) -> dict:
+        """Map a frame file on the server's disk; the name also works with play_sequence"""
+        frame_shape = None if frame_shape is None else tuple(int(s) for s in frame_shape)
+        return self.call('register_frame_bank', path, name, frame_shape, dtype_str, offset)
+
+    def display_bank_frame(self, name: str, index: int) -> bool:
+        return self.call('display_bank_frame', name, int(index))
+
+    def display_bank_frame_async(self, name: str, index: int) -> PendingCall:
+        return self.call_async('display_bank_frame', name, int(index))
+
+    def list_frame_banks(self) -> dict:
+        return self.call('list_frame_banks')
+
+    def unregister_frame_bank(self, name: str) -> bool:
+        return self.call('unregister_frame_bank', name)
+
+    # ============== Stage Functions ==============
+    def stage_connect(self, stage_type: int = 2) -> bool:
+        return self.call('stage_connect', stage_type)
+
+    def stage_home(self, stage_type: int = 2, timeout: int = 60000, timeout_s: float = None) -> bool:
+        """Home the stage; timeout in ms, or timeout_s in seconds if given"""
+        return self.call('stage_home', stage_type, timeout, timeout_s)
+
+    def stage_get_position(self, stage_type: int = 2, max_age: float = None) -> float:
+        """Position from the server's status cache; max_age=0 forces a device read"""
+        return self.call('stage_get_position', stage_type, max_age)
+
+    def stage_get_position_async(self, stage_type: int = 2) -> PendingCall:
+        return self.call_async('stage_get_position', stage_type)
+
+    def stage_status(self, stage_type: int = 2, max_age: float = None) -> dict:
+        """Cached status: position, moving, homing, homed, velocity, timestamp, age"""
+        return self.call('stage_status', stage_type, max_age)
+
+    def stage_status_all(self) -> dict:
+        """Cached status of all stages in one round trip: stage type -> status or None"""
+        return self.call('stage_status_all')
+
+    def stage_set_polling(self, polling_ms: int, stage_type: int = 2) -> bool:
+        return self.call('stage_set_polling', int(polling_ms), stage_type)
+
+    def stage_move_to(self, position: float, stage_type: int = 2, timeout: int = 60000,
+                      timeout_s: float = None) -> bool:
+        """Move and wait; timeout in ms, or timeout_s in seconds if given"""
+        return self.call('stage_move_to', float(position), stage_type, timeout, timeout_s)
+
+    def stage_move_to_async(self, position: float, stage_type: int = 2, timeout_s: float = None) -> bool:
+        """Start a move on the server and return at once (see stage_wait_motion)"""
+        return self.call('stage_move_to_async', float(position), stage_type, timeout_s)
+
+    def stage_home_async(self, stage_type: int = 2, timeout_s: float = None) -> bool:
+        return self.call('stage_home_async', stage_type, timeout_s)
+
+    def stage_motion_done(self, stage_type: int = 2) -> bool:
+        return self.call('stage_motion_done', stage_type)
+
+    def stage_wait_motion(self, stage_type: int = 2, timeout_s: float = None, timeout: float = None) -> dict:
+        """Block until the server-side motion ends; dict with done, state, cancelled, duration, position"""
+        return self.call('stage_wait_motion', stage_type, timeout if timeout_s is None else timeout_s)
+
+    def stages_move_many(self, targets: dict, timeout_s: float = 60.0, wait: str = 'all',
+                         timeout: float = None) -> dict:
+        """
+        Move several stages concurrently in one call, e.g. {1: 45.0, 2: 3.2}.
+        Returns completed, elapsed and per-axis target/done/state/cancelled/duration/position.
+        """
+        pairs = tuple((int(stage_type), float(position)) for stage_type, position in targets.items())
+        return self.call('stages_move_many', pairs, timeout_s if timeout is None else timeout,
+                         wait, retry=False)
+
+    def stage_stop(self, stage_type: int = 2) -> bool:
+        return self.call('stage_stop', stage_type, retry=False)
+
+    def stage_disconnect(self, stage_type: int = 2) -> bool:
+        return self.call('stage_disconnect', stage_type)
+
+    def stage_is_connected(self, stage_type: int = 2) -> bool:
+        return self.call('stage_is_connected', stage_type)
+
+    # ============== AHK Functions ==============
+    def ahk_capture_position(self, timeout: float = None):
+        """Wait for a click on the server screen; returns the captured (x, y) or None"""
+        return self.call('ahk_capture_position', timeout, retry=False)
+
+    def ahk_click_at(self, x: int, y: int) -> bool:
+        return self.call('ahk_click_at', int(x), int(y), retry=False)
+
+    def ahk_get_config(self) -> dict:
+        return self.call('ahk_get_config')
+
+    # ============== Startup ==============
+    def get_readiness(self) -> dict:
+        """Initialization state per device: {name: {'state', 'error', 'seconds'}}"""
+        return self.call('get_readiness')
+
+    def wait_ready(self, devices=None, timeout: float = 60.0, poll_s: float = 0.1) -> dict:
+        """
+        Poll until the given devices (default: all) finished initializing.
+
+        Returns:
+            dict: Final readiness; check each 'state' for 'ready' or 'failed'
+
+        Raises:
+            TimeoutError: If a device is still initializing at the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            readiness = self.get_readiness()
+            names = readiness if devices is None else devices
+            if all(readiness.get(n, {}).get('state') in ('ready', 'failed') for n in names):
+                return readiness
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Devices still initializing: {readiness}")
+            time.sleep(poll_s)
+
+    def retry_device(self, name: str) -> tuple:
+        """
+        Initialize a failed device again, with the failed devices depending on it.
+        Follow up with :meth:`wait_ready`.
+
+        Returns:
+            tuple: Restarted device names, None if ``name`` is unknown or did not fail
+        """
+        return self.call('retry_device', name)
+
+    # ============== Device executors ==============
+    def executor_stats(self) -> dict:
+        """Queue depth and counters of the server's per-device command executors"""
+        return self.call('executor_stats')
+
+    # ============== Events ==============
+    def subscribe(self, callback, topics=None, max_pending: int = 1000) -> EventSubscription:
+        """
+        Call ``callback(event)`` for every server event on the given topic
+        prefixes (see events.py), e.g. ('stage.position', 'error'). Events are
+        dicts with topic, source, seq, time and topic-specific fields.
+        """
+        return EventSubscription(self.pool, callback, topics, max_pending)
+
+    def events(self, topics=None, poll_timeout: float = 1.0):
+        """Iterate over server events by long polling a dedicated connection (until closed)"""
+        conn = self.pool._connect()
+        sid = conn.root.subscribe(None if topics is None else tuple(topics))
+        try:
+            while True:
+                yield from json.loads(conn.root.poll_events(sid, poll_timeout))
+        finally:
+            try:
+                conn.root.unsubscribe(sid)
+            except CONNECTION_ERRORS:
+                pass
+            self.pool._forget(conn)
+
+    async def aevents(self, topics=None, poll_timeout: float = 1.0):
+        """Async iterator over server events; long polls run in the default executor"""
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(None, self.pool._connect)
+        sid = conn.root.subscribe(None if topics is None else tuple(topics))
+        try:
+            while True:
+                batch = await loop.run_in_executor(None, conn.root.poll_events, sid, poll_timeout)
+                for event in json.loads(batch):
+                    yield event
+        finally:
+            try:
+                conn.root.unsubscribe(sid)
+            except CONNECTION_ERRORS:
+                pass
+            self.pool._forget(conn)
+
+    def event_stats(self) -> dict:
+        return self.call('event_stats')
+
+    # ============== Metrics ==============
+    def get_metrics(self, fmt: str = 'dict'):
+        """Server latency histograms, counters and gauges; fmt='prometheus' for the text format"""
+        return self.call('get_metrics', fmt)
+
+    def reset_metrics(self):
+        return self.call('reset_metrics')
@@ -0,0 +1,264 @@
+# events.py
+
+"""
+Publish/subscribe bus for hardware events.
+
+Devices publish small JSON-compatible events; clients subscribe to topic
+prefixes instead of polling:
+
+    stage.position      position/moving/homed changes from the stage status poller
+    stage.motion        a move or home started, finished or was cancelled
+    slm.frame           a frame was written to the SLM (with its wall-clock time)
+    slm.temperature     SLM temperature, sampled while someone subscribes
+    scan.point          a scan point completed; scan.end when the scan ends
+    sequence.end        a sequence playback finished
+    device              a device finished initializing (ready or failed)
+    error               an ERROR log record of the server
+
+Subscribing to 'stage' receives both stage topics; no topics receives all.
+
+Each subscription buffers its own events, so a slow subscriber never blocks a
+publisher. State-like events are published with ``coalesce=True``: a newer
+event from the same source replaces the buffered one, so a subscriber that falls
+behind gets the latest position rather than a backlog. Other events are queued
+up to ``max_pending`` (the oldest are dropped beyond that).
+
+Events are delivered either to a callback, called from a per-subscription
+thread with a batch (list) of events, or fetched by long polling with
+EventBus.poll().
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Queued non-coalesced events per subscription before the oldest are dropped
+MAX_PENDING_EVENTS = 1000
+
+
+def topic_matches(topic, prefixes):
+    """True if ``topic`` equals or is below one of ``prefixes`` (no prefixes match all)"""
+    return not prefixes or any(topic == p or topic.startswith(p + '.') for p in prefixes)
+
+
+class Subscription:
+    """Buffered event stream of one subscriber"""
+
+    def __init__(self, bus, sid, topics, callback=None, max_pending=MAX_PENDING_EVENTS):
+        self.bus = bus
+        self.id = sid
+        self.topics = tuple(topics or ())
+        self.callback = callback
+        self.max_pending = max_pending
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._pending = OrderedDict()   # (topic, source) for coalesced events, else seq -> event
+        self._queued = 0                # non-coalesced events in _pending
+        self._cond = threading.Condition()
+        self._closed = False
+        if callback is not None:
+            threading.Thread(target=self._deliver, name=f"events-{sid}", daemon=True).start()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def offer(self, event, coalesce=False):
+        with self._cond:
+            if self._closed:
+                return
+            if coalesce:
+                key = (event['topic'], event['source'])
+                if self._pending.pop(key, None) is not None:
+                    self.coalesced += 1
+            else:
+                key = event['seq']
+                if self._queued >= self.max_pending:
+                    self._drop_oldest()
+                self._queued += 1
+            self._pending[key] = event
+            self._cond.notify()
+
+    def _drop_oldest(self):
+        for key in self._pending:
+            if not isinstance(key, tuple):
+                del self._pending[key]
+                self._queued -= 1
+                self.dropped += 1
+                return
+
+    def take(self, timeout=None):
+        """
+        Wait for events and return them all.
+
+        Args:
+            timeout: Seconds to wait when nothing is buffered, None waits forever
+
+        Returns:
+            list: Events in publishing order (empty on timeout or when closed)
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed, timeout)
+            events = list(self._pending.values())
+            self._pending.clear()
+            self._queued = 0
+        self.delivered += len(events)
+        return events
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'topics': self.topics,
+            'pending': len(self._pending),
+            'delivered': self.delivered,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+        }
+
+    def _deliver(self):
+        while not self._closed:
+            events = self.take()
+            if not events:
+                continue
+            try:
+                self.callback(events)
+            except Exception as e:
+                # Usually the subscriber's connection is gone
+                logger.warning(f"⚠️ Event subscriber {self.id} failed, unsubscribing: {e}")
+                self.bus.unsubscribe(self.id)
+
+
+class EventBus:
+    """Topic-based event fan-out to buffered subscriptions"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._matching = ()             # snapshot read by publish() without locking
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._seq = itertools.count(1)
+        self._pollers = {}              # topic -> stop event
+
+    def subscribe(self, topics=None, callback=None, max_pending=MAX_PENDING_EVENTS):
+        """
+        Args:
+            topics: Topic prefixes, None for all topics
+            callback: Called with a list of events from a delivery thread; None
+                to fetch events with :meth:`poll`
+            max_pending: Buffered non-coalesced events before the oldest are dropped
+
+        Returns:
+            Subscription
+        """
+        with self._lock:
+            sid = next(self._ids)
+            subscription = Subscription(self, sid, topics, callback, max_pending)
+            self._subscriptions[sid] = subscription
+            self._matching = tuple(self._subscriptions.values())
+        return subscription
+
+    def unsubscribe(self, sid):
+        """Returns True if the subscription existed"""
+        with self._lock:
+            subscription = self._subscriptions.pop(sid, None)
+            self._matching = tuple(self._subscriptions.values())
+        if subscription is None:
+            return False
+        subscription.close()
+        return True
+
+    def get(self, sid):
+        return self._subscriptions.get(sid)
+
+    def poll(self, sid, timeout=None):
+        """Events of a callback-less subscription (see Subscription.take)"""
+        subscription = self._subscriptions.get(sid)
+        if subscription is None:
+            raise KeyError(f"Unknown subscription {sid}")
+        return subscription.take(timeout)
+
+    def has_subscribers(self, topic):
+        return any(topic_matches(topic, s.topics) for s in self._matching)
+
+    def publish(self, topic, source=None, coalesce=False, **data):
+        """
+        Publish an event to every matching subscription.
+
+        Args:
+            topic: Dotted topic, e.g. 'stage.position'
+            source: Device the event is about (coalescing key together with topic)
+            coalesce: Replace a still buffered event of the same topic and source
+            **data: JSON-compatible event fields
+        """
+        subscriptions = self._matching
+        if not subscriptions:
+            return
+        event = dict(data, topic=topic, source=source, seq=next(self._seq), time=time.time())
+        for subscription in subscriptions:
+            if topic_matches(topic, subscription.topics):
+                subscription.offer(event, coalesce)
+
+    def add_poller(self, topic, sample, interval_s, source=None):
+        """
+        Publish ``sample()`` (a dict) as a coalesced event every ``interval_s``
+        while anyone subscribes to ``topic``. Replaces an earlier poller of the topic.
+        """
+        self.remove_poller(topic)
+        stop = self._pollers[topic] = threading.Event()
+
+        def run():
+            while not stop.wait(interval_s):
+                if not self.has_subscribers(topic):
+                    continue
+                try:
+                    self.publish(topic, source, coalesce=True, **sample())
+                except Exception as e:
+                    logger.debug(f"Sampling {topic} failed: {e}")
+
+        threading.Thread(target=run, name=f"events-poller-{topic}", daemon=True).start()
+
+    def remove_poller(self, topic):
+        stop = self._pollers.pop(topic, None)
+        if stop is not None:
+            stop.set()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Subscription id -> Subscription.stats()
+        """
+        return {sid: s.stats() for sid, s in list(self._subscriptions.items())}
+
+
+class ErrorEventHandler(logging.Handler):
+    """Publishes ERROR log records as 'error' events"""
+
+    def __init__(self, bus, level=logging.ERROR):
+        super().__init__(level)
+        self.bus = bus
+
+    def emit(self, record):
+        try:
+            self.bus.publish('error', source=record.name, message=record.getMessage())
+        except Exception:
+            self.handleError(record)
+
+
+BUS = EventBus()
+
+
+def install_error_events(bus=BUS):
+    """Attach an ErrorEventHandler to the root logger (once)"""
+    root = logging.getLogger()
+    if not any(isinstance(h, ErrorEventHandler) and h.bus is bus for h in root.handlers):
+        root.addHandler(ErrorEventHandler(bus))
@@ -0,0 +1,160 @@
+# executor.py
+
+"""
+Per-device command executors.
+
+rpyc's ThreadedServer runs every client request in its own thread, and the
+frame channel, sequence player and trigger code add more. Commands that drive a
+device (SLM writes, Kinesis moves) are therefore funnelled through one owner
+thread per device, taken from a priority queue:
+
+    class ThorlabsStage:
+        @serialized()
+        def move_to(self, position, timeout=60000):
+            ...
+
+Calls made from the owner thread itself (e.g. upload_bytes -> upload) run
+inline, so serialized methods can call each other without deadlocking.
+Read-only accessors (positions, status, statistics) are not serialized and never
+queue behind a long move. Stop commands bypass the queue and drop the commands
+still waiting in it (see cancel_pending).
+"""
+
+import functools
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first; equal priorities run in submission order
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+_STOP = object()
+
+
+class DeviceExecutor:
+    """Owner thread executing a device's commands one at a time in priority order"""
+
+    def __init__(self, name):
+        self.name = name
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self.executed = 0
+        self.max_depth = 0
+        self.current = None         # name of the command being executed
+        self._depth_gauge = REGISTRY.gauge(f"executor_{name}_depth", f"Commands queued for {name}")
+        self._thread = threading.Thread(target=self._run, name=f"executor-{name}", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """Commands waiting in the queue (excluding the one running)"""
+        return self._queue.qsize()
+
+    def in_owner_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """
+        Queue ``fn(*args, **kwargs)`` for the owner thread.
+
+        Returns:
+            concurrent.futures.Future: Completes with the result or exception
+        """
+        future = Future()
+        if self.in_owner_thread():
+            # Re-entrant call: queueing would wait on ourselves
+            self._execute(future, fn, args, kwargs)
+            return future
+        self._queue.put((priority, next(self._order), future, fn, args, kwargs))
+        depth = self._queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_gauge.set(depth)
+        return future
+
+    def run(self, fn, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """Execute ``fn`` on the owner thread and wait for its result (exceptions propagate)"""
+        if self.in_owner_thread():
+            return fn(*args, **kwargs)
+        try:
+            return self.submit(fn, *args, priority=priority, **kwargs).result()
+        except CancelledError:
+            raise RuntimeError(f"{getattr(fn, '__name__', fn)} on {self.name} was cancelled") from None
+
+    def cancel_pending(self):
+        """
+        Drop all queued commands (their futures are cancelled).
+
+        Returns:
+            int: Number of commands dropped
+        """
+        dropped = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[2] is _STOP:
+                self._queue.put(item)
+                break
+            item[2].cancel()
+            dropped += 1
+        self._depth_gauge.set(self._queue.qsize())
+        return dropped
+
+    def stats(self):
+        """
+        Returns:
+            dict: depth, max_depth, executed and the current command (or None)
+        """
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'executed': self.executed,
+            'current': self.current,
+        }
+
+    def close(self):
+        """Stop the owner thread after the queued commands"""
+        self._queue.put((float('inf'), next(self._order), _STOP, None, (), {}))
+
+    def _execute(self, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _run(self):
+        while True:
+            _, _, future, fn, args, kwargs = self._queue.get()
+            self._depth_gauge.set(self._queue.qsize())
+            if future is _STOP:
+                return
+            self.current = getattr(fn, '__name__', repr(fn))
+            t0 = time.perf_counter()
+            self._execute(future, fn, args, kwargs)
+            REGISTRY.histogram(f"executor_{self.name}_command_seconds").observe(time.perf_counter() - t0)
+            self.current = None
+            self.executed += 1
+
+
+def serialized(priority=PRIORITY_NORMAL):
+    """
+    Method decorator running the method on ``self.executor`` (a DeviceExecutor).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            return self.executor.run(fn, self, *args, priority=priority, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,333 @@
+# frame_channel.py
+
+"""
+Raw binary frame channel running next to the rpyc control plane.
+
+Every frame is a fixed-size header followed by the raw pixel payload. The server
+receives the payload straight into a preallocated buffer and hands it to
+SLMManager.upload_bytes, which copies it once into the display buffer, so a
+frame costs no serialization at all. rpyc stays in charge of everything else.
+The server listens on TCP and, if given a path, on a Unix socket for local clients.
+
+Header layout (little endian, HEADER.size bytes):
+    magic (4s) b'SLMF', version (B), flags (B), ndim (B), pad (x),
+    dtype (4s) numpy dtype string such as b'|u1', shape (3I), seq (I), nbytes (Q)
+
+If FLAG_ACK is set the server answers with ACK: magic b'SLMA', seq (I),
+status (i) 0 on success or a negative STATUS_* code.
+
+A header announcing more than a float64 frame of the SLM shape is rejected with
+STATUS_TOO_LARGE and the connection closed, before any payload is allocated.
+"""
+
+import logging
+import os
+import socket
+import struct
+import threading
+
+import numpy as np
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+FRAME_CHANNEL_PORT = 18862
+MAGIC = b'SLMF'
+ACK_MAGIC = b'SLMA'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBx4s3IIQ')
+ACK = struct.Struct('<4sIi')
+MAX_NDIM = 3
+
+# Header flags
+FLAG_ACK = 0x01         # reply with an ACK once the frame was handed to the SLM
+
+# ACK status codes
+STATUS_OK = 0
+STATUS_BAD_HEADER = -1
+STATUS_UPLOAD_ERROR = -2
+STATUS_TOO_LARGE = -3
+
+# Largest pixel type accepted: float64 phase frames
+MAX_ITEMSIZE = 8
+# Accepted dtype kinds: bool, unsigned and signed integers, floats
+PIXEL_KINDS = 'buif'
+
+# Socket buffer size, large enough for a few full frames in flight
+SOCKET_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def pack_header(shape, dtype, seq, flags=FLAG_ACK):
+    """
+    Build the header of a frame.
+
+    Args:
+        shape: Frame shape (at most MAX_NDIM dimensions)
+        dtype: Numpy dtype of the payload
+        seq: Sequence id echoed in the ACK
+        flags: FLAG_* bit mask
+
+    Returns:
+        bytes: HEADER.size bytes
+    """
+    shape = tuple(int(s) for s in shape)
+    if len(shape) > MAX_NDIM:
+        raise ValueError(f"Frames have at most {MAX_NDIM} dimensions, got {shape}")
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    padded = shape + (0,) * (MAX_NDIM - len(shape))
+    return HEADER.pack(MAGIC, VERSION, flags, len(shape), dtype.str.encode(),
+                       *padded, seq & 0xFFFFFFFF, nbytes)
+
+
+def unpack_header(header):
+    """
+    Parse and validate a frame header.
+
+    Returns:
+        tuple: (shape, dtype, seq, flags, nbytes)
+
+    Raises:
+        ValueError: If the header is malformed or inconsistent
+    """
+    magic, version, flags, ndim, dtype_str, s0, s1, s2, seq, nbytes = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Bad frame header (magic {magic!r}, version {version})")
+    if ndim > MAX_NDIM:
+        raise ValueError(f"Bad frame header ({ndim} dimensions)")
+    shape = (s0, s1, s2)[:ndim]
+    try:
+        dtype = np.dtype(dtype_str.rstrip(b'\0').decode('ascii'))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Bad frame header dtype {dtype_str!r}: {e}") from e
+    if dtype.kind not in PIXEL_KINDS or dtype.itemsize > MAX_ITEMSIZE:
+        raise ValueError(f"Bad frame header dtype {dtype} (not a numeric pixel type)")
+    if int(np.prod(shape)) * dtype.itemsize != nbytes:
+        raise ValueError(f"Frame header size {nbytes} does not match {shape} {dtype}")
+    return shape, dtype, seq, flags, nbytes
+
+
+def _recv_exact(sock, view):
+    """Fill a memoryview from the socket. Returns False if the peer closed first."""
+    received = 0
+    while received < len(view):
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return False
+        received += n
+    return True
+
+
+def _tune(sock):
+    """Disable Nagle and enlarge the kernel buffers (TCP only)"""
+    if sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER_BYTES)
+        except OSError:
+            pass
+
+
+class FrameChannelServer:
+    """Accepts frame channel connections and feeds received frames to an SLMManager"""
+
+    def __init__(self, slm_manager, host='127.0.0.1', port=FRAME_CHANNEL_PORT, unix_path=None,
+                 max_frame_bytes=None):
+        """
+        Args:
+            slm_manager: SLMManager receiving the frames
+            host: TCP address to listen on
+            port: TCP port (0 picks a free port, see :attr:`port` after start)
+            unix_path: Also listen on this Unix socket path, for clients on the
+                same machine (where available)
+            max_frame_bytes: Largest payload accepted, defaults to a float64 frame
+                of the SLM shape
+        """
+        if unix_path is not None and not hasattr(socket, 'AF_UNIX'):
+            raise OSError("Unix sockets are not available on this platform")
+        self.slm_manager = slm_manager
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        if max_frame_bytes is None:
+            max_frame_bytes = int(np.prod(slm_manager.shape)) * MAX_ITEMSIZE
+        self.max_frame_bytes = int(max_frame_bytes)
+        self.frames_received = 0
+        self.bytes_received = 0
+        self._socks = []
+        self._clients = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Open the listening sockets and accept clients in background threads"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        self._socks.append(sock)
+        if self.unix_path is not None:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(self.unix_path)
+            self._socks.append(sock)
+        for sock in self._socks:
+            sock.listen()
+            threading.Thread(target=self._accept_loop, args=(sock,),
+                             name="frame-channel", daemon=True).start()
+        return self
+
+    def info(self):
+        """
+        Connection parameters for clients.
+
+        Returns:
+            dict: host, port, unix_path, version, header_size, max_frame_bytes
+            and counters
+        """
+        return {
+            'host': self.host,
+            'port': self.port,
+            'unix_path': self.unix_path,
+            'version': VERSION,
+            'header_size': HEADER.size,
+            'max_frame_bytes': self.max_frame_bytes,
+            'frames_received': self.frames_received,
+            'bytes_received': self.bytes_received,
+        }
+
+    def close(self):
+        """Stop accepting and drop all client connections"""
+        socks, self._socks = self._socks, []
+        for sock in socks:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        with self._lock:
+            clients, self._clients = self._clients, set()
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+                conn.close()
+            except OSError:
+                pass
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    def _accept_loop(self, sock):
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return      # listening socket closed
+            _tune(conn)
+            with self._lock:
+                self._clients.add(conn)
+            threading.Thread(target=self._serve, args=(conn,),
+                             name="frame-channel-client", daemon=True).start()
+
+    def _serve(self, conn):
+        header = bytearray(HEADER.size)
+        header_view = memoryview(header)
+        payload = bytearray(int(np.prod(self.slm_manager.shape)))     # grown on demand
+        try:
+            while _recv_exact(conn, header_view):
+                try:
+                    shape, dtype, seq, flags, nbytes = unpack_header(header)
+                except ValueError as e:
+                    # The stream is out of sync, nothing after this can be trusted
+                    logger.error(f"❌ Frame channel error: {e}")
+                    conn.sendall(ACK.pack(ACK_MAGIC, 0, STATUS_BAD_HEADER))
+                    return
+                if nbytes > self.max_frame_bytes:
+                    # Refuse before allocating; the payload that follows is not read
+                    logger.error(f"❌ Frame channel error: {nbytes} byte frame exceeds "
+                                 f"the limit of {self.max_frame_bytes} bytes")
+                    conn.sendall(ACK.pack(ACK_MAGIC, seq, STATUS_TOO_LARGE))
+                    return
+
+                if nbytes > len(payload):
+                    payload = bytearray(nbytes)
+                view = memoryview(payload)[:nbytes]
+                with REGISTRY.timer("frame_channel_recv_seconds", "Receiving a frame channel payload"):
+                    if not _recv_exact(conn, view):
+                        return
+                REGISTRY.counter("frame_channel_bytes", "Payload bytes received on the frame channel").inc(nbytes)
+
+                status = STATUS_OK
+                try:
+                    self.slm_manager.upload_bytes(view, shape, dtype.str, verbose=False)
+                except Exception as e:
+                    logger.error(f"❌ Frame channel upload error: {e}")
+                    status = STATUS_UPLOAD_ERROR
+                self.frames_received += 1
+                self.bytes_received += nbytes
+
+                if flags & FLAG_ACK:
+                    conn.sendall(ACK.pack(ACK_MAGIC, seq, status))
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._clients.discard(conn)
+            conn.close()
+
+
+class FrameChannelClient:
+    """Sends frames over a frame channel. Thread-safe; one frame on the wire at a time."""
+
+    def __init__(self, host='127.0.0.1', port=FRAME_CHANNEL_PORT, unix_path=None, timeout=10.0):
+        if unix_path is not None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address = unix_path
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = (host, port)
+        _tune(sock)
+        sock.settimeout(timeout)
+        sock.connect(address)
+        self._sock = sock
+        self._lock = threading.Lock()
+        self._ack = bytearray(ACK.size)
+        self._seq = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._sock.close()
+
+    def send_frame(self, frame, ack=True):
+        """
+        Send one frame to be displayed.
+
+        Args:
+            frame: Array to upload, sent without copying if C-contiguous
+            ack: Wait for the server to hand the frame to the SLM
+
+        Returns:
+            int: Sequence id of the frame
+
+        Raises:
+            RuntimeError: If the server reports an error
+            ConnectionError: If the server closed the channel
+        """
+        frame = np.ascontiguousarray(frame)
+        with self._lock:
+            self._seq = (self._seq + 1) & 0xFFFFFFFF
+            seq = self._seq
+            header = pack_header(frame.shape, frame.dtype, seq, FLAG_ACK if ack else 0)
+            self._sock.sendall(header)
+            self._sock.sendall(memoryview(frame).cast('B'))
+            if ack:
+                if not _recv_exact(self._sock, memoryview(self._ack)):
+                    raise ConnectionError("Frame channel closed by server")
+                magic, ack_seq, status = ACK.unpack(self._ack)
+                if magic != ACK_MAGIC or status != STATUS_OK:
+                    raise RuntimeError(f"Frame {seq} rejected by server (status {status})")
+        return seq
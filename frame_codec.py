@@ -0,0 +1,319 @@
+# frame_codec.py
+
+"""
+Delta and compressed frame encodings for remote uploads.
+
+The client keeps the last frame it sent (the base) and ships each new frame as the
+smallest of these encodings:
+
+    full            raw frame
+    full+<codec>    compressed frame
+    roi[+<codec>]   bounding box of the pixels that changed since the base
+    xor+<codec>     XOR against the base, compressed (mostly zeros)
+    offset          the base plus a constant (wrapping in the frame dtype)
+
+where <codec> is 'zlib', or 'lz4' when the lz4 package is installed. The server
+rebuilds every frame into its own copy of the base (FrameDecoder.reference) and
+uploads that. Delta encodings carry the CRC32 of the base they were computed
+against, so a server whose reference differs rejects them instead of displaying
+garbage; the client then resends a full frame.
+"""
+
+import threading
+import zlib
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+
+def _zlib_decompress(data, max_length):
+    """Inflate at most max_length bytes; ValueError if the stream holds more or is truncated"""
+    decompressor = zlib.decompressobj()
+    try:
+        out = decompressor.decompress(data, max_length + 1)
+    except zlib.error as e:
+        raise ValueError(f"Corrupt zlib payload: {e}") from e
+    if len(out) > max_length:
+        raise ValueError(f"zlib payload inflates to more than {max_length} bytes")
+    if not decompressor.eof:
+        raise ValueError("Truncated zlib payload")
+    return out
+
+
+def _lz4_decompress(data, max_length):
+    """Decompress at most max_length bytes; ValueError if the frame holds more or is truncated"""
+    decompressor = lz4_frame.LZ4FrameDecompressor()
+    try:
+        out = decompressor.decompress(data, max_length=max_length + 1)
+    except RuntimeError as e:
+        raise ValueError(f"Corrupt lz4 payload: {e}") from e
+    if len(out) > max_length:
+        raise ValueError(f"lz4 payload decompresses to more than {max_length} bytes")
+    if not decompressor.eof:
+        raise ValueError("Truncated lz4 payload")
+    return out
+
+
+# Compressor name -> (compress(data), decompress(data, max_length))
+COMPRESSORS = {
+    'zlib': (lambda data: zlib.compress(data, 1), _zlib_decompress),
+}
+if lz4_frame is not None:
+    COMPRESSORS['lz4'] = (lz4_frame.compress, _lz4_decompress)
+
+KINDS = ('full', 'roi', 'xor', 'offset')
+
+# Size of the sample (chunks spread over the payload) used to predict compression
+COMPRESSION_SAMPLE_CHUNKS = 16
+COMPRESSION_CHUNK_BYTES = 4096
+
+
+def frame_crc(array):
+    """CRC32 of the frame pixels"""
+    return zlib.crc32(memoryview(np.ascontiguousarray(array)).cast('B'))
+
+
+def _compressed(data, name, limit):
+    """
+    Compress data, or return None if a sample predicts the result would not be
+    smaller than ``limit`` bytes (e.g. random holograms), which would cost a full
+    compression pass for nothing.
+    """
+    compress = COMPRESSORS[name][0]
+    sample_bytes = COMPRESSION_SAMPLE_CHUNKS * COMPRESSION_CHUNK_BYTES
+    if len(data) > 4 * sample_bytes:
+        step = len(data) // COMPRESSION_SAMPLE_CHUNKS
+        sample = b''.join(data[i:i + COMPRESSION_CHUNK_BYTES] for i in range(0, len(data), step))
+        if len(compress(sample)) * len(data) / len(sample) > 0.9 * limit:
+            return None
+    return compress(data)
+
+
+def parse_encoding(encoding):
+    """
+    Split an encoding name into kind and compressor.
+
+    Returns:
+        tuple: (kind, compressor name or None)
+
+    Raises:
+        ValueError: For unknown kinds or compressors
+    """
+    kind, _, codec = (encoding or 'full').partition('+')
+    if kind in COMPRESSORS and not codec:
+        kind, codec = 'full', kind
+    if kind not in KINDS:
+        raise ValueError(f"Unknown frame encoding {encoding!r}")
+    if codec and codec not in COMPRESSORS:
+        raise ValueError(f"Compressor {codec!r} is not available")
+    return kind, codec or None
+
+
+class FrameEncoder:
+    """Client side: picks the smallest encoding of each frame relative to the last one sent"""
+
+    def __init__(self, compressors=None, delta=True):
+        """
+        Args:
+            compressors: Compressor names to try, defaults to all available
+            delta: Try delta encodings against the previous frame
+        """
+        self.compressors = tuple(COMPRESSORS if compressors is None else compressors)
+        for name in self.compressors:
+            if name not in COMPRESSORS:
+                raise ValueError(f"Compressor {name!r} is not available")
+        self.delta = delta
+        self._base = None
+        self._base_crc = None
+        self.frames = 0
+        self.bytes_raw = 0
+        self.bytes_sent = 0
+        self.last_ratio = None
+
+    def reset(self):
+        """Forget the base frame so the next frame is sent in full"""
+        self._base = None
+        self._base_crc = None
+
+    def encode(self, frame):
+        """
+        Encode a frame and make it the base of the next one.
+
+        Args:
+            frame: Frame to upload
+
+        Returns:
+            tuple: (payload bytes, encoding name, meta dict). ``meta`` holds the
+            frame ``crc``, the ``base_crc`` of delta encodings, the ``roi``
+            (y, x, height, width) or ``offset`` where relevant, and the
+            compression ``ratio`` (raw bytes / payload bytes).
+        """
+        frame = np.ascontiguousarray(frame)
+        crc = frame_crc(frame)
+        candidates = []
+
+        base = self._base
+        if (self.delta and base is not None and frame.ndim == 2
+                and base.shape == frame.shape and base.dtype == frame.dtype):
+            meta = {'base_crc': self._base_crc}
+            changed = frame != base
+            if not changed.any():
+                candidates.append((b'', 'roi', dict(meta, roi=(0, 0, 0, 0))))
+            elif frame.dtype.kind in 'ui':
+                difference = frame - base
+                if (difference == difference.flat[0]).all():
+                    candidates.append((b'', 'offset', dict(meta, offset=int(difference.flat[0]))))
+
+            if not candidates:
+                rows = np.flatnonzero(changed.any(axis=1))
+                columns = np.flatnonzero(changed.any(axis=0))
+                y0, y1 = int(rows[0]), int(rows[-1]) + 1
+                x0, x1 = int(columns[0]), int(columns[-1]) + 1
+                patch = frame[y0:y1, x0:x1].tobytes()
+                roi_meta = dict(meta, roi=(y0, x0, y1 - y0, x1 - x0))
+                candidates.append((patch, 'roi', roi_meta))
+                xor = np.bitwise_xor(frame.view(f'u{frame.dtype.itemsize}'),
+                                     base.view(f'u{frame.dtype.itemsize}')).tobytes()
+                for name in self.compressors:
+                    for data, encoding, data_meta in ((patch, 'roi', roi_meta), (xor, 'xor', meta)):
+                        best = min(len(c[0]) for c in candidates)
+                        compressed = _compressed(data, name, best)
+                        if compressed is not None:
+                            candidates.append((compressed, f'{encoding}+{name}', data_meta))
+
+        if not candidates:
+            raw = frame.tobytes()
+            candidates.append((raw, 'full', {}))
+            for name in self.compressors:
+                compressed = _compressed(raw, name, len(raw))
+                if compressed is not None:
+                    candidates.append((compressed, f'full+{name}', {}))
+
+        payload, encoding, meta = min(candidates, key=lambda c: len(c[0]))
+        meta = dict(meta, crc=crc, ratio=frame.nbytes / max(len(payload), 1))
+
+        self._base = frame.copy()
+        self._base_crc = crc
+        self.frames += 1
+        self.bytes_raw += frame.nbytes
+        self.bytes_sent += len(payload)
+        self.last_ratio = meta['ratio']
+        return payload, encoding, meta
+
+    def stats(self):
+        """
+        Returns:
+            dict: frames, bytes_raw, bytes_sent, overall ratio and last_ratio
+        """
+        return {
+            'frames': self.frames,
+            'bytes_raw': self.bytes_raw,
+            'bytes_sent': self.bytes_sent,
+            'ratio': self.bytes_raw / max(self.bytes_sent, 1),
+            'last_ratio': self.last_ratio,
+        }
+
+
+class FrameDecoder:
+    """Server side: rebuilds encoded frames into a reference buffer"""
+
+    def __init__(self):
+        self.reference = None
+        self.reference_crc = None
+        self.frames = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        # Held by callers that read the reference after decoding
+        self.lock = threading.RLock()
+
+    def decode(self, data_bytes, shape, dtype_str, encoding, meta=None):
+        """
+        Rebuild a frame into :attr:`reference`.
+
+        Args:
+            data_bytes: Encoded payload
+            shape: Frame shape
+            dtype_str: Numpy dtype string
+            encoding: Encoding name (see module docstring)
+            meta: Encoding parameters from FrameEncoder.encode
+
+        Returns:
+            np.ndarray: The reference buffer holding the frame. It is overwritten
+            by the next call, so hold :attr:`lock` while using it.
+
+        Raises:
+            ValueError: If the payload is inconsistent or the base frame does not match
+        """
+        kind, codec = parse_encoding(encoding)
+        meta = dict(meta or {})
+        dtype = np.dtype(dtype_str)
+        shape = tuple(int(s) for s in shape)
+        payload = memoryview(data_bytes)
+        received = payload.nbytes
+
+        with self.lock:
+            if kind == 'full':
+                expected = int(np.prod(shape)) * dtype.itemsize
+            else:
+                if self.reference is None or self.reference.shape != shape or self.reference.dtype != dtype:
+                    raise ValueError("No base frame for delta encoding, send a full frame")
+                if meta.get('base_crc') != self.reference_crc:
+                    raise ValueError("Base frame mismatch for delta encoding, send a full frame")
+                if kind == 'roi':
+                    y0, x0, h, w = (int(v) for v in meta['roi'])
+                    expected = h * w * dtype.itemsize
+                elif kind == 'xor':
+                    expected = self.reference.nbytes
+                else:
+                    expected = 0
+            if codec is not None:
+                # Bounded, so a small payload cannot inflate into an oversized buffer
+                payload = memoryview(COMPRESSORS[codec][1](payload, expected))
+            if payload.nbytes != expected:
+                raise ValueError(
+                    f"{encoding} payload has {payload.nbytes} bytes, expected {expected}"
+                )
+
+            if kind == 'full' and (self.reference is None or self.reference.shape != shape
+                                   or self.reference.dtype != dtype):
+                self.reference = np.empty(shape, dtype)
+                self.reference_crc = None
+            reference = self.reference
+            if kind == 'full':
+                np.copyto(reference, np.frombuffer(payload, dtype).reshape(shape))
+            elif kind == 'roi':
+                if h and w:
+                    reference[y0:y0 + h, x0:x0 + w] = np.frombuffer(payload, dtype).reshape(h, w)
+            elif kind == 'xor':
+                bits = reference.view(f'u{dtype.itemsize}')
+                np.bitwise_xor(bits, np.frombuffer(payload, bits.dtype).reshape(shape), out=bits)
+            else:
+                np.add(reference, np.array(meta['offset']).astype(dtype), out=reference,
+                       casting='unsafe')
+
+            crc = frame_crc(reference)
+            if 'crc' in meta and meta['crc'] != crc:
+                self.reference_crc = None
+                raise ValueError(f"CRC mismatch after {encoding} decoding, send a full frame")
+            self.reference_crc = crc
+            self.frames += 1
+            self.bytes_received += received
+            self.bytes_decoded += reference.nbytes
+            return reference
+
+    def stats(self):
+        """
+        Returns:
+            dict: frames, bytes_received, bytes_decoded and their ratio
+        """
+        return {
+            'frames': self.frames,
+            'bytes_received': self.bytes_received,
+            'bytes_decoded': self.bytes_decoded,
+            'ratio': self.bytes_decoded / max(self.bytes_received, 1),
+        }
@@ -5,46 +5,593 @@ Handle hardware communication with Spatial Light Modulator (SLM).
 Automatically switches to simulation mode if SLM is not connected or SDK is not found.
 """
 
+import hashlib
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
 import numpy as np
 import config
+from events import BUS
+from executor import DeviceExecutor, PRIORITY_LOW, serialized
+from frame_codec import FrameDecoder
+from metrics import REGISTRY
+from patterns import PatternGenerator
+
+logger = logging.getLogger(__name__)
+
+# Default byte budget of the server-side frame cache (~230 full 1152x1920 uint8 frames)
+FRAME_CACHE_BUDGET_BYTES = 512 * 1024 * 1024
+
+# Frame decoders kept for encoded uploads, one per client stream (least recently used dropped)
+MAX_FRAME_DECODERS = 8
+
+
+def frame_digest(data_bytes, shape, dtype_str):
+    """
+    Content hash used as the key of a cached frame.
+
+    The shape and dtype are hashed together with the pixel data so that the same
+    bytes reinterpreted with another layout never collide.
+
+    Args:
+        data_bytes: Raw frame buffer (bytes, bytearray, memoryview or ndarray)
+        shape: Frame shape
+        dtype_str: Numpy dtype string
+
+    Returns:
+        str: 32-character hexadecimal digest
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((tuple(int(s) for s in shape), np.dtype(dtype_str).str)).encode())
+    h.update(memoryview(data_bytes).cast("B"))
+    return h.hexdigest()
+
+
+class FrameCache:
+    """
+    LRU store of frames keyed by content digest, bounded by a byte budget.
+
+    Frames are registered once by the client and afterwards referenced by their
+    digest only, so repeated scans do not resend the pixel data.
+    """
+
+    def __init__(self, max_bytes=FRAME_CACHE_BUDGET_BYTES):
+        self.max_bytes = int(max_bytes)
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, digest):
+        return digest in self._frames
+
+    def put(self, data_bytes, shape, dtype_str):
+        """
+        Store a frame and return its digest.
+
+        Args:
+            data_bytes: Raw frame buffer
+            shape: Frame shape
+            dtype_str: Numpy dtype string
+
+        Returns:
+            str: Digest of the frame
+        """
+        digest = frame_digest(data_bytes, shape, dtype_str)
+        with self._lock:
+            if digest in self._frames:
+                self._frames.move_to_end(digest)
+                return digest
+
+        array = np.frombuffer(data_bytes, dtype=np.dtype(dtype_str)).reshape(shape).copy()
+        if array.nbytes > self.max_bytes:
+            raise ValueError(
+                f"Frame of {array.nbytes} bytes exceeds cache budget of {self.max_bytes} bytes"
+            )
+        array.flags.writeable = False
+
+        with self._lock:
+            if digest not in self._frames:
+                self._frames[digest] = array
+                self.nbytes += array.nbytes
+                self._evict()
+            else:
+                self._frames.move_to_end(digest)
+        return digest
+
+    def get(self, digest):
+        """
+        Look up a frame by digest, marking it as most recently used.
+
+        Args:
+            digest: Digest returned by :meth:`put`
+
+        Returns:
+            np.ndarray: Read-only cached frame, or None on a miss
+        """
+        with self._lock:
+            array = self._frames.get(digest)
+            if array is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(digest)
+            self.hits += 1
+            return array
+
+    def discard(self, digest):
+        """Remove a frame from the cache. Returns True if it was present."""
+        with self._lock:
+            array = self._frames.pop(digest, None)
+            if array is None:
+                return False
+            self.nbytes -= array.nbytes
+            return True
+
+    def clear(self):
+        """Drop all cached frames (counters are kept)."""
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """
+        Snapshot of the cache state.
+
+        Returns:
+            dict: Frame count, bytes used, budget and hit/miss/eviction counters
+        """
+        with self._lock:
+            return {
+                'frames': len(self._frames),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _evict(self):
+        """Drop least recently used frames until within budget (lock held)."""
+        while self.nbytes > self.max_bytes and self._frames:
+            _, array = self._frames.popitem(last=False)
+            self.nbytes -= array.nbytes
+            self.evictions += 1
+
+
+class FrameBank:
+    """
+    Read-only N x H x W frame stack in a file on the server's disk, mapped with
+    np.memmap so frames are paged in on access and stay in the OS page cache.
+
+    Indexing a bank returns the frame (a view into the mapping) and asks the OS
+    to read ahead the following frame, so a bank can be played back like a
+    stored sequence.
+    """
+
+    def __init__(self, path, frame_shape=None, dtype_str='|u1', offset=0):
+        """
+        Args:
+            path: .npy file (header parsed by numpy) or a raw file of C-order frames
+            frame_shape: (H, W) of raw files; ignored for .npy files
+            dtype_str: Numpy dtype string of raw files
+            offset: Bytes to skip at the start of raw files
+
+        Raises:
+            ValueError: If the file does not hold an N x H x W stack
+        """
+        self.path = os.path.abspath(path)
+        if self.path.lower().endswith('.npy'):
+            frames = np.load(self.path, mmap_mode='r')
+        else:
+            if frame_shape is None:
+                raise ValueError("Raw frame banks need frame_shape")
+            dtype = np.dtype(dtype_str)
+            frame_shape = tuple(int(s) for s in frame_shape)
+            frame_bytes = int(np.prod(frame_shape)) * dtype.itemsize
+            n, remainder = divmod(os.path.getsize(self.path) - offset, frame_bytes)
+            if n <= 0 or remainder:
+                raise ValueError(f"{self.path} is not a whole number of {frame_shape} {dtype} frames")
+            frames = np.memmap(self.path, dtype=dtype, mode='r', offset=offset,
+                               shape=(n,) + frame_shape)
+        if frames.ndim != 3:
+            raise ValueError(f"Frame banks hold N x H x W stacks, {self.path} has shape {frames.shape}")
+        self.frames = frames
+        self.frame_bytes = frames[0].nbytes
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        frame = self.frames[index]
+        if index + 1 < len(self.frames):
+            self.prefetch(index + 1)
+        return frame
+
+    def prefetch(self, index, count=1):
+        """
+        Hint the OS to page in frames ``index`` to ``index + count - 1``.
+
+        Returns:
+            bool: False where madvise is not available (e.g. Windows)
+        """
+        mapping = getattr(self.frames, '_mmap', None)
+        if mapping is None or not hasattr(mapping, 'madvise'):
+            return False
+        # The mapping starts at the allocation-aligned offset below the data
+        start = self.frames.offset % mmap.ALLOCATIONGRANULARITY + index * self.frame_bytes
+        begin = start - start % mmap.PAGESIZE
+        length = min(start + count * self.frame_bytes, len(mapping)) - begin
+        if length > 0:
+            mapping.madvise(mmap.MADV_WILLNEED, begin, length)
+        return True
+
+    def info(self):
+        """
+        Returns:
+            dict: path, frames, frame_shape, dtype and bytes
+        """
+        return {
+            'path': self.path,
+            'frames': len(self.frames),
+            'frame_shape': tuple(self.frames.shape[1:]),
+            'dtype': self.frames.dtype.str,
+            'bytes': int(self.frames.nbytes),
+        }
+
 
 class SLMManager:
-    def __init__(self, sim_mode=False, 
-                 sdk_path=config.SLM_SDK_PATH, 
-                 lut_path=config.SLM_LUT_PATH):
+    def __init__(self, sim_mode=False,
+                 sdk_path=config.SLM_SDK_PATH,
+                 lut_path=config.SLM_LUT_PATH,
+                 frame_cache_bytes=FRAME_CACHE_BUDGET_BYTES,
+                 async_writes=False,
+                 simulate=False,
+                 shape=None):
+        """
+        Args:
+            sim_mode (bool): No SLM at all, uploads only update a stand-in buffer
+            sdk_path: Blink SDK folder
+            lut_path: LUT file
+            frame_cache_bytes: Byte budget of the frame cache
+            async_writes (bool): Write frames from a background thread
+            simulate (bool): Drive a Meadowlark object backed by the simulated Blink
+                library (sim_hardware.SimBlinkSDK), so the full upload path runs
+                without hardware
+            shape: (height, width) in simulation, defaults to config.SLM_SHAPE
+        """
         self.slm = None
         self.is_connected = False
-        self.shape = config.SLM_SHAPE
+        self.shape = config.SLM_SHAPE if shape is None else tuple(shape)
+        self.frame_cache = FrameCache(frame_cache_bytes)
+        # Each client's encoded frames are deltas against its own last frame
+        self.decoders = OrderedDict()
+        self._decoders_lock = threading.Lock()
+        # Display writes run one at a time on this executor's thread
+        self.executor = DeviceExecutor('slm')
         if not sim_mode:
             try:
                 from meadowlark import Meadowlark
+                slm_lib = None
+                if simulate:
+                    from sim_hardware import SimBlinkSDK
+                    slm_lib = SimBlinkSDK(width=self.shape[1], height=self.shape[0])
                 self.slm = Meadowlark(
                     verbose=True,
                     sdk_path=sdk_path,
-                    lut_path=lut_path
+                    lut_path=lut_path,
+                    slm_lib=slm_lib,
+                    async_writes=async_writes
                 )
                 self.is_connected = True
                 self.shape = self.slm.shape
-                print(f"✅ SLM connected successfully, resolution: {self.shape}")
+                logger.info(f"✅ SLM connected successfully, resolution: {self.shape}")
             except (ImportError, RuntimeError) as e:
-                print(f"⚠️ Warning: Failed to connect to SLM. Running in simulation mode only.")
-                print(f"   Error message: {e}")
-                print(f"   Using default resolution: {self.shape}")
+                logger.warning(f"⚠️ Warning: Failed to connect to SLM. Running in simulation mode only.")
+                logger.warning(f"   Error message: {e}")
+                logger.info(f"   Using default resolution: {self.shape}")
         else:
-            print("🎬 Simulation Mode Enabled")
+            logger.info("🎬 Simulation Mode Enabled")
+
+        # Stand-in for the SLM display buffer when no hardware is connected
+        self._sim_display = None if self.is_connected else np.zeros(self.shape, dtype=np.uint8)
+        self.patterns = PatternGenerator(self.shape, self.frame_cache)
+        self.frame_banks = {}
+        self.frames_written = 0
+
+    @property
+    def display(self):
+        """Integer frame currently shown (or that would be shown in simulation mode)"""
+        return self.slm.display if self.is_connected else self._sim_display
 
-    def upload(self, phase_pattern: np.ndarray):
+    def _is_display_ready(self, array):
+        """True if the array can be copied into the display buffer as is"""
+        display = self.display
+        return array.dtype == display.dtype and array.shape == display.shape
+
+    def _set_sim_display(self, phase_pattern):
+        """
+        Simulation stand-in for ``set_phase``: frames are checked like on the SLM,
+        integer frames are copied and phase frames are mapped to gray levels
+        (2*pi wrapping to 0).
+
+        Raises:
+            TypeError: For an integer dtype other than the display's, or a non-numeric dtype
+            ValueError: If the shape differs from the SLM shape
+        """
+        display = self._sim_display
+        phase_pattern = np.asarray(phase_pattern)
+        if phase_pattern.shape != display.shape:
+            raise ValueError(f"Expected a frame of shape {display.shape}, got {phase_pattern.shape}")
+        if np.issubdtype(phase_pattern.dtype, np.integer):
+            if phase_pattern.dtype != display.dtype:
+                raise TypeError(f"Unexpected integer type {phase_pattern.dtype}. Expected {display.dtype}.")
+            np.copyto(display, phase_pattern)
+        elif np.issubdtype(phase_pattern.dtype, np.floating):
+            levels = np.iinfo(display.dtype).max + 1
+            gray = np.floor(np.mod(phase_pattern, 2 * np.pi) * (levels / (2 * np.pi)))
+            np.copyto(display, np.mod(gray, levels), casting='unsafe')
+        else:
+            raise TypeError(f"Unsupported frame type {phase_pattern.dtype}")
+
+    @serialized()
+    def upload(self, phase_pattern: np.ndarray, verbose=True):
         """
         Upload 8-bit phase pattern to SLM.
 
+        Frames that already match the display dtype and shape are copied once into
+        the display buffer; anything else goes through ``set_phase``. Runs on the
+        SLM executor thread, so concurrent callers never interleave writes.
+
         Args:
             phase_pattern (np.ndarray): Phase pattern in uint8 format.
+            verbose (bool): Print a status line (disable in tight playback loops).
+
+        Returns:
+            bool: False if the SLM (or, in simulation mode, the shape and dtype
+            check) rejected the frame
         """
+        REGISTRY.counter("frames_uploaded", "Frames uploaded to the SLM").inc()
+        try:
+            if self.is_connected:
+                if self._is_display_ready(phase_pattern):
+                    self.slm.set_display_buffer(phase_pattern)
+                else:
+                    self.slm.set_phase(phase_pattern)
+                if verbose:
+                    logger.debug("Phase pattern uploaded to SLM.")
+            else:
+                self._set_sim_display(phase_pattern)
+                if verbose:
+                    logger.debug("(Simulation mode): Phase pattern would be uploaded if SLM was connected.")
+        except Exception as e:
+            logger.error(f"❌ Error: Failed to upload phase pattern to SLM: {e}")
+            return False
+        self.frames_written += 1
+        BUS.publish('slm.frame', source='slm', coalesce=True, frames=self.frames_written)
+        return True
+
+    @serialized(priority=PRIORITY_LOW)
+    def get_temperature(self):
+        """SLM temperature in degrees Celsius (None without an SLM)"""
+        return self.slm.get_temperature() if self.is_connected else None
+
+    @property
+    def settle_time_s(self):
+        """Time for the liquid crystal to settle after a write (0 without an SLM)"""
+        return self.slm.settle_time_s if self.is_connected else 0.0
+
+    @settle_time_s.setter
+    def settle_time_s(self, value):
         if self.is_connected:
-            try:
-                self.slm.set_phase(phase_pattern)
-                print("Phase pattern uploaded to SLM.")
-            except Exception as e:
-                print(f"❌ Error: Failed to upload phase pattern to SLM: {e}")
-        else:
-            print("(Simulation mode): Phase pattern would be uploaded if SLM was connected.")
\ No newline at end of file
+            self.slm.settle_time_s = float(value)
+
+    @serialized()
+    def flush(self, timeout=None):
+        """
+        Wait until all queued SLM writes have completed (asynchronous writes only).
+
+        Args:
+            timeout: Maximum wait in seconds, None to wait indefinitely
+
+        Returns:
+            bool: True if no write is pending
+        """
+        if self.is_connected and self.slm.async_writes:
+            return self.slm.flush(timeout)
+        return True
+
+    def upload_bytes(self, data_bytes, shape, dtype_str, verbose=True):
+        """
+        Upload a frame received as a raw buffer.
+
+        The buffer is validated once and wrapped without copying, so a frame
+        matching the display dtype and shape is copied exactly once, into the
+        display buffer.
+
+        Args:
+            data_bytes: Raw frame buffer (bytes, bytearray or memoryview)
+            shape: Frame shape
+            dtype_str: Numpy dtype string
+            verbose (bool): Print a status line
+
+        Returns:
+            bool: False if the SLM reported an error
+
+        Raises:
+            ValueError: If the buffer size does not match shape and dtype
+        """
+        with REGISTRY.timer("frame_deserialize_seconds", "Validating and wrapping received frames"):
+            dtype = np.dtype(dtype_str)
+            shape = tuple(int(s) for s in shape)
+            expected = int(np.prod(shape)) * dtype.itemsize
+            received = memoryview(data_bytes).nbytes
+            if received != expected:
+                raise ValueError(
+                    f"Frame buffer has {received} bytes, expected {expected} for {shape} {dtype}"
+                )
+            array = np.frombuffer(data_bytes, dtype=dtype).reshape(shape)
+        return self.upload(array, verbose)
+
+    def decoder_for(self, stream=None):
+        """
+        Frame decoder of a client stream, created on first use.
+
+        Args:
+            stream: Stream id sent by the client (``meta['stream']``), None for
+                clients that do not send one
+
+        Returns:
+            FrameDecoder
+        """
+        with self._decoders_lock:
+            decoder = self.decoders.pop(stream, None) or FrameDecoder()
+            self.decoders[stream] = decoder
+            while len(self.decoders) > MAX_FRAME_DECODERS:
+                self.decoders.popitem(last=False)
+        return decoder
+
+    def decoder_stats(self):
+        """
+        Returns:
+            dict: frames, bytes_received, bytes_decoded and their ratio over all
+            decoders, and the number of client ``streams``
+        """
+        with self._decoders_lock:
+            decoders = list(self.decoders.values())
+        stats = {'frames': 0, 'bytes_received': 0, 'bytes_decoded': 0}
+        for decoder in decoders:
+            for key, value in decoder.stats().items():
+                if key in stats:
+                    stats[key] += value
+        stats['ratio'] = stats['bytes_decoded'] / max(stats['bytes_received'], 1)
+        stats['streams'] = len(decoders)
+        return stats
+
+    @serialized()
+    def upload_encoded(self, data_bytes, shape, dtype_str, encoding, meta=None, verbose=True):
+        """
+        Upload a frame sent with one of the frame_codec encodings.
+
+        The frame is rebuilt into the reference of the client's decoder (its last
+        encoded frame), which is then copied into the display buffer. Decoding and upload both run
+        on the SLM executor thread, so the decoder lock is never held by a thread
+        waiting for the executor (e.g. while display_and_trigger runs on it).
+
+        Args:
+            data_bytes: Encoded payload
+            shape: Frame shape
+            dtype_str: Numpy dtype string
+            encoding: Encoding name, e.g. 'roi+zlib'
+            meta: Encoding parameters from FrameEncoder.encode, plus the client's
+                ``stream`` id
+            verbose (bool): Print a status line
+
+        Returns:
+            bool: False if the SLM reported an error
+
+        Raises:
+            ValueError: If the payload cannot be decoded against the current reference
+        """
+        decoder = self.decoder_for((meta or {}).get('stream'))
+        with decoder.lock:
+            with REGISTRY.timer("frame_decode_seconds", "Decoding delta/compressed frames"):
+                frame = decoder.decode(data_bytes, shape, dtype_str, encoding, meta)
+            return self.upload(frame, verbose)
+
+    def register_frame_bank(self, path, name=None, frame_shape=None, dtype_str='|u1', offset=0):
+        """
+        Map a frame bank file from the server's disk (see :class:`FrameBank`).
+
+        Args:
+            path: .npy file or raw file of N x H x W frames
+            name: Bank name, defaults to the file name without extension
+            frame_shape: (H, W) of raw files, defaults to the SLM shape
+            dtype_str: Numpy dtype string of raw files
+            offset: Header bytes to skip in raw files
+
+        Returns:
+            dict: Bank info (see :meth:`FrameBank.info`) with its ``name``
+        """
+        bank = FrameBank(path, self.shape if frame_shape is None else frame_shape, dtype_str, offset)
+        if name is None:
+            name = os.path.splitext(os.path.basename(path))[0]
+        self.frame_banks[name] = bank
+        if bank.frames.shape[1:] != tuple(self.shape):
+            logger.warning(f"⚠️ Warning: Frame bank {name} has frames of {bank.frames.shape[1:]}, "
+                           f"SLM is {self.shape}")
+        logger.info(f"🗂️ Frame bank {name} mapped: {len(bank)} frames from {bank.path}")
+        return dict(bank.info(), name=name)
+
+    def unregister_frame_bank(self, name):
+        """Forget a frame bank. Returns True if it existed."""
+        return self.frame_banks.pop(name, None) is not None
+
+    def display_bank_frame(self, name, index):
+        """
+        Upload frame ``index`` of a frame bank.
+
+        Raises:
+            KeyError: If the bank is not registered
+            IndexError: If the index is out of range
+        """
+        bank = self.frame_banks.get(name)
+        if bank is None:
+            raise KeyError(f"Unknown frame bank {name}")
+        return self.upload(bank[int(index)], verbose=False)
+
+    def register_frame(self, data_bytes, shape, dtype_str):
+        """
+        Store a frame in the frame cache without displaying it.
+
+        Args:
+            data_bytes: Raw frame buffer
+            shape: Frame shape
+            dtype_str: Numpy dtype string
+
+        Returns:
+            str: Digest to pass to :meth:`display_frame`
+        """
+        return self.frame_cache.put(data_bytes, shape, dtype_str)
+
+    def generate_pattern(self, params, display=True):
+        """
+        Generate a pattern from parameters (cached in the frame cache).
+
+        Args:
+            params: Pattern parameters, see patterns.py
+            display (bool): Upload the pattern to the SLM
+
+        Returns:
+            str: Digest of the pattern frame, usable with :meth:`display_frame`
+
+        Raises:
+            ValueError: For unknown pattern types or parameters
+        """
+        with REGISTRY.timer("pattern_get_seconds", "Pattern lookup or generation"):
+            digest, frame = self.patterns.get(params)
+        if display and not self.upload(frame, verbose=False):
+            raise RuntimeError("Failed to upload the pattern to the SLM")
+        return digest
+
+    def display_frame(self, digest):
+        """
+        Upload a previously registered frame to the SLM.
+
+        Args:
+            digest: Digest returned by :meth:`register_frame`
+
+        Returns:
+            bool: False if the digest is not (or no longer) cached or the upload failed
+        """
+        array = self.frame_cache.get(digest)
+        if array is None:
+            return False
+        return self.upload(array)
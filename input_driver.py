@@ -0,0 +1,281 @@
+# input_driver.py
+
+"""
+Persistent mouse automation backends for AHKManager.
+
+Running an AutoHotkey script per click costs a shell plus an interpreter start
+(often 100+ ms). The drivers here stay alive between calls:
+
+    ahk         one long-lived AutoHotkey process running input_worker.ahk,
+                fed commands over stdin; replies (including captured
+                coordinates) come back over stdout
+    sendinput   native Win32 SetCursorPos/SendInput through ctypes, no helper process
+    mock        records clicks in memory, for Linux tests and simulated servers
+
+Use create_input_driver() to pick one; backend='auto' prefers AutoHotkey, then
+SendInput, then the mock.
+"""
+
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+AHK_WORKER_SCRIPT = 'input_worker.ahk'
+BACKENDS = ('ahk', 'sendinput', 'mock')
+
+# Seconds to wait for the AHK worker to start and to answer a click
+WORKER_START_TIMEOUT = 10.0
+CLICK_TIMEOUT = 5.0
+# Longest wait for a captured click on the AHK worker, which cannot serve clicks meanwhile
+CAPTURE_TIMEOUT = 60.0
+
+
+class InputDriver:
+    """Base class of the input backends"""
+
+    name = None
+
+    def click(self, x, y):
+        """Left click at screen coordinates (x, y)"""
+        raise NotImplementedError
+
+    def capture_position(self, timeout=None):
+        """
+        Wait for the user to left click and return where.
+
+        Args:
+            timeout: Seconds to wait, None waits forever (the ahk backend waits
+                at most CAPTURE_TIMEOUT)
+
+        Returns:
+            tuple: (x, y) screen coordinates, or None on timeout
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class AHKWorkerDriver(InputDriver):
+    """Long-lived AutoHotkey process speaking the input_worker.ahk line protocol"""
+
+    name = 'ahk'
+
+    def __init__(self, ahk_exe, script_path):
+        if not os.path.exists(ahk_exe):
+            raise FileNotFoundError(f"AutoHotkey not found at {ahk_exe}")
+        if not os.path.exists(script_path):
+            raise FileNotFoundError(f"Worker script not found at {script_path}")
+        self.ahk_exe = ahk_exe
+        self.script_path = script_path
+        self._process = None
+        self._replies = None
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            [self.ahk_exe, self.script_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1,
+        )
+        # Replies are read by a thread so requests can time out
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read_replies, args=(self._process, self._replies),
+                         name="ahk-worker-reader", daemon=True).start()
+        try:
+            ready = self._replies.get(timeout=WORKER_START_TIMEOUT) == 'READY'
+        except queue.Empty:
+            ready = False
+        if not ready:
+            self._kill()
+            raise RuntimeError(f"AutoHotkey worker did not start within {WORKER_START_TIMEOUT} s")
+        logger.info(f"✅ AHK worker started (pid {self._process.pid})")
+
+    @staticmethod
+    def _read_replies(process, replies):
+        for line in process.stdout:
+            replies.put(line.strip())
+        replies.put(None)       # worker exited
+
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process = None
+
+    def _request(self, command, timeout):
+        # A request waits at most its own timeout for the one before it
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f"AutoHotkey worker busy, {command.split()[0]} not sent")
+        try:
+            if self._process is None or self._process.poll() is not None:
+                logger.warning("⚠️ AHK worker not running, restarting")
+                self._start()
+            self._process.stdin.write(command + '\n')
+            self._process.stdin.flush()
+            try:
+                reply = self._replies.get(timeout=timeout)
+            except queue.Empty:
+                # The worker is stuck; a late reply would desync the next request
+                self._kill()
+                return None
+            if reply is None:
+                self._process = None
+                raise RuntimeError("AutoHotkey worker exited")
+            if reply.startswith('ERR'):
+                raise RuntimeError(f"AutoHotkey worker: {reply[4:]}")
+            return reply
+        finally:
+            self._lock.release()
+
+    def click(self, x, y):
+        if self._request(f"CLICK {int(x)} {int(y)}", CLICK_TIMEOUT) != 'OK':
+            raise TimeoutError(f"AutoHotkey worker did not confirm click at ({x}, {y})")
+
+    def capture_position(self, timeout=None):
+        """
+        See :meth:`InputDriver.capture_position`. The worker cannot click while it
+        waits, so ``timeout`` is capped at CAPTURE_TIMEOUT (also when None).
+        """
+        timeout = CAPTURE_TIMEOUT if timeout is None else min(timeout, CAPTURE_TIMEOUT)
+        reply = self._request("CAPTURE", timeout)
+        if reply is None:
+            return None
+        _, x, y = reply.split()
+        return int(x), int(y)
+
+    def close(self):
+        with self._lock:
+            if self._process is None:
+                return
+            try:
+                self._process.stdin.write("EXIT\n")
+                self._process.stdin.close()
+                self._process.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+            self._process = None
+
+
+class SendInputDriver(InputDriver):
+    """Native Win32 mouse input through user32 (Windows only)"""
+
+    name = 'sendinput'
+
+    _MOUSEEVENTF_LEFTDOWN = 0x0002
+    _MOUSEEVENTF_LEFTUP = 0x0004
+    _VK_LBUTTON = 0x01
+    _POLL_S = 0.005
+
+    def __init__(self):
+        if sys.platform != 'win32':
+            raise OSError("SendInput is only available on Windows")
+        import ctypes
+        from ctypes import wintypes
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [('dx', wintypes.LONG), ('dy', wintypes.LONG),
+                        ('mouseData', wintypes.DWORD), ('dwFlags', wintypes.DWORD),
+                        ('time', wintypes.DWORD), ('dwExtraInfo', ctypes.c_size_t)]
+
+        class INPUT(ctypes.Structure):
+            # INPUT is a tagged union; MOUSEINPUT is its largest pointer-aligned member
+            _fields_ = [('type', wintypes.DWORD), ('mi', MOUSEINPUT)]
+
+        self._ctypes = ctypes
+        self._user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self._point = wintypes.POINT()
+        self._inputs = (INPUT * 2)(
+            INPUT(0, MOUSEINPUT(0, 0, 0, self._MOUSEEVENTF_LEFTDOWN, 0, 0)),
+            INPUT(0, MOUSEINPUT(0, 0, 0, self._MOUSEEVENTF_LEFTUP, 0, 0)),
+        )
+
+    def click(self, x, y):
+        user32 = self._user32
+        if not user32.SetCursorPos(int(x), int(y)):
+            raise OSError(self._ctypes.get_last_error(), "SetCursorPos failed")
+        sent = user32.SendInput(2, self._inputs, self._ctypes.sizeof(self._inputs[0]))
+        if sent != 2:
+            raise OSError(self._ctypes.get_last_error(), "SendInput failed")
+
+    def _button_down(self):
+        return bool(self._user32.GetAsyncKeyState(self._VK_LBUTTON) & 0x8000)
+
+    def capture_position(self, timeout=None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self._button_down():
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            time.sleep(self._POLL_S)
+        self._user32.GetCursorPos(self._ctypes.byref(self._point))
+        while self._button_down():
+            time.sleep(self._POLL_S)
+        return self._point.x, self._point.y
+
+
+class MockInputDriver(InputDriver):
+    """In-memory backend: records clicks and returns a preset captured position"""
+
+    name = 'mock'
+
+    def __init__(self, position=(0, 0), latency_s=0.0):
+        """
+        Args:
+            position: Returned by capture_position (defaults to the last click once there is one)
+            latency_s: Simulated time per click
+        """
+        self.position = tuple(position)
+        self.latency_s = latency_s
+        self.clicks = []        # (perf_counter time, x, y)
+
+    def click(self, x, y):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        self.clicks.append((time.perf_counter(), int(x), int(y)))
+
+    def capture_position(self, timeout=None):
+        if self.clicks:
+            return self.clicks[-1][1:]
+        return self.position
+
+
+def create_input_driver(backend='auto', ahk_exe=None, script_dir='.'):
+    """
+    Build an input driver.
+
+    Args:
+        backend: One of BACKENDS, or 'auto' for the first available of ahk,
+            sendinput and mock
+        ahk_exe: AutoHotkey executable (ahk backend)
+        script_dir: Directory holding input_worker.ahk (ahk backend)
+
+    Returns:
+        InputDriver: The started driver
+
+    Raises:
+        ValueError: For unknown backends
+        OSError, RuntimeError: If an explicitly requested backend cannot start
+    """
+    if backend == 'auto':
+        for candidate in ('ahk', 'sendinput'):
+            try:
+                return create_input_driver(candidate, ahk_exe, script_dir)
+            except Exception as e:
+                logger.debug(f"Input backend {candidate} unavailable: {e}")
+        logger.warning("⚠️ Warning: No native input backend available, using the mock")
+        return MockInputDriver()
+    if backend == 'ahk':
+        if ahk_exe is None:
+            raise ValueError("The ahk backend needs ahk_exe")
+        return AHKWorkerDriver(ahk_exe, os.path.join(script_dir, AHK_WORKER_SCRIPT))
+    if backend == 'sendinput':
+        return SendInputDriver()
+    if backend == 'mock':
+        return MockInputDriver()
+    raise ValueError(f"Unknown input backend {backend!r}, expected 'auto' or one of {BACKENDS}")
@@ -5,11 +5,44 @@ Updated to support the latest Blink SDK API in standard mode.
 """
 import os
 import ctypes
+import logging
 import warnings
+from concurrent.futures import ThreadPoolExecutor, wait
 import numpy as np
+from metrics import REGISTRY
+import patterns
 from slm import SLM
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_SDK_PATH = "C:\\Program Files\\Meadowlark Optics\\Blink OverDrive Plus\\"
+PAGE_SIZE = 4096
+
+
+def _aligned_zeros(shape, dtype, alignment=PAGE_SIZE):
+    """
+    Allocates a zeroed array whose data pointer is aligned to ``alignment`` bytes.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the array.
+    dtype : numpy.dtype
+        Data type of the array.
+    alignment : int
+        Alignment in bytes. Defaults to the page size so the buffer can be handed
+        to the driver for DMA without being bounced.
+
+    Returns
+    -------
+    numpy.ndarray
+        View into an over-allocated byte buffer, starting on an aligned address.
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.zeros(nbytes + alignment, dtype=np.uint8)
+    offset = (-raw.ctypes.data) % alignment
+    return raw[offset : offset + nbytes].view(dtype).reshape(shape)
 
 
 class Meadowlark(SLM):
@@ -26,6 +59,11 @@ class Meadowlark(SLM):
         Path of the Blink SDK folder.
     board_number : ctypes.c_uint
         The SLM board number, typically 1.
+    async_writes : bool
+        Whether frames are written by a background writer thread
+        (see :meth:`set_async_writes`).
+    last_ticket : concurrent.futures.Future OR None
+        Completion ticket of the most recently queued asynchronous write.
     """
 
     def __init__(
@@ -35,6 +73,9 @@ class Meadowlark(SLM):
         lut_path=None,
         wav_um=1,
         pitch_um=(8, 8),
+        slm_lib=None,
+        async_writes=False,
+        n_buffers=2,
         **kwargs,
     ):
         r"""
@@ -43,7 +84,7 @@ class Meadowlark(SLM):
         Arguments
         ---------
         verbose : bool
-            Whether to print extra information.
+            Whether to log progress at INFO level.
         sdk_path : str
             Path of the Blink SDK installation folder.
         lut_path : str OR None
@@ -53,61 +94,26 @@ class Meadowlark(SLM):
             Wavelength of operation in microns. Defaults to 1 um.
         pitch_um : (float, float)
             Pixel pitch in microns. Defaults to 8 micron square pixels.
+        slm_lib : object OR None
+            Object implementing the Blink C wrapper API to use instead of loading
+            the SDK libraries. DPI validation and ImageGen are skipped.
+            Useful to run against a stub library without hardware.
+        async_writes : bool
+            Whether to write frames from a background thread.
+            See :meth:`set_async_writes`. Defaults to ``False``.
+        n_buffers : int
+            Number of rotating display buffers used in asynchronous mode.
         **kwargs
             See :meth:`.SLM.__init__` for permissible options.
         """
-        # Validates the DPI awareness of this context
-        if verbose:
-            print("Validating DPI awareness...", end="")
-        awareness = ctypes.c_int()
-        error_get = ctypes.windll.shcore.GetProcessDpiAwareness(
-            0, ctypes.byref(awareness)
-        )
-        error_set = ctypes.windll.shcore.SetProcessDpiAwareness(2)
-        success = ctypes.windll.user32.SetProcessDPIAware()
-        if not success:
-            raise RuntimeError(
-                "Meadowlark failed to validate DPI awareness. "
-                "Errors: get={}, set={}, awareness={}".format(
-                    error_get, error_set, awareness.value
-                )
-            )
-        if verbose:
-            print("success")
-
-        # Open the SLM libraries
-        if verbose:
-            print("Loading Blink SDK libraries...", end="")
         self.sdk_path = sdk_path
-        blink_wrapper_path = os.path.join(sdk_path, "SDK", "Blink_C_wrapper")
-        image_gen_path = os.path.join(sdk_path, "SDK", "ImageGen")
-
-        try:
-            ctypes.cdll.LoadLibrary(blink_wrapper_path)
-            self.slm_lib = ctypes.CDLL("Blink_C_wrapper")
-
-            # Check if ImageGen exists and load it if available
-            if os.path.exists(image_gen_path) or os.path.exists(
-                image_gen_path + ".dll"
-            ):
-                ctypes.cdll.LoadLibrary(image_gen_path)
-                self.image_lib = ctypes.CDLL("ImageGen")
-                self.has_image_gen = True
-            else:
-                self.has_image_gen = False
-                if verbose:
-                    print(
-                        "(ImageGen library not found, pattern generation will be unavailable)",
-                        end="",
-                    )
-        except Exception as e:
-            print("failure")
-            raise ImportError(
-                f"Meadowlark libraries did not import correctly. "
-                f"Is '{blink_wrapper_path}' the correct path? Error: {e}"
-            )
-        if verbose:
-            print("success")
+        if slm_lib is None:
+            self._validate_dpi_awareness(verbose)
+            self._load_libraries(verbose)
+        else:
+            # Injected library (e.g. a stub for testing without hardware).
+            self.slm_lib = slm_lib
+            self.has_image_gen = False
 
         # Initialize SDK parameters
         self.board_number = ctypes.c_uint(1)
@@ -128,7 +134,7 @@ class Meadowlark(SLM):
 
         # Initialize the standard SDK
         if verbose:
-            print("Initializing SDK...", end="")
+            logger.info("Initializing SDK...")
         self.slm_lib.Create_SDK(
             bit_depth,
             ctypes.byref(num_boards_found),
@@ -151,13 +157,13 @@ class Meadowlark(SLM):
             else:
                 error_str = "SDK construction failed"
 
-            print("failure")
+            logger.error("SDK construction failed: %s", error_str)
             raise RuntimeError(
                 f"Blink SDK was not constructed successfully. Error: {error_str}"
             )
 
         if verbose:
-            print(f"success\nFound {num_boards_found.value} SLM controller(s)")
+            logger.info("Found %d SLM controller(s)", num_boards_found.value)
 
         # Get SLM dimensions
         width = self.slm_lib.Get_image_width(self.board_number)
@@ -166,17 +172,13 @@ class Meadowlark(SLM):
 
         # In standard mode, we need to load a LUT file
         if verbose:
-            print("Loading LUT file...", end="")
+            logger.info("Loading LUT file...")
         try:
             true_lut_path = self.load_lut(lut_path)
             if verbose:
-                if true_lut_path != lut_path:
-                    print(f"success\n(loaded from '{true_lut_path}')")
-                else:
-                    print("success")
+                logger.info("Loaded LUT file '%s'", true_lut_path)
         except RuntimeError as e:
-            if verbose:
-                print("failure\n(could not find .lut file)")
+            logger.error("Could not find .lut file")
             raise e
 
         # Construct other variables
@@ -195,9 +197,88 @@ class Meadowlark(SLM):
                 "verify that your settings are correct."
             )
 
+        # Page-aligned display buffer; Write_image reads straight from it.
+        self.display = _aligned_zeros(self.shape, self.dtype)
+
+        # Asynchronous writer state
+        self.async_writes = False
+        self.last_ticket = None
+        self._writer = None
+        self._buffers = [self.display]
+        self._buffer_tickets = [None]
+        self._buffer_index = 0
+        self._write_error = None
+        if async_writes:
+            self.set_async_writes(True, n_buffers)
+
         # Initialize with blank pattern
         self.set_phase(None)
 
+    @staticmethod
+    def _validate_dpi_awareness(verbose=True):
+        """
+        Makes this process DPI aware, which the Blink SDK requires.
+
+        Raises
+        ------
+        RuntimeError
+            If DPI awareness could not be set.
+        """
+        # Validates the DPI awareness of this context
+        if verbose:
+            logger.info("Validating DPI awareness...")
+        awareness = ctypes.c_int()
+        error_get = ctypes.windll.shcore.GetProcessDpiAwareness(
+            0, ctypes.byref(awareness)
+        )
+        error_set = ctypes.windll.shcore.SetProcessDpiAwareness(2)
+        success = ctypes.windll.user32.SetProcessDPIAware()
+        if not success:
+            raise RuntimeError(
+                "Meadowlark failed to validate DPI awareness. "
+                "Errors: get={}, set={}, awareness={}".format(
+                    error_get, error_set, awareness.value
+                )
+            )
+
+    def _load_libraries(self, verbose=True):
+        """
+        Loads the Blink C wrapper and, if present, the ImageGen library
+        from :attr:`sdk_path`.
+
+        Raises
+        ------
+        ImportError
+            If the Blink libraries could not be loaded.
+        """
+        # Open the SLM libraries
+        if verbose:
+            logger.info("Loading Blink SDK libraries...")
+        blink_wrapper_path = os.path.join(self.sdk_path, "SDK", "Blink_C_wrapper")
+        image_gen_path = os.path.join(self.sdk_path, "SDK", "ImageGen")
+
+        try:
+            ctypes.cdll.LoadLibrary(blink_wrapper_path)
+            self.slm_lib = ctypes.CDLL("Blink_C_wrapper")
+
+            # Check if ImageGen exists and load it if available
+            if os.path.exists(image_gen_path) or os.path.exists(
+                image_gen_path + ".dll"
+            ):
+                ctypes.cdll.LoadLibrary(image_gen_path)
+                self.image_lib = ctypes.CDLL("ImageGen")
+                self.has_image_gen = True
+            else:
+                self.has_image_gen = False
+                if verbose:
+                    logger.warning("ImageGen library not found, pattern generation will be unavailable")
+        except Exception as e:
+            logger.error("Could not load the Blink SDK libraries: %s", e)
+            raise ImportError(
+                f"Meadowlark libraries did not import correctly. "
+                f"Is '{blink_wrapper_path}' the correct path? Error: {e}"
+            )
+
     def load_lut(self, lut_path=None):
         """
         Loads a voltage 'look-up table' (LUT) to the SLM.
@@ -277,7 +358,7 @@ class Meadowlark(SLM):
         Parameters
         ----------
         verbose : bool
-            Whether to print the discovered information.
+            Whether to log the discovered information.
 
         Raises
         ------
@@ -294,14 +375,149 @@ class Meadowlark(SLM):
         Clean up and close the connection to the SLM.
         See :meth:`.SLM.close`.
         """
+        if self._writer is not None:
+            self.set_async_writes(False)
         self.isopen = False
         self.slm_lib.Delete_SDK()
 
+    def set_async_writes(self, enabled=True, n_buffers=2):
+        """
+        Enables or disables asynchronous writes.
+
+        In asynchronous mode, :meth:`_set_phase_hw` queues the frame to a single
+        background writer thread and returns immediately with a ticket, while
+        :attr:`display` rotates through ``n_buffers`` page-aligned buffers.
+        The next frame is therefore converted into a free buffer while the
+        previous one is still being transferred; a buffer is only reused once its
+        write has completed.
+
+        Parameters
+        ----------
+        enabled : bool
+            Whether to enable asynchronous writes.
+        n_buffers : int
+            Number of rotating display buffers, at least 2.
+        """
+        if enabled:
+            if self._writer is not None:
+                return
+            if n_buffers < 2:
+                raise ValueError("Asynchronous writes require at least 2 buffers.")
+            self._buffers = [self.display] + [
+                _aligned_zeros(self.shape, self.dtype) for _ in range(n_buffers - 1)
+            ]
+            self._buffer_tickets = [None] * n_buffers
+            self._buffer_index = 0
+            self._write_error = None
+            self._writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="meadowlark-writer"
+            )
+            self.async_writes = True
+        else:
+            if self._writer is None:
+                return
+            self.flush()
+            self._writer.shutdown(wait=True)
+            self._writer = None
+            self.async_writes = False
+            self._buffers = [self.display]
+            self._buffer_tickets = [None]
+            self._buffer_index = 0
+
+    def set_phase_async(self, phase, phase_correct=True):
+        """
+        Queues a frame for display and returns without waiting for the transfer.
+        See :meth:`.SLM.set_phase` for the parameters.
+        Asynchronous writes must be enabled (see :meth:`set_async_writes`).
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Ticket which completes once ``Write_image`` and ``ImageWriteComplete``
+            have returned. ``ticket.result(timeout)`` waits and re-raises errors.
+        """
+        if self._writer is None:
+            raise RuntimeError("Asynchronous writes are not enabled.")
+        self.set_phase(phase, phase_correct=phase_correct)
+        return self.last_ticket
+
+    def flush(self, timeout=None):
+        """
+        Waits for all queued asynchronous writes to complete.
+
+        Parameters
+        ----------
+        timeout : float OR None
+            Maximum time to wait in seconds.
+
+        Returns
+        -------
+        bool
+            Whether all writes completed within ``timeout``.
+        """
+        pending = [t for t in self._buffer_tickets if t is not None]
+        if self.last_ticket is not None:
+            pending.append(self.last_ticket)
+        _, not_done = wait(pending, timeout=timeout)
+        return len(not_done) == 0
+
+    def _prepare_display(self):
+        """
+        Rotates :attr:`display` to the next buffer in asynchronous mode, waiting
+        until that buffer is no longer being transferred.
+        """
+        if self._writer is None:
+            return
+        index = (self._buffer_index + 1) % len(self._buffers)
+        ticket = self._buffer_tickets[index]
+        if ticket is not None:
+            wait([ticket])
+        self._buffer_index = index
+        self.display = self._buffers[index]
+
     def _set_phase_hw(self, display):
         """
         Sends the phase pattern to the SLM hardware in standard mode.
         Implementation of abstract method from SLM base class.
 
+        In asynchronous mode the write is queued and a ticket is returned instead
+        (see :meth:`set_async_writes`).
+
+        Parameters
+        ----------
+        display : numpy.ndarray
+            The phase pattern to display on the SLM.
+
+        Returns
+        -------
+        concurrent.futures.Future OR None
+            Completion ticket in asynchronous mode.
+        """
+        if self._writer is None:
+            self._write_image(display)
+            return None
+
+        # Surface errors from previously queued writes.
+        if self._write_error is not None:
+            error, self._write_error = self._write_error, None
+            raise error
+
+        ticket = self._writer.submit(self._write_image, display)
+        ticket.add_done_callback(self._record_write_error)
+        if display is self._buffers[self._buffer_index]:
+            self._buffer_tickets[self._buffer_index] = ticket
+        self.last_ticket = ticket
+        return ticket
+
+    def _record_write_error(self, ticket):
+        """Keeps the error of a failed asynchronous write for the next call."""
+        if not ticket.cancelled() and ticket.exception() is not None:
+            self._write_error = ticket.exception()
+
+    def _write_image(self, display):
+        """
+        Transfers ``display`` with ``Write_image`` and waits for ``ImageWriteComplete``.
+
         Parameters
         ----------
         display : numpy.ndarray
@@ -315,22 +531,24 @@ class Meadowlark(SLM):
         total_bytes = display.size * bytes_per_pixel
 
         # Write the image using standard mode
-        ret_val = self.slm_lib.Write_image(
-            self.board_number,
-            display.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte)),
-            total_bytes,
-            self.wait_for_trigger,
-            self.flip_immediate,
-            self.output_pulse_image_flip,
-            self.output_pulse_image_refresh,
-            self.timeout_ms,
-        )
+        with REGISTRY.timer("slm_write_image_seconds", "Blink Write_image (DMA transfer)"):
+            ret_val = self.slm_lib.Write_image(
+                self.board_number,
+                display.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte)),
+                total_bytes,
+                self.wait_for_trigger,
+                self.flip_immediate,
+                self.output_pulse_image_flip,
+                self.output_pulse_image_refresh,
+                self.timeout_ms,
+            )
 
         if ret_val == -1:
             raise RuntimeError("Failed to write image to SLM (DMA failed)")
 
         # Check if the SLM is ready for the next image
-        ret_val = self.slm_lib.ImageWriteComplete(self.board_number, self.timeout_ms)
+        with REGISTRY.timer("slm_image_write_complete_seconds", "Blink ImageWriteComplete wait"):
+            ret_val = self.slm_lib.ImageWriteComplete(self.board_number, self.timeout_ms)
         if ret_val == -1:
             warnings.warn("SLM may not be ready for next image (trigger issue?)")
 
@@ -350,6 +568,10 @@ class Meadowlark(SLM):
         """
         Generate common phase patterns using the ImageGen library.
 
+        Without ImageGen, or for types ImageGen does not provide, the pattern is
+        computed by :func:`patterns.generate_pattern` ('fresnel', 'microlens',
+        'grating', 'lg'); ``kwargs`` are then its parameters.
+
         Parameters
         ----------
         pattern_type : str
@@ -364,13 +586,23 @@ class Meadowlark(SLM):
 
         Raises
         ------
-        RuntimeError
-            If ImageGen library is not available or pattern type is not supported.
+        ValueError
+            If the pattern type is not supported.
         """
-        if not self.has_image_gen:
-            raise RuntimeError(
-                "ImageGen library not available. Pattern generation not possible."
-            )
+        if not self.has_image_gen or pattern_type.lower() != "lg":
+            params = dict(kwargs, type=pattern_type)
+            if pattern_type.lower() == "lg":
+                # Accept the ImageGen argument names; like ImageGen, cover the whole SLM
+                for old, new in (("charge", "l"), ("center_x", "roi_center_x"), ("center_y", "roi_center_y")):
+                    if old in params:
+                        params[new] = params.pop(old)
+                params.setdefault("roi_center_x", self.shape[1] // 2)
+                params.setdefault("roi_center_y", self.shape[0] // 2)
+                params.setdefault("N", None)
+                params.pop("rgb", None)
+                if params.pop("fork", 0):
+                    raise ValueError("Fork LG patterns require the ImageGen library")
+            return patterns.generate_pattern(self.shape, params)
 
         width = self.slm_lib.Get_image_width(self.board_number)
         height = self.slm_lib.Get_image_height(self.board_number)
@@ -415,8 +647,6 @@ class Meadowlark(SLM):
                     ctypes.c_uint(fork),
                     ctypes.c_uint(rgb),
                 )
-        else:
-            raise ValueError(f"Pattern type '{pattern_type}' not supported")
 
         # Reshape to 2D array
         return pattern.reshape((height, width))
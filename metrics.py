@@ -0,0 +1,273 @@
+# metrics.py
+
+"""
+Low-overhead runtime metrics for the hardware server.
+
+Histograms keep cumulative counts in fixed log-spaced buckets (for Prometheus)
+plus a ring buffer of the most recent samples (for percentiles). Counters count
+events and gauges track values such as the number of calls in flight.
+
+Everything registers in the process-wide REGISTRY:
+
+    with REGISTRY.timer('slm_write_image_seconds'):
+        lib.Write_image(...)
+
+The server returns REGISTRY.snapshot() from exposed_get_metrics and
+REGISTRY.prometheus() for scraping.
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+import numpy as np
+
+# Latency bucket upper bounds in seconds: 10 us to ~100 s, 4 per decade
+LATENCY_BUCKETS = tuple(float(f"{10 ** (e / 4):.3g}") for e in range(-20, 9))
+# Number of recent samples kept per histogram for percentiles
+RING_SIZE = 1024
+
+
+class Counter:
+    """Monotonic event counter"""
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """Value that goes up and down (e.g. calls in flight, queue depth)"""
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Bucketed distribution with a ring buffer of recent samples"""
+
+    def __init__(self, name, help_text="", buckets=LATENCY_BUCKETS, ring_size=RING_SIZE):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)    # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._ring = np.zeros(ring_size)
+        self._ring_index = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[i] += 1
+            self.count += 1
+            self.sum += value
+            self._ring[self._ring_index % len(self._ring)] = value
+            self._ring_index += 1
+
+    def reset(self):
+        with self._lock:
+            self.bucket_counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self._ring_index = 0
+
+    def recent(self):
+        """Copy of the most recent samples (up to the ring size), oldest first"""
+        with self._lock:
+            n = min(self._ring_index, len(self._ring))
+            start = self._ring_index % len(self._ring) if self._ring_index > n else 0
+            return np.roll(self._ring, -start)[:n].copy()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: count, sum, mean, and p50/p90/p99/max over the recent samples
+        """
+        samples = self.recent()
+        stats = {'count': self.count, 'sum': self.sum,
+                 'mean': self.sum / self.count if self.count else None}
+        if len(samples):
+            p50, p90, p99 = np.percentile(samples, (50, 90, 99))
+            stats.update(p50=float(p50), p90=float(p90), p99=float(p99),
+                         max=float(samples.max()))
+        return stats
+
+
+class MetricsRegistry:
+    """Named collection of counters, gauges and histograms"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help_text)
+        if not isinstance(metric, cls):
+            raise TypeError(f"Metric {name} is a {type(metric).__name__}, not a {cls.__name__}")
+        return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text=""):
+        return self._get(Histogram, name, help_text)
+
+    def timer(self, name, help_text=""):
+        """
+        Context manager timing its block into histogram ``name`` (seconds) and
+        counting it in gauge ``<name without _seconds>_in_flight`` meanwhile.
+        """
+        return _Timer(self.histogram(name, help_text),
+                      self.gauge(_in_flight_name(name)))
+
+    def clear(self):
+        """
+        Zero counters and histograms in place. Registered metrics stay valid for
+        the code holding them; gauges keep their value since they track current
+        state (queue depth, calls in flight) rather than accumulated history.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            if not isinstance(metric, Gauge):
+                metric.reset()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {'counters': {...}, 'gauges': {...}, 'histograms': {name: stats}}
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        for metric in metrics:
+            kind = {Counter: 'counters', Gauge: 'gauges', Histogram: 'histograms'}[type(metric)]
+            snapshot[kind][metric.name] = metric.snapshot()
+        return snapshot
+
+    def prometheus(self, prefix="slm_server_"):
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            name = prefix + metric.name
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            if isinstance(metric, Histogram):
+                lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), metric.bucket_counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum {metric.sum}")
+                lines.append(f"{name}_count {metric.count}")
+            else:
+                kind = 'counter' if isinstance(metric, Counter) else 'gauge'
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+def _in_flight_name(name):
+    return (name[:-len('_seconds')] if name.endswith('_seconds') else name) + '_in_flight'
+
+
+class _Timer:
+    __slots__ = ('histogram', 'in_flight', 't0')
+
+    def __init__(self, histogram, in_flight):
+        self.histogram = histogram
+        self.in_flight = in_flight
+
+    def __enter__(self):
+        self.in_flight.inc()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.t0)
+        self.in_flight.dec()
+        return False
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(name, help_text=""):
+    """Decorator timing every call of a function into histogram ``name``"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with REGISTRY.timer(name, help_text):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_exposed(cls):
+    """
+    Class decorator for rpyc services: times every ``exposed_*`` method into
+    ``rpc_<name>_seconds``, with ``rpc_<name>_in_flight`` and an
+    ``rpc_<name>_errors`` counter for exceptions raised to the client.
+    """
+    for attr, fn in list(vars(cls).items()):
+        if not attr.startswith('exposed_') or not callable(fn):
+            continue
+        name = attr[len('exposed_'):]
+
+        def make_wrapper(fn, name):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with REGISTRY.timer(f"rpc_{name}_seconds", f"Latency of {name} calls"):
+                    try:
+                        return fn(*args, **kwargs)
+                    except Exception:
+                        REGISTRY.counter(f"rpc_{name}_errors", f"Exceptions raised by {name}").inc()
+                        raise
+            return wrapper
+
+        setattr(cls, attr, make_wrapper(fn, name))
+    return cls
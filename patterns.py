@@ -0,0 +1,251 @@
+# patterns.py
+
+"""
+Vectorized phase pattern generation on the server.
+
+Clients send a small parameter dict instead of a full frame:
+
+    {'type': 'fresnel', 'focal_length': 0.06}
+    {'type': 'microlens', 'M': 7, 'focal_length': 0.06}
+    {'type': 'grating', 'period_x': 8, 'period_y': 0}
+    {'type': 'lg', 'l': 3, 'p': 0}
+
+Missing parameters default to the values in config.py (wavelength, pixel size,
+focal length, M, two_pi_value, ROI center and size N). The phase is computed
+inside the N x N ROI around (roi_center_y, roi_center_x) (the whole frame if N
+is None), wrapped to [0, 2*pi) and mapped to gray levels with two_pi_value as
+the gray level of 2*pi; pixels outside the ROI are 0.
+
+Coordinates are built as 1-D row/column axes. Lenses and gratings are separable
+(phase(y, x) = row term + column term), so each term is wrapped on its axis and
+the frame costs a single add-and-wrap pass.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import config
+
+PATTERN_DEFAULTS = {
+    'wavelength': config.WAVELENGTH,
+    'pixel_size': config.PIXEL_SIZE,
+    'focal_length': config.COMMON_DEFAULTS['focal_length'],
+    'two_pi_value': config.COMMON_DEFAULTS['two_pi_value'],
+    'roi_center_y': config.COMMON_DEFAULTS['roi_center_y'],
+    'roi_center_x': config.COMMON_DEFAULTS['roi_center_x'],
+    'N': config.COMMON_DEFAULTS['N'],
+}
+
+# Type-specific parameters and their defaults
+TYPE_DEFAULTS = {
+    'fresnel': {},
+    'microlens': {'M': config.COMMON_DEFAULTS['M']},
+    'grating': {'period_x': 8.0, 'period_y': 0.0},      # pixels per 2*pi, 0 = flat
+    'lg': {'l': 1, 'p': 0, 'waist': None},              # waist in m, default N/4 pixels
+}
+PATTERN_TYPES = tuple(TYPE_DEFAULTS)
+
+# Parameter sets remembered by PatternGenerator (frames themselves live in the frame cache)
+PATTERN_CACHE_ENTRIES = 4096
+
+
+def normalize_params(params):
+    """
+    Fill in defaults and validate a parameter dict.
+
+    Args:
+        params: Dict (or (key, value) pairs) with at least 'type'
+
+    Returns:
+        dict: Complete parameters
+
+    Raises:
+        ValueError: For unknown types or parameters
+    """
+    params = dict(params)
+    kind = str(params.pop('type', '')).lower()
+    if kind not in TYPE_DEFAULTS:
+        raise ValueError(f"Unknown pattern type {kind!r}, expected one of {PATTERN_TYPES}")
+    full = dict(PATTERN_DEFAULTS, **TYPE_DEFAULTS[kind])
+    unknown = set(params) - set(full)
+    if unknown:
+        raise ValueError(f"Unknown parameters for {kind} pattern: {sorted(unknown)}")
+    full.update(params)
+    full['type'] = kind
+    return full
+
+
+def _roi_axes(shape, params):
+    """
+    Pixel offsets from the ROI center as a (1, W) row and a (H, 1) column,
+    plus the matching 1-D ROI masks (None when the ROI is the whole frame).
+    """
+    height, width = shape
+    x = np.arange(width) - float(params['roi_center_x'])
+    y = np.arange(height) - float(params['roi_center_y'])
+    n = params['N']
+    if n is None or n <= 0:
+        return x[None, :], y[:, None], None, None
+    half = n / 2
+    inside_x = (x >= -half) & (x < half)
+    inside_y = (y >= -half) & (y < half)
+    return x[None, :], y[:, None], inside_x[None, :], inside_y[:, None]
+
+
+def _lens_phase(x, y, params):
+    """Thin lens phase -pi r^2 / (lambda f) for pixel offsets x, y, as (column, row) terms"""
+    scale = -math.pi * params['pixel_size'] ** 2 / (params['wavelength'] * params['focal_length'])
+    return scale * (x * x), scale * (y * y)
+
+
+def fresnel_phase(shape, params):
+    x, y, _, _ = _roi_axes(shape, params)
+    return _lens_phase(x, y, params)
+
+
+def microlens_phase(shape, params):
+    """M x M lenses tiling the N x N ROI, each centered in its cell"""
+    x, y, _, _ = _roi_axes(shape, params)
+    n = params['N'] or min(shape)
+    cell = n / int(params['M'])
+    # Offsets from the center of the cell each pixel falls in
+    local_x = (x + n / 2) % cell - cell / 2
+    local_y = (y + n / 2) % cell - cell / 2
+    return _lens_phase(local_x, local_y, params)
+
+
+def grating_phase(shape, params):
+    """Blazed grating with the given periods in pixels (0 for no tilt along an axis)"""
+    x, y, _, _ = _roi_axes(shape, params)
+    fx = 2 * math.pi / params['period_x'] if params['period_x'] else 0.0
+    fy = 2 * math.pi / params['period_y'] if params['period_y'] else 0.0
+    return fx * x, fy * y
+
+
+def lg_phase(shape, params):
+    """
+    Laguerre-Gaussian mode LG_p^l: l times the azimuth plus pi where the
+    generalized Laguerre polynomial L_p^|l|(2 r^2 / w^2) is negative.
+    """
+    x, y, _, _ = _roi_axes(shape, params)
+    x, y = x.astype(np.float32), y.astype(np.float32)
+    phase = int(params['l']) * np.arctan2(y, x)
+    p = int(params['p'])
+    if p > 0:
+        waist = params['waist']
+        n = params['N'] or min(shape)
+        waist_px = n / 4 if waist is None else waist / params['pixel_size']
+        rho = 2 * (x * x + y * y) / np.float32(waist_px ** 2)
+        a = abs(int(params['l']))
+        previous, laguerre = np.ones_like(rho), 1 + a - rho
+        for k in range(1, p):
+            previous, laguerre = laguerre, ((2 * k + 1 + a - rho) * laguerre - (k + a) * previous) / (k + 1)
+        phase = phase + np.float32(math.pi) * (laguerre < 0)
+    return phase
+
+
+PHASE_FUNCTIONS = {
+    'fresnel': fresnel_phase,
+    'microlens': microlens_phase,
+    'grating': grating_phase,
+    'lg': lg_phase,
+}
+
+
+def phase_to_gray(phase, two_pi_value, out=None):
+    """
+    Wrap a phase (radians) to [0, 2*pi) and map it to gray levels.
+
+    Args:
+        phase: Float phase array (modified in place)
+        two_pi_value: Gray level corresponding to a 2*pi phase shift
+        out: Optional uint8 output array
+
+    Returns:
+        np.ndarray: uint8 gray levels
+    """
+    phase *= np.float32(two_pi_value / (2 * math.pi))
+    np.mod(phase, np.float32(two_pi_value), out=phase)
+    if out is None:
+        out = np.empty(phase.shape, np.uint8)
+    np.copyto(out, phase, casting='unsafe')
+    return out
+
+
+def generate_pattern(shape, params):
+    """
+    Compute a pattern.
+
+    Args:
+        shape: (height, width) of the SLM
+        params: Pattern parameters (see module docstring)
+
+    Returns:
+        np.ndarray: uint8 frame
+    """
+    params = normalize_params(params)
+    two_pi_value = params['two_pi_value']
+    phase = PHASE_FUNCTIONS[params['type']](shape, params)
+    if isinstance(phase, tuple):
+        # Separable: wrap the column and row terms, then one add-and-wrap over the frame
+        column, row = (np.mod(term * (two_pi_value / (2 * math.pi)), two_pi_value).astype(np.float32)
+                       for term in phase)
+        for term in (column, row):
+            term[term >= two_pi_value] = 0      # float32 rounding up to exactly 2*pi
+        level = column + row
+        np.subtract(level, np.float32(two_pi_value), out=level, where=level >= two_pi_value)
+        gray = np.empty(shape, np.uint8)
+        np.copyto(gray, level, casting='unsafe')
+    else:
+        gray = phase_to_gray(np.broadcast_to(phase, shape).astype(np.float32), two_pi_value)
+    _, _, inside_x, inside_y = _roi_axes(shape, params)
+    if inside_x is not None:
+        gray[~(inside_y & inside_x)] = 0
+    return gray
+
+
+class PatternGenerator:
+    """Generates patterns for one SLM and caches them in a FrameCache by parameters"""
+
+    def __init__(self, shape, frame_cache):
+        """
+        Args:
+            shape: (height, width) of the SLM
+            frame_cache: hardware.FrameCache holding the generated frames
+        """
+        self.shape = tuple(shape)
+        self.frame_cache = frame_cache
+        self._digests = OrderedDict()       # parameter key -> frame digest
+        self._lock = threading.Lock()
+        self.generated = 0
+
+    @staticmethod
+    def _key(params):
+        return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+
+    def get(self, params):
+        """
+        Pattern for a parameter set, from the cache if it was generated before.
+
+        Returns:
+            tuple: (digest, read-only uint8 frame)
+        """
+        key = self._key(normalize_params(params))
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is not None:
+            frame = self.frame_cache.get(digest)
+            if frame is not None:
+                return digest, frame
+
+        frame = generate_pattern(self.shape, params)
+        digest = self.frame_cache.put(frame, frame.shape, frame.dtype.str)
+        with self._lock:
+            self._digests[key] = digest
+            self._digests.move_to_end(key)
+            while len(self._digests) > PATTERN_CACHE_ENTRIES:
+                self._digests.popitem(last=False)
+            self.generated += 1
+        return digest, self.frame_cache.get(digest)
@@ -0,0 +1,245 @@
+# readiness.py
+
+"""
+Per-device readiness tracking for parallel hardware startup.
+
+Each device (SLM, stages, input driver, ...) is initialized by a worker thread
+started with DeviceReadiness.start(). The rpyc server accepts connections right
+away; exposed methods decorated with @requires('slm') wait for the device's
+readiness event (up to READY_TIMEOUT_S) and raise DeviceNotReady if it failed
+or is still initializing. Over rpyc the exception is re-raised in the client;
+methods that return False/None on hardware errors do so only once their device
+is ready.
+
+A failed device is initialized again with DeviceReadiness.retry(), which also
+re-runs the failed devices that require it (e.g. 'sequence' after 'slm').
+"""
+
+import functools
+import logging
+import threading
+import time
+
+from events import BUS
+
+logger = logging.getLogger(__name__)
+
+# How long calls wait for a device that is still initializing (0 fails fast)
+READY_TIMEOUT_S = 30.0
+
+PENDING = 'pending'
+INITIALIZING = 'initializing'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class DeviceNotReady(RuntimeError):
+    """A device is still initializing or failed to initialize"""
+
+
+class _Device:
+    def __init__(self):
+        self.state = PENDING
+        self.error = None
+        self.t_start = None
+        self.seconds = None
+        self.event = threading.Event()      # set once initialization finished, ready or failed
+        self.init = None                    # initialization callable, kept for retry()
+        self.requires = ()
+
+
+class DeviceReadiness:
+    """Registry of device initialization threads and their outcome"""
+
+    def __init__(self):
+        self._devices = {}
+        self._lock = threading.Lock()
+        self.timeout = READY_TIMEOUT_S
+
+    def _device(self, name, create=True):
+        with self._lock:
+            device = self._devices.get(name)
+            if device is None and create:
+                device = self._devices[name] = _Device()
+            return device
+
+    def reset(self):
+        """Forget all devices (before a new init_hardware)"""
+        with self._lock:
+            self._devices.clear()
+
+    def start(self, name, init, requires=()):
+        """
+        Run ``init()`` in a worker thread and track its outcome as device ``name``.
+
+        Args:
+            name: Device name, e.g. 'slm' or 'stage_2'
+            init: Callable doing the initialization; raising marks the device failed
+            requires: Devices that must be ready before ``init`` runs
+
+        Returns:
+            threading.Thread: The started worker
+        """
+        device = self._device(name)
+        device.init = init
+        device.requires = tuple(requires)
+        return self._launch(name, device)
+
+    def _launch(self, name, device):
+        def run():
+            try:
+                for dependency in device.requires:
+                    self.wait(dependency, timeout=None)
+                device.state = INITIALIZING
+                device.t_start = time.perf_counter()
+                device.init()
+            except Exception as e:
+                self.set_failed(name, e)
+            else:
+                self.set_ready(name)
+
+        thread = threading.Thread(target=run, name=f"init-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def retry(self, name):
+        """
+        Run the initialization of a failed device again, together with the failed
+        devices depending on it (directly or not), which wait for it as at startup.
+
+        Args:
+            name: Device name
+
+        Returns:
+            list: Names of the restarted devices, ``name`` first
+
+        Raises:
+            KeyError: If the device was never started
+            RuntimeError: If the device did not fail
+        """
+        with self._lock:
+            device = self._devices.get(name)
+            if device is None or device.init is None:
+                raise KeyError(f"Unknown device {name}")
+            if device.state != FAILED:
+                raise RuntimeError(f"{name} is {device.state}, only failed devices can be retried")
+            restart = [name]
+            grown = True
+            while grown:
+                grown = False
+                for other_name, other in self._devices.items():
+                    if (other_name not in restart and other.state == FAILED
+                            and any(dependency in restart for dependency in other.requires)):
+                        restart.append(other_name)
+                        grown = True
+            for restarted in restart:
+                other = self._devices[restarted]
+                other.state = PENDING
+                other.error = None
+                other.event.clear()
+        logger.info(f"🔁 Retrying initialization of {', '.join(restart)}")
+        for restarted in restart:
+            self._launch(restarted, self._devices[restarted])
+        return restart
+
+    def set_ready(self, name):
+        device = self._device(name)
+        if device.t_start is not None:
+            device.seconds = time.perf_counter() - device.t_start
+        device.state = READY
+        device.error = None
+        device.event.set()
+        BUS.publish('device', source=name, state=READY, seconds=device.seconds)
+        logger.info(f"✅ {name} ready" + (f" in {device.seconds:.2f} s" if device.seconds else ""))
+
+    def set_failed(self, name, error):
+        device = self._device(name)
+        if device.t_start is not None:
+            device.seconds = time.perf_counter() - device.t_start
+        device.state = FAILED
+        device.error = str(error)
+        device.event.set()
+        BUS.publish('device', source=name, state=FAILED, error=device.error, seconds=device.seconds)
+        logger.warning(f"⚠️ Warning: {name} failed to initialize: {error}")
+
+    def is_ready(self, name):
+        device = self._device(name, create=False)
+        return device is not None and device.state == READY
+
+    def wait_settled(self, name, timeout=-1):
+        """
+        Wait until the initialization of ``name`` finished, successfully or not.
+        Devices that were never started count as settled.
+
+        Args:
+            timeout: Seconds, None waits forever, -1 uses :attr:`timeout`
+
+        Returns:
+            bool: False on timeout
+        """
+        device = self._device(name, create=False)
+        if device is None:
+            return True
+        return device.event.wait(self.timeout if timeout == -1 else timeout)
+
+    def wait(self, name, timeout=-1):
+        """
+        Wait until ``name`` is ready. Devices that were never started pass.
+
+        Args:
+            timeout: Seconds, None waits forever, -1 uses :attr:`timeout`
+
+        Raises:
+            DeviceNotReady: If the device failed or is still initializing at the timeout
+        """
+        device = self._device(name, create=False)
+        if device is None or device.state == READY:
+            return
+        if not device.event.wait(self.timeout if timeout == -1 else timeout):
+            raise DeviceNotReady(f"{name} is still initializing")
+        if device.state != READY:
+            raise DeviceNotReady(f"{name} failed to initialize: {device.error}")
+
+    def wait_all(self, timeout=None):
+        """
+        Wait for all started devices to finish initializing (ready or failed).
+
+        Returns:
+            bool: False on timeout
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._lock:
+            devices = list(self._devices.values())
+        for device in devices:
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            if not device.event.wait(remaining):
+                return False
+        return True
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Device name -> {'state', 'error', 'seconds'}
+        """
+        with self._lock:
+            devices = dict(self._devices)
+        return {name: {'state': d.state, 'error': d.error, 'seconds': d.seconds}
+                for name, d in devices.items()}
+
+
+READINESS = DeviceReadiness()
+
+
+def requires(*names):
+    """
+    Decorator for exposed methods using a device: waits for it to be ready
+    (up to READINESS.timeout) and raises DeviceNotReady otherwise.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            for name in names:
+                READINESS.wait(name)
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -6,12 +6,34 @@
 import rpyc
 from rpyc.utils.server import ThreadedServer
 import numpy as np
-import subprocess
 import os
 from hardware import SLMManager
-from thorlabs_stage import ThorlabsStage
+from thorlabs_stage import ThorlabsStage, move_many
+from sequence import SequencePlayer
+from scan import ScanEngine, normalize_spec, plan_scan, scan_id
+from frame_channel import FrameChannelServer, FRAME_CHANNEL_PORT
+from input_driver import create_input_driver
+from trigger import make_trigger, display_then_trigger
+from patterns import PATTERN_DEFAULTS, TYPE_DEFAULTS
 import signal
 import sys
+import argparse
+import socket
+import threading
+import time
+import logging
+import logging.handlers
+import queue
+import functools
+import inspect
+import json
+import tempfile
+from metrics import REGISTRY, instrument_exposed
+from readiness import READINESS, DeviceNotReady, requires
+from events import BUS, install_error_events
+from executor import PRIORITY_HIGH
+
+logger = logging.getLogger(__name__)
 
 # ============== AHK Configuration ==============
 AHK_EXE = r'C:\Program Files\AutoHotkey\AutoHotkey.exe'
@@ -20,65 +42,97 @@ AHK_CAPTURE_SCRIPT = 'capture_position.ahk'
 AHK_CLICK_SCRIPT = 'click_at.ahk'
 AHK_CONFIG_FILE = 'click_position.ini'
 
+# ============== Server Configuration ==============
+SERVER_PORT = 18861
+
+# Stage type definitions
+STAGE_CONFIGS = {
+    1: "PRM1-Z8",   # Rotation stage
+    2: "Z825B",     # Z-axis linear stage
+}
+
+# Status polling interval per stage (ms); positions are answered from the polled cache
+STAGE_POLLING_MS = {
+    1: 250,
+    2: 250,
+}
+
+# Scan progress checkpoints, for resuming interrupted scans (simulated servers use the temp dir)
+SCAN_CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scan_checkpoints')
+
+# Sampling interval of the slm.temperature event while anyone subscribes to it
+SLM_TEMPERATURE_INTERVAL_S = 5.0
+
+# Hardware managers, created by init_hardware()
+global_simulate = False
+global_slm_manager = None
+global_stages = {}
+global_ahk_manager = None
+global_sequence_player = None
+global_scan_engine = None
+global_frame_channel = None
+global_trigger = None
+
 
 class AHKManager:
-    """Local AutoHotkey script manager"""
+    """Local mouse automation (click / capture position) through a persistent input driver"""
     
-    def __init__(self, ahk_exe=AHK_EXE, script_dir=AHK_SCRIPT_DIR):
+    def __init__(self, ahk_exe=AHK_EXE, script_dir=AHK_SCRIPT_DIR, backend='auto'):
+        """
+        Args:
+            ahk_exe: AutoHotkey executable
+            script_dir: Directory of the AHK scripts
+            backend: Input backend, 'auto', 'ahk', 'sendinput' or 'mock' (see input_driver.py)
+        """
         self.ahk_exe = ahk_exe
         self.script_dir = script_dir
         self.capture_script = os.path.join(script_dir, AHK_CAPTURE_SCRIPT)
         self.click_script = os.path.join(script_dir, AHK_CLICK_SCRIPT)
         self.config_file = os.path.join(script_dir, AHK_CONFIG_FILE)
-        
-        # Verify AHK executable exists
-        if not os.path.exists(self.ahk_exe):
-            print(f"⚠️ Warning: AutoHotkey not found at {self.ahk_exe}")
-        else:
-            print(f"✅ AHK Manager initialized")
-            print(f"   AHK executable: {self.ahk_exe}")
-            print(f"   Script directory: {self.script_dir}")
+        self.driver = create_input_driver(backend, ahk_exe, script_dir)
+        logger.info(f"✅ AHK Manager initialized ({self.driver.name} input backend)")
+
+    @property
+    def backend(self):
+        return self.driver.name
 
-    def capture_position(self):
+    def capture_position(self, timeout=None):
         """
-        Run capture_position.ahk and read the captured coordinates.
+        Wait for a left click and return its screen coordinates.
+
+        The position is also saved to click_position.ini for click_position.ahk.
         
+        Args:
+            timeout: Seconds to wait for the click, None waits forever (at most
+                input_driver.CAPTURE_TIMEOUT with the AutoHotkey backend)
+
         Returns:
             tuple: (x, y) coordinates, or None if capture failed
         """
         try:
-            # Run capture script
-            cmd = f'"{self.ahk_exe}" "{self.capture_script}"'
-            print(f"🎯 Running: {cmd}")
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"❌ AHK capture script failed: {result.stderr}")
-                return None
-            
-            # Read coordinates from config file
-            if not os.path.exists(self.config_file):
-                print(f"❌ Config file not found: {self.config_file}")
+            logger.info(f"🎯 Waiting for a click to capture...")
+            with REGISTRY.timer("input_capture_seconds", "Waiting for a captured click"):
+                position = self.driver.capture_position(timeout)
+            if position is None:
+                logger.error(f"❌ No click captured within {timeout} s")
                 return None
-            
-            with open(self.config_file, 'r') as f:
-                lines = f.readlines()
-                if len(lines) >= 2:
-                    pos_x = int(float(lines[0].strip()))
-                    pos_y = int(float(lines[1].strip()))
-                    print(f"📍 Captured position: ({pos_x}, {pos_y})")
-                    return (pos_x, pos_y)
-                else:
-                    print(f"❌ Invalid config file format")
-                    return None
+
+            pos_x, pos_y = position
+            try:
+                with open(self.config_file, 'w') as f:
+                    f.write(f"{pos_x}\n{pos_y}")
+            except OSError as e:
+                logger.warning(f"⚠️ Warning: Could not save position to {self.config_file}: {e}")
+            logger.info(f"📍 Captured position: ({pos_x}, {pos_y})")
+            return (pos_x, pos_y)
                     
         except Exception as e:
-            print(f"❌ Error capturing position: {e}")
+            logger.error(f"❌ Error capturing position: {e}")
             return None
 
     def click_at(self, x, y):
         """
-        Run click_at.ahk to click at the specified coordinates.
+        Left click at the specified screen coordinates.
         
         Args:
             x: X coordinate
@@ -88,99 +142,746 @@ class AHKManager:
             bool: True if click was successful
         """
         try:
-            cmd = f'"{self.ahk_exe}" "{self.click_script}" {x} {y}'
-            print(f"🖱️ Running: {cmd}")
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"❌ AHK click script failed: {result.stderr}")
-                return False
-            
-            print(f"✅ Clicked at ({x}, {y})")
+            with REGISTRY.timer("input_click_seconds", "Mouse click through the input driver"):
+                self.driver.click(x, y)
+            logger.debug(f"🖱️ Clicked at ({x}, {y})")
             return True
             
         except Exception as e:
-            print(f"❌ Error clicking: {e}")
+            logger.error(f"❌ Error clicking: {e}")
             return False
 
+    def close(self):
+        """Stop the input driver (ends the AHK worker process)"""
+        self.driver.close()
+
 
+def _after_stage_init(fn):
+    """
+    Let a stage call wait until the startup connection attempt of its stage
+    finished (successfully or not; failed stages can still be connected on demand).
+    Raises DeviceNotReady if it is still initializing after READINESS.timeout.
+    """
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        name = f"stage_{bound.arguments['stage_type']}"
+        if not READINESS.wait_settled(name):
+            raise DeviceNotReady(f"{name} is still initializing")
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+@instrument_exposed
 class HardwareService(rpyc.Service):
-    """Combined service for SLM, Stage, and AHK control"""
+    """
+    Combined service for SLM, Stage, and AHK control.
+
+    Methods using a device raise DeviceNotReady (re-raised in the client by rpyc)
+    while it is still initializing after READINESS.timeout, and, for devices other
+    than the stages, when it failed to initialize; failed devices can be
+    initialized again with retry_device. Hardware errors of a ready device are
+    still reported by returning False/None.
+    """
     
     def on_connect(self, conn):
-        print("🔗 Remote connected")
+        self._subscriptions = set()
+        logger.info("🔗 Remote connected")
 
     def on_disconnect(self, conn):
-        print("🔌 Remote disconnected")
+        for sid in self._subscriptions:
+            BUS.unsubscribe(sid)
+        logger.info("🔌 Remote disconnected")
+
+    # ============== Events ==============
+    def exposed_subscribe(self, topics=None, callback=None, max_pending=1000):
+        """
+        Subscribe to hardware events (see events.py for the topics).
+
+        Args:
+            topics: Topic prefixes, e.g. ('stage', 'slm.frame'); None for all
+            callback: Remote callable receiving batches of events as a JSON list.
+                The client must serve its connection (rpyc.BgServingThread).
+                Without a callback, fetch events with poll_events.
+            max_pending: Buffered events before the oldest are dropped (the
+                latest position/frame/temperature events are always kept)
+
+        Returns:
+            int: Subscription id, valid until unsubscribe or disconnect
+        """
+        topics = None if topics is None else tuple(str(t) for t in topics)
+        deliver = None
+        if callback is not None:
+            def deliver(events):
+                callback(json.dumps(events, default=str))
+        subscription = BUS.subscribe(topics, deliver, int(max_pending))
+        self._subscriptions.add(subscription.id)
+        return subscription.id
+
+    def exposed_poll_events(self, subscription_id, timeout=1.0):
+        """
+        Long poll: wait up to ``timeout`` s for events of a callback-less subscription.
+
+        Returns:
+            str: JSON list of events (empty on timeout)
+        """
+        return json.dumps(BUS.poll(subscription_id, timeout), default=str)
+
+    def exposed_unsubscribe(self, subscription_id):
+        self._subscriptions.discard(subscription_id)
+        return BUS.unsubscribe(subscription_id)
+
+    def exposed_event_stats(self):
+        """
+        Returns:
+            dict: Subscription id -> topics, pending, delivered, coalesced, dropped
+        """
+        return BUS.stats()
 
     # ============== SLM Functions ==============
-    def exposed_upload_frame(self, data_bytes, shape, dtype_str):
-        """Upload phase pattern to SLM"""
+    @requires('slm')
+    def exposed_upload_frame(self, data_bytes, shape, dtype_str, encoding=None, meta=None):
+        """
+        Upload phase pattern to SLM.
+
+        Args:
+            data_bytes: Raw frame, or a payload encoded with frame_codec
+            shape: Frame shape
+            dtype_str: Numpy dtype string
+            encoding: None for a raw frame, else a frame_codec encoding name
+            meta: Encoding parameters and the client's ``stream`` id (which selects
+                its delta base), as a dict or a tuple of (key, value) pairs
+
+        Returns:
+            bool: False on error (for delta encodings: resend the full frame)
+        """
         try:
-            dtype = np.dtype(dtype_str)
-            array = np.frombuffer(data_bytes, dtype=dtype).reshape(shape)
-            global_slm_manager.upload(array)
-            return True
+            if encoding is None:
+                return global_slm_manager.upload_bytes(data_bytes, tuple(shape), dtype_str)
+            return global_slm_manager.upload_encoded(
+                data_bytes, tuple(shape), dtype_str, encoding, dict(meta or ())
+            )
         except Exception as e:
-            print(f"❌ SLM Error: {e}")
+            logger.error(f"❌ SLM Error: {e}")
             return False
 
+    @requires('slm')
+    def exposed_frame_codec_stats(self):
+        """
+        Get counters of encoded uploads.
+
+        Returns:
+            dict: frames, bytes_received, bytes_decoded and their ratio, and the
+            number of client streams with a decoder
+        """
+        return global_slm_manager.decoder_stats()
+
+    @requires('slm')
+    def exposed_frame_channel_info(self):
+        """
+        Get the parameters of the raw binary frame channel.
+
+        Frames sent there skip rpyc serialization; see frame_channel.py.
+
+        Returns:
+            dict: host, port, unix_path, version, header_size, max_frame_bytes and
+            counters, or None if the channel is not running
+        """
+        if global_frame_channel is None:
+            return None
+        return global_frame_channel.info()
+
+    @requires('slm')
+    def exposed_register_frame(self, data_bytes, shape, dtype_str):
+        """
+        Store a frame in the server-side frame cache without displaying it.
+
+        Returns:
+            str: Content digest to pass to display_frame, or None on error
+        """
+        try:
+            return global_slm_manager.register_frame(data_bytes, tuple(shape), dtype_str)
+        except Exception as e:
+            logger.error(f"❌ Frame cache error: {e}")
+            return None
+
+    @requires('slm')
+    def exposed_display_frame(self, digest):
+        """
+        Display a cached frame by digest.
+
+        Returns:
+            bool: False if the frame is not cached (register it again)
+        """
+        try:
+            return global_slm_manager.display_frame(digest)
+        except Exception as e:
+            logger.error(f"❌ SLM Error: {e}")
+            return False
+
+    # ============== Pattern generation ==============
+    @requires('slm')
+    def exposed_generate_pattern(self, params, display=True):
+        """
+        Generate a pattern on the server from a few parameters instead of
+        uploading its pixels (see patterns.py for types and parameters).
+
+        Args:
+            params: Dict or tuple of (key, value) pairs, e.g. (('type', 'fresnel'),
+                ('focal_length', 0.06))
+            display: Upload the pattern to the SLM
+
+        Returns:
+            str: Frame cache digest of the pattern (for display_frame), or None on error
+        """
+        try:
+            return global_slm_manager.generate_pattern(dict(params), display)
+        except Exception as e:
+            logger.error(f"❌ Pattern error: {e}")
+            return None
+
+    def exposed_pattern_types(self):
+        """
+        Returns:
+            dict: Pattern type -> tuple of its parameter names
+        """
+        return {kind: tuple(sorted(set(PATTERN_DEFAULTS) | set(defaults)))
+                for kind, defaults in TYPE_DEFAULTS.items()}
+
+    # ============== Display-then-trigger ==============
+    @requires('ahk')
+    def exposed_set_trigger(self, spec):
+        """
+        Set the default trigger of display_and_trigger.
+
+        Args:
+            spec: None or 'none' (timestamp only), or ('click', x, y) for a mouse
+                click through the AHK input driver
+        """
+        global global_trigger
+        global_trigger = make_trigger(spec, global_ahk_manager)
+
+    def _trigger(self, spec):
+        if spec is None:
+            return global_trigger if global_trigger is not None else make_trigger(None)
+        return make_trigger(spec, global_ahk_manager)
+
+    @requires('slm')
+    def exposed_display_and_trigger(self, data_bytes, shape, dtype_str, trigger=None,
+                                    settle_s=None, encoding=None, meta=None):
+        """
+        Upload a frame, wait for ImageWriteComplete plus the settle time, then
+        fire the trigger, all in the server thread.
+
+        Args:
+            data_bytes, shape, dtype_str, encoding, meta: As for upload_frame
+            trigger: Trigger spec (see set_trigger), None uses the default trigger
+            settle_s: Settle time in seconds, None uses the SLM's settle_time_s
+
+        Returns:
+            dict: Timings (upload_s, settle_s, delay_s, jitter_s, trigger_s, total_s),
+            or None on error (the trigger is not fired if the upload fails)
+        """
+        try:
+            shape = tuple(shape)
+            if encoding is None:
+                show = lambda: global_slm_manager.upload_bytes(data_bytes, shape, dtype_str, verbose=False)
+            else:
+                meta = dict(meta or ())
+                show = lambda: global_slm_manager.upload_encoded(
+                    data_bytes, shape, dtype_str, encoding, meta, verbose=False
+                )
+            # On the SLM executor, so no other write lands between display and trigger
+            return global_slm_manager.executor.run(
+                display_then_trigger, global_slm_manager, show, self._trigger(trigger), settle_s,
+                priority=PRIORITY_HIGH,
+            )
+        except Exception as e:
+            logger.error(f"❌ Display-and-trigger error: {e}")
+            return None
+
+    @requires('slm')
+    def exposed_display_frame_and_trigger(self, digest, trigger=None, settle_s=None):
+        """
+        Like display_and_trigger for a frame registered in the frame cache.
+
+        Returns:
+            dict: Timings, or None on error (e.g. the digest is not cached)
+        """
+        try:
+            show = lambda: global_slm_manager.display_frame(digest)
+            # On the SLM executor, so no other write lands between display and trigger
+            return global_slm_manager.executor.run(
+                display_then_trigger, global_slm_manager, show, self._trigger(trigger), settle_s,
+                priority=PRIORITY_HIGH,
+            )
+        except Exception as e:
+            logger.error(f"❌ Display-and-trigger error: {e}")
+            return None
+
+    @requires('slm')
+    def exposed_has_frame(self, digest):
+        """Check whether a frame digest is currently cached"""
+        return digest in global_slm_manager.frame_cache
+
+    @requires('slm')
+    def exposed_frame_cache_stats(self):
+        """
+        Get frame cache usage and counters.
+
+        Returns:
+            dict: frames, bytes, max_bytes, hits, misses, evictions
+        """
+        return global_slm_manager.frame_cache.stats()
+
+    @requires('slm')
+    def exposed_frame_cache_clear(self):
+        """Drop all cached frames"""
+        global_slm_manager.frame_cache.clear()
+        return True
+
+    # ============== Sequence Functions ==============
+    @requires('sequence')
+    def exposed_upload_sequence(self, data_bytes, shape, dtype_str):
+        """
+        Upload an N x H x W stack of frames for server-side playback.
+
+        Returns:
+            str: Sequence id, or None on error
+        """
+        try:
+            return global_sequence_player.upload(data_bytes, tuple(shape), dtype_str)
+        except Exception as e:
+            logger.error(f"❌ Sequence upload error: {e}")
+            return None
+
+    @requires('sequence')
+    def exposed_play_sequence(self, sequence_id, dwell_s=0.0, positions=None, clicks=None,
+                              stage_type=2, timeout=60000, wait=True, timeout_s=None):
+        """
+        Play a stored sequence with a per-frame schedule in a server thread.
+
+        Pass per-frame schedules as tuples so they are sent by value.
+
+        Args:
+            sequence_id: Id returned by upload_sequence, or a frame bank name
+            dwell_s: Dwell time in seconds, scalar or one per frame
+            positions: Optional stage position (or None) per frame
+            clicks: Optional (x, y) click (or None) per frame
+            stage_type: Stage moved by positions
+            timeout: Stage move timeout in ms
+            wait: Block until done and return the per-step timestamps
+            timeout_s: Stage move timeout in seconds, replaces timeout if given
+
+        Returns:
+            dict: Playback result if wait (see sequence_result), True if started,
+            or None on error
+        """
+        try:
+            result = global_sequence_player.play(
+                sequence_id, dwell_s, positions, clicks, stage_type, timeout, wait, timeout_s
+            )
+            return result if wait else True
+        except Exception as e:
+            logger.error(f"❌ Sequence playback error: {e}")
+            return None
+
+    @requires('sequence')
+    def exposed_sequence_result(self):
+        """
+        Get the result of the last playback.
+
+        Returns:
+            dict: sequence_id, completed, aborted, error, t0 and steps
+            (index, t_start, t_moved, t_displayed, t_clicked) in seconds since t0,
+            or None while playing
+        """
+        return global_sequence_player.result()
+
+    @requires('sequence')
+    def exposed_sequence_is_playing(self):
+        """Check whether a sequence is currently playing"""
+        return global_sequence_player.is_playing
+
+    @requires('sequence')
+    def exposed_stop_sequence(self):
+        """Abort the running sequence after its current step"""
+        return global_sequence_player.stop()
+
+    @requires('sequence')
+    def exposed_delete_sequence(self, sequence_id):
+        """Free a stored sequence"""
+        return global_sequence_player.delete(sequence_id)
+
+    # ============== Scans ==============
+    @requires('scan')
+    def exposed_scan_plan(self, spec_json):
+        """
+        Plan a scan without running it.
+
+        Args:
+            spec_json: Scan spec as JSON (see scan.py)
+
+        Returns:
+            dict: scan_id, path ('serpentine' or 'raster'), total points and
+            positions, the stage positions per point in visiting order; None on error
+        """
+        try:
+            spec = normalize_spec(spec_json)
+            path, plan = plan_scan(spec)
+            axes = spec['axes']
+            return {
+                'scan_id': scan_id(spec),
+                'path': path,
+                'total': len(plan),
+                'positions': tuple(tuple(axis['positions'][i] for axis, i in zip(axes, index))
+                                   for _, index in plan),
+            }
+        except Exception as e:
+            logger.error(f"❌ Scan plan error: {e}")
+            return None
+
+    @requires('scan')
+    def exposed_scan_start(self, spec_json, resume=False, wait=False):
+        """
+        Start a stage scan with per-point frames and triggers in a server thread.
+
+        Args:
+            spec_json: Scan spec as JSON (see scan.py)
+            resume: Continue from the checkpoint of the same spec if there is one
+            wait: Block until the scan ends
+
+        Returns:
+            dict: Scan status (see scan_status), None on error
+        """
+        try:
+            return global_scan_engine.start(spec_json, resume, wait)
+        except Exception as e:
+            logger.error(f"❌ Scan start error: {e}")
+            return None
+
+    @requires('scan')
+    def exposed_scan_resume(self, scan_id=None, wait=False):
+        """Resume a stopped or failed scan (the last one by default) from its checkpoint"""
+        try:
+            return global_scan_engine.resume(scan_id, wait)
+        except Exception as e:
+            logger.error(f"❌ Scan resume error: {e}")
+            return None
+
+    @requires('scan')
+    def exposed_scan_status(self, since=0):
+        """
+        Progress of the current or last scan.
+
+        Args:
+            since: Only return point records from this plan position on, for
+                streaming progress by polling
+
+        Returns:
+            dict: scan_id, state, path, completed, total, error, elapsed and
+            points (see scan.POINT_FIELDS), or None if no scan ran
+        """
+        return global_scan_engine.status(since)
+
+    @requires('scan')
+    def exposed_scan_stop(self):
+        """Stop the running scan after its current point"""
+        return global_scan_engine.stop()
+
+    # ============== Frame Banks ==============
+    @requires('slm')
+    def exposed_register_frame_bank(self, path, name=None, frame_shape=None, dtype_str='|u1', offset=0):
+        """
+        Memory-map an N x H x W frame file on the server's disk (.npy or raw).
+
+        Frames are paged in on demand, so registering is instant regardless of
+        size. The bank name also works as a sequence id for play_sequence.
+
+        Args:
+            path: File path on the server
+            name: Bank name, defaults to the file name without extension
+            frame_shape: (H, W) of raw files, defaults to the SLM shape
+            dtype_str: Numpy dtype string of raw files
+            offset: Header bytes to skip in raw files
+
+        Returns:
+            dict: name, path, frames, frame_shape, dtype, bytes; None on error
+        """
+        try:
+            return global_slm_manager.register_frame_bank(
+                path, name, None if frame_shape is None else tuple(frame_shape), dtype_str, offset
+            )
+        except Exception as e:
+            logger.error(f"❌ Frame bank error: {e}")
+            return None
+
+    @requires('slm')
+    def exposed_display_bank_frame(self, name, index):
+        """
+        Display frame ``index`` of a registered frame bank.
+
+        Returns:
+            bool: False on error (unknown bank, index out of range, SLM error)
+        """
+        try:
+            return global_slm_manager.display_bank_frame(name, index)
+        except Exception as e:
+            logger.error(f"❌ Frame bank error: {e}")
+            return False
+
+    @requires('slm')
+    def exposed_list_frame_banks(self):
+        """
+        Returns:
+            dict: Bank name -> info dict
+        """
+        return {name: bank.info() for name, bank in global_slm_manager.frame_banks.items()}
+
+    @requires('slm')
+    def exposed_unregister_frame_bank(self, name):
+        """Unmap a frame bank"""
+        return global_slm_manager.unregister_frame_bank(name)
+
     # ============== Stage Functions ==============
+    @_after_stage_init
     def exposed_stage_connect(self, stage_type=2):
         """Connect to a Thorlabs stage"""
         try:
             if stage_type not in global_stages:
-                global_stages[stage_type] = ThorlabsStage(stage_type)
+                global_stages[stage_type] = ThorlabsStage(stage_type, simulate=global_simulate,
+                                                          polling_ms=STAGE_POLLING_MS.get(stage_type, 250))
             
             if not global_stages[stage_type].is_connected:
                 global_stages[stage_type].connect()
+                READINESS.set_ready(f"stage_{stage_type}")
             
             return True
         except Exception as e:
-            print(f"❌ Stage connect error: {e}")
+            logger.error(f"❌ Stage connect error: {e}")
             return False
 
-    def exposed_stage_home(self, stage_type=2, timeout=60000):
-        """Home the stage"""
+    @_after_stage_init
+    def exposed_stage_home(self, stage_type=2, timeout=60000, timeout_s=None):
+        """Home the stage (timeout in ms, or timeout_s in seconds if given)"""
         try:
             if stage_type in global_stages and global_stages[stage_type].is_connected:
-                global_stages[stage_type].home(timeout)
+                global_stages[stage_type].home(timeout, timeout_s)
                 return True
             else:
-                print(f"❌ Stage {stage_type} not connected")
+                logger.error(f"❌ Stage {stage_type} not connected")
                 return False
         except Exception as e:
-            print(f"❌ Stage home error: {e}")
+            logger.error(f"❌ Stage home error: {e}")
             return False
 
-    def exposed_stage_get_position(self, stage_type=2):
-        """Get current position"""
+    @_after_stage_init
+    def exposed_stage_get_position(self, stage_type=2, max_age=None):
+        """
+        Get current position from the stage's status cache.
+
+        Args:
+            stage_type: Stage to query
+            max_age: Re-read the device if the cache is older (s); None uses the cache, 0 always reads
+        """
         try:
             if stage_type in global_stages and global_stages[stage_type].is_connected:
-                return global_stages[stage_type].get_position()
+                return global_stages[stage_type].get_position(max_age)
             else:
-                print(f"❌ Stage {stage_type} not connected")
+                logger.error(f"❌ Stage {stage_type} not connected")
                 return None
         except Exception as e:
-            print(f"❌ Stage get_position error: {e}")
+            logger.error(f"❌ Stage get_position error: {e}")
             return None
 
-    def exposed_stage_move_to(self, position, stage_type=2, timeout=60000):
-        """Move to absolute position"""
+    @_after_stage_init
+    def exposed_stage_move_to(self, position, stage_type=2, timeout=60000, timeout_s=None):
+        """Move to absolute position (timeout in ms, or timeout_s in seconds if given)"""
         try:
             # 确保 position 是 float 类型
             position = float(position)
             
             if stage_type in global_stages and global_stages[stage_type].is_connected:
-                global_stages[stage_type].move_to(position, timeout)
+                global_stages[stage_type].move_to(position, timeout, timeout_s)
                 return True
             else:
-                print(f"❌ Stage {stage_type} not connected")
+                logger.error(f"❌ Stage {stage_type} not connected")
                 return False
         except Exception as e:
-            print(f"❌ Stage move_to error: {e}")
+            logger.error(f"❌ Stage move_to error: {e}")
+            return False
+
+    @_after_stage_init
+    def exposed_stage_move_to_async(self, position, stage_type=2, timeout_s=None):
+        """
+        Start a move to an absolute position and return immediately.
+
+        Poll with stage_motion_done or block with stage_wait_motion, so the next
+        frame can be uploaded while the stage travels and settles.
+
+        Args:
+            position: Target position
+            stage_type: Stage to move
+            timeout_s: Stop the stage and fail the motion if it has not finished
+                after this many seconds, None for no limit
+
+        Returns:
+            bool: True if the move was started
+        """
+        try:
+            position = float(position)
+            if stage_type in global_stages and global_stages[stage_type].is_connected:
+                global_stages[stage_type].move_to_async(position, timeout_s)
+                return True
+            else:
+                logger.error(f"❌ Stage {stage_type} not connected")
+                return False
+        except Exception as e:
+            logger.error(f"❌ Stage move_to_async error: {e}")
+            return False
+
+    @_after_stage_init
+    def exposed_stage_home_async(self, stage_type=2, timeout_s=None):
+        """
+        Start homing and return immediately.
+
+        Args:
+            stage_type: Stage to home
+            timeout_s: As for stage_move_to_async
+
+        Returns:
+            bool: True if homing was started
+        """
+        try:
+            if stage_type in global_stages and global_stages[stage_type].is_connected:
+                global_stages[stage_type].home_async(timeout_s)
+                return True
+            else:
+                logger.error(f"❌ Stage {stage_type} not connected")
+                return False
+        except Exception as e:
+            logger.error(f"❌ Stage home_async error: {e}")
+            return False
+
+    @_after_stage_init
+    def exposed_stage_motion_done(self, stage_type=2):
+        """Check whether the last asynchronous move/home has finished (True if none)"""
+        stage = global_stages.get(stage_type)
+        return stage is None or stage.motion is None or stage.motion.done()
+
+    @_after_stage_init
+    def exposed_stage_wait_motion(self, stage_type=2, timeout_s=None, timeout=None):
+        """
+        Wait for the last asynchronous move/home to finish.
+
+        Args:
+            stage_type: Stage to wait for
+            timeout_s: Maximum wait in seconds, None to wait indefinitely
+            timeout: Former name of timeout_s (seconds)
+
+        Returns:
+            dict: done, state, cancelled, duration (s) and position, or None if no motion
+        """
+        stage = global_stages.get(stage_type)
+        if stage is None or stage.motion is None:
+            return None
+        try:
+            motion = stage.motion
+            motion.wait(timeout if timeout_s is None else timeout_s)
+            return stage.motion_result(motion)
+        except Exception as e:
+            logger.error(f"❌ Stage wait error: {e}")
+            return None
+
+    def exposed_stages_move_many(self, targets, timeout_s=60.0, wait='all', timeout=None):
+        """
+        Move several stages at once and wait for all (or any) of them.
+
+        Args:
+            targets: {stage_type: position} (or (stage_type, position) pairs)
+            timeout_s: Maximum wait in seconds for all axes together, None to wait indefinitely
+            wait: 'all' or 'any'
+            timeout: Former name of timeout_s (seconds), used if given
+
+        Returns:
+            dict: completed, elapsed (s) and axes: stage_type -> {target, done,
+            state, cancelled, duration, position}; None on error
+        """
+        try:
+            targets = dict(targets)
+            for stage_type in targets:
+                if not READINESS.wait_settled(f"stage_{stage_type}"):
+                    raise DeviceNotReady(f"stage_{stage_type} is still initializing")
+            return move_many(global_stages, targets, timeout_s if timeout is None else timeout, wait)
+        except Exception as e:
+            logger.error(f"❌ Stage move_many error: {e}")
+            return None
+
+    @_after_stage_init
+    def exposed_stage_stop(self, stage_type=2):
+        """
+        Stop the stage immediately, cancelling any asynchronous move/home.
+
+        Returns:
+            bool: True if a pending motion was cancelled
+        """
+        try:
+            if stage_type in global_stages and global_stages[stage_type].is_connected:
+                return global_stages[stage_type].stop()
+            return False
+        except Exception as e:
+            logger.error(f"❌ Stage stop error: {e}")
+            return False
+
+    @_after_stage_init
+    def exposed_stage_status(self, stage_type=2, max_age=None):
+        """
+        Cached stage status.
+
+        Returns:
+            dict: position, moving, homing, homed, velocity, timestamp and age (s),
+            or None if not connected
+        """
+        stage = global_stages.get(stage_type)
+        try:
+            return stage.status(max_age) if stage is not None else None
+        except Exception as e:
+            logger.error(f"❌ Stage status error: {e}")
+            return None
+
+    def exposed_stage_status_all(self):
+        """
+        Cached status of every configured stage in one call (no device access).
+
+        Returns:
+            dict: Stage type -> status dict (see stage_status), None if not connected
+        """
+        result = {}
+        for stage_type in STAGE_CONFIGS:
+            stage = global_stages.get(stage_type)
+            try:
+                result[stage_type] = stage.status() if stage is not None else None
+            except Exception as e:
+                logger.error(f"❌ Stage {stage_type} status error: {e}")
+                result[stage_type] = None
+        return result
+
+    @_after_stage_init
+    def exposed_stage_set_polling(self, polling_ms, stage_type=2):
+        """Change the status polling interval (ms) of a stage"""
+        try:
+            STAGE_POLLING_MS[stage_type] = int(polling_ms)
+            if stage_type in global_stages:
+                global_stages[stage_type].set_polling_interval(polling_ms)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Stage set_polling error: {e}")
             return False
 
+    @_after_stage_init
     def exposed_stage_disconnect(self, stage_type=2):
         """Disconnect stage"""
         try:
@@ -189,26 +890,33 @@ class HardwareService(rpyc.Service):
                 return True
             return False
         except Exception as e:
-            print(f"❌ Stage disconnect error: {e}")
+            logger.error(f"❌ Stage disconnect error: {e}")
             return False
 
+    @_after_stage_init
     def exposed_stage_is_connected(self, stage_type=2):
         """Check if stage is connected"""
         return stage_type in global_stages and global_stages[stage_type].is_connected
 
     # ============== AHK Functions ==============
-    def exposed_ahk_capture_position(self):
+    @requires('ahk')
+    def exposed_ahk_capture_position(self, timeout=None):
         """
-        Run capture_position.ahk and return the captured coordinates.
+        Wait for a left click on the server screen and return its coordinates.
         
+        Args:
+            timeout: Seconds to wait for the click, None waits forever (at most
+                input_driver.CAPTURE_TIMEOUT with the AutoHotkey backend)
+
         Returns:
             tuple: (x, y) coordinates, or None if capture failed
         """
-        return global_ahk_manager.capture_position()
+        return global_ahk_manager.capture_position(timeout)
 
+    @requires('ahk')
     def exposed_ahk_click_at(self, x, y):
         """
-        Run click_at.ahk to click at the specified coordinates.
+        Click at the specified coordinates through the input driver.
         
         Args:
             x: X coordinate
@@ -219,6 +927,7 @@ class HardwareService(rpyc.Service):
         """
         return global_ahk_manager.click_at(x, y)
 
+    @requires('ahk')
     def exposed_ahk_get_config(self):
         """
         Get current AHK configuration paths.
@@ -231,94 +940,320 @@ class HardwareService(rpyc.Service):
             'script_dir': global_ahk_manager.script_dir,
             'capture_script': global_ahk_manager.capture_script,
             'click_script': global_ahk_manager.click_script,
-            'config_file': global_ahk_manager.config_file
+            'config_file': global_ahk_manager.config_file,
+            'backend': global_ahk_manager.backend,
         }
 
+    # ============== Startup ==============
+    def exposed_get_readiness(self):
+        """
+        Get the initialization state of every device.
+
+        Returns:
+            dict: Device name ('slm', 'stage_1', 'stage_2', 'ahk', 'sequence') ->
+            {'state': 'pending'|'initializing'|'ready'|'failed', 'error', 'seconds'}
+        """
+        return READINESS.snapshot()
+
+    def exposed_retry_device(self, name):
+        """
+        Run the initialization of a failed device again, e.g. after plugging in
+        the SLM. Failed devices depending on it ('sequence', 'scan') are retried too.
+        Returns at once; follow progress with get_readiness.
+
+        Args:
+            name: Device name as listed by get_readiness
+
+        Returns:
+            tuple: Names of the restarted devices, or None if the device is unknown
+            or did not fail
+        """
+        try:
+            return tuple(READINESS.retry(name))
+        except (KeyError, RuntimeError) as e:
+            logger.error(f"❌ Device retry error: {e}")
+            return None
+
+    # ============== Device executors ==============
+    def exposed_executor_stats(self):
+        """
+        Get the command queues of the device executors.
+
+        Returns:
+            dict: 'slm' and 'stage_<n>' -> {'depth', 'max_depth', 'executed', 'current'}
+        """
+        stats = {}
+        if global_slm_manager is not None:
+            stats['slm'] = global_slm_manager.executor.stats()
+        for stage_type, stage in list(global_stages.items()):
+            stats[f'stage_{stage_type}'] = stage.executor.stats()
+        return stats
+
+    # ============== Metrics ==============
+    def exposed_get_metrics(self, fmt='dict'):
+        """
+        Get call latencies, counters and in-flight gauges.
+
+        Args:
+            fmt: 'dict' for a snapshot dict, 'prometheus' for the Prometheus text format
+
+        Returns:
+            dict or str: {'counters', 'gauges', 'histograms'} snapshot, or the text exposition
+        """
+        if fmt == 'prometheus':
+            return REGISTRY.prometheus()
+        return REGISTRY.snapshot()
+
+    def exposed_reset_metrics(self):
+        """Zero all counters and histograms (gauges keep their current value)"""
+        REGISTRY.clear()
+
 
 def cleanup():
     """Clean up all hardware connections"""
-    print("\n🛑 Shutting down...")
+    logger.info("🛑 Shutting down...")
     
+    # Stop a running scan before its stages go away
+    if global_scan_engine is not None:
+        global_scan_engine.stop()
+
     # Disconnect all stages
     for stage_type, stage in global_stages.items():
         try:
             if stage.is_connected:
                 stage.disconnect()
-                print(f"   ✅ Stage {stage_type} disconnected")
+                logger.info(f"   ✅ Stage {stage_type} disconnected")
         except:
             pass
     
+    # Stop the frame channel
+    try:
+        if global_frame_channel is not None:
+            global_frame_channel.close()
+            logger.info("   ✅ Frame channel closed")
+    except:
+        pass
+
+    # Stop the input worker
+    try:
+        if global_ahk_manager is not None:
+            global_ahk_manager.close()
+    except:
+        pass
+
     # Close SLM if needed
     try:
         if hasattr(global_slm_manager, 'close'):
             global_slm_manager.close()
-            print("   ✅ SLM closed")
+            logger.info("   ✅ SLM closed")
     except:
         pass
     
-    print("👋 Goodbye!")
+    logger.info("👋 Goodbye!")
+
+def setup_logging(level=logging.INFO):
+    """
+    Send log records through a queue to a background writer thread, so hot paths
+    never block on console output.
+
+    Returns:
+        logging.handlers.QueueListener: The running listener (stop it to flush)
+    """
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s", "%H:%M:%S"))
+    listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+    listener.start()
+    return listener
+
 
 def signal_handler(sig, frame):
     cleanup()
     sys.exit(0)
 
+
+def init_hardware(simulate=False, frame_channel_port=FRAME_CHANNEL_PORT, wait=True,
+                  frame_channel_unix_path=-1):
+    """
+    Create the hardware managers in parallel worker threads and store them in
+    the module globals. Progress is tracked per device in READINESS.
+
+    Args:
+        simulate: Use the simulated Blink SDK and Kinesis devices (sim_hardware.py)
+            instead of the real hardware
+        frame_channel_port: TCP port of the raw frame channel (0 picks a free port)
+        wait: Block until every device finished initializing; otherwise return
+            at once so the server can start accepting connections
+        frame_channel_unix_path: Unix socket the frame channel also listens on for
+            local clients; -1 picks one in the temp directory where the platform
+            has Unix sockets, None disables it
+    """
+    global global_simulate, global_stages
+    global_simulate = simulate
+    global_stages = {}
+    install_error_events()
+    READINESS.reset()
+
+    logger.info("=" * 50)
+    logger.info("Initializing hardware components..." + (" (simulated)" if simulate else ""))
+    logger.info("=" * 50)
+
+    def init_slm():
+        global global_slm_manager, global_frame_channel
+        logger.info("Initializing SLM hardware...")
+        global_slm_manager = SLMManager(sim_mode=False, simulate=simulate)
+
+        # Raw frame channel next to the rpyc control plane
+        try:
+            unix_path = frame_channel_unix_path
+            if unix_path == -1:
+                unix_path = (os.path.join(tempfile.gettempdir(), f'slm_frame_channel_{os.getpid()}.sock')
+                             if hasattr(socket, 'AF_UNIX') else None)
+            global_frame_channel = FrameChannelServer(global_slm_manager, port=frame_channel_port,
+                                                      unix_path=unix_path).start()
+            logger.info(f"   Raw frame channel on port {global_frame_channel.port}"
+                        + (f" and {unix_path}" if unix_path else ""))
+        except OSError as e:
+            global_frame_channel = None
+            logger.warning(f"⚠️ Warning: Failed to open frame channel on port {frame_channel_port}: {e}")
+
+        BUS.add_poller('slm.temperature', lambda: {'celsius': global_slm_manager.get_temperature()},
+                       SLM_TEMPERATURE_INTERVAL_S, source='slm')
+
+    def init_stage(stage_type, stage_name):
+        logger.info(f"Initializing and connecting Stage {stage_type} ({stage_name})...")
+        try:
+            global_stages[stage_type] = ThorlabsStage(stage_type, simulate=simulate,
+                                                      polling_ms=STAGE_POLLING_MS.get(stage_type, 250))
+            global_stages[stage_type].connect()
+            logger.info(f"✅ Stage {stage_type} ({stage_name}) connected and ready")
+        except Exception:
+            logger.info("   Stage will be available for on-demand connection")
+            raise
+
+    def init_ahk():
+        global global_ahk_manager
+        logger.info("Initializing AHK manager...")
+        global_ahk_manager = AHKManager(backend='mock' if simulate else 'auto')
+
+    def init_sequence():
+        global global_sequence_player
+        global_sequence_player = SequencePlayer(global_slm_manager, global_stages, global_ahk_manager)
+
+    def init_scan():
+        global global_scan_engine
+        checkpoint_dir = (os.path.join(tempfile.gettempdir(), 'scan_checkpoints') if simulate
+                          else SCAN_CHECKPOINT_DIR)
+        global_scan_engine = ScanEngine(global_slm_manager, global_stages, global_ahk_manager,
+                                        global_sequence_player, checkpoint_dir)
+
+    # Every device in its own thread; startup takes as long as the slowest one
+    READINESS.start('slm', init_slm)
+    for stage_type, stage_name in STAGE_CONFIGS.items():
+        READINESS.start(f'stage_{stage_type}', functools.partial(init_stage, stage_type, stage_name))
+    READINESS.start('ahk', init_ahk)
+    READINESS.start('sequence', init_sequence, requires=('slm', 'ahk'))
+    READINESS.start('scan', init_scan, requires=('sequence',))
+
+    if wait:
+        READINESS.wait_all()
+
+
+def _nodelay_authenticator(sock):
+    """Disable Nagle on accepted connections, so small replies are not held back ~40 ms"""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock, None
+
+
+def create_server(port=SERVER_PORT, hostname='127.0.0.1'):
+    """Build the rpyc server for HardwareService (call init_hardware first)"""
+    return ThreadedServer(
+        HardwareService, 
+        port=port, 
+        hostname=hostname, 
+        authenticator=_nodelay_authenticator,
+        protocol_config={'allow_public_attrs': True}
+    )
+
+
+def start_background_server(port=0, hostname='127.0.0.1', simulate=True):
+    """
+    Initialize hardware and serve HardwareService from a daemon thread, for
+    tests and benchmarks running in the same process.
+
+    Args:
+        port: rpyc port, 0 picks a free one (read it from ``server.port``)
+        hostname: Address to listen on
+        simulate: Use the simulated hardware backends
+
+    Returns:
+        ThreadedServer: The running server; call ``close()`` and cleanup() when done
+
+    Raises:
+        RuntimeError: If the server is not listening within 10 s
+    """
+    init_hardware(simulate=simulate, frame_channel_port=0)
+    server = create_server(port, hostname)
+    thread = threading.Thread(target=server.start, name="rpyc-server", daemon=True)
+    thread.start()
+    # start() sets active once the socket listens, so clients can connect on return
+    deadline = time.monotonic() + 10
+    while not server.active:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            server.close()
+            raise RuntimeError(f"❌ Server on port {server.port} did not start listening")
+        time.sleep(0.005)
+    return server
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SLM/stage/AHK hardware server")
+    parser.add_argument('--simulate', action='store_true',
+                        help="use simulated SLM and stage backends (no hardware needed)")
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--log-level', default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('--ready-timeout', type=float, default=READINESS.timeout,
+                        help="seconds a call waits for a device still initializing (0 fails fast)")
+    args = parser.parse_args()
+    log_listener = setup_logging(args.log_level)
+    READINESS.timeout = args.ready_timeout
+
     # Register signal handlers
     signal.signal(signal.SIGINT, signal_handler)   # Ctrl+C
     signal.signal(signal.SIGTERM, signal_handler)  # kill command
 
-    # 1. Initialize SLM hardware
-    print("=" * 50)
-    print("Initializing hardware components...")
-    print("=" * 50)
-    
-    print("\n[1/3] Initializing SLM hardware...")
-    global_slm_manager = SLMManager(sim_mode=False)
-    
-    # 2. Initialize and connect stages at startup
-    print("\n[2/3] Initializing and connecting Stages...")
-    global_stages = {}
-    
-    # Stage type definitions
-    STAGE_CONFIGS = {
-        1: "PRM1-Z8",   # Rotation stage
-        2: "Z825B",     # Z-axis linear stage
-    }
-    
-    # Connect both stages at startup
-    for stage_type, stage_name in STAGE_CONFIGS.items():
-        try:
-            global_stages[stage_type] = ThorlabsStage(stage_type)
-            global_stages[stage_type].connect()
-            print(f"✅ Stage {stage_type} ({stage_name}) connected and ready")
-        except Exception as e:
-            print(f"⚠️ Warning: Failed to connect Stage {stage_type} ({stage_name}): {e}")
-            print("   Stage will be available for on-demand connection")
-    
-    # 3. Initialize AHK manager
-    print("\n[3/3] Initializing AHK manager...")
-    global_ahk_manager = AHKManager()
+    # Devices initialize in the background while the server already accepts connections
+    init_hardware(simulate=args.simulate, wait=False)
     
-    # 4. Start server
-    print("\n" + "=" * 50)
-    print("✅ Hardware server started, listening on port 18861...")
-    print("   Available services:")
-    print("   - SLM control (upload_frame)")
-    print("   - Stage control (connect, home, move_to, get_position)")
-    print(f"     - Stage 1: PRM1-Z8 (Rotation)")
-    print(f"     - Stage 2: Z825B (Z-axis)")
-    print("   - AHK control (capture_position, click_at)")
-    print("=" * 50 + "\n")
+    logger.info("=" * 50)
+    logger.info(f"✅ Hardware server started, listening on port {args.port}...")
+    if args.simulate:
+        logger.info("   🎬 Simulated hardware backends")
+    logger.info("   Available services:")
+    logger.info("   - SLM control (upload_frame, register_frame, display_frame)")
+    logger.info("   - Pattern generation (generate_pattern: fresnel, microlens, grating, lg)")
+    logger.info(f"   - Raw frame channel (port {FRAME_CHANNEL_PORT})")
+    logger.info("   - Sequence playback (upload_sequence, play_sequence)")
+    logger.info("   - Frame banks (register_frame_bank, display_bank_frame)")
+    logger.info("   - Stage scans (scan_start, scan_status, scan_resume)")
+    logger.info("   - Stage control (connect, home, move_to, get_position)")
+    logger.info(f"     - Stage 1: PRM1-Z8 (Rotation)")
+    logger.info(f"     - Stage 2: Z825B (Z-axis)")
+    logger.info("   - AHK control (capture_position, click_at)")
+    logger.info("   - Metrics (get_metrics, optionally in Prometheus format)")
+    logger.info("   - Device readiness (get_readiness)")
+    logger.info("   - Event subscription (subscribe, poll_events)")
+    logger.info("=" * 50)
     
     try:
-        server = ThreadedServer(
-            HardwareService, 
-            port=18861, 
-            hostname='127.0.0.1', 
-            protocol_config={'allow_public_attrs': True}
-        )
+        server = create_server(args.port)
         server.start()
     except KeyboardInterrupt:
         pass
     finally:
         cleanup()
+        log_listener.stop()
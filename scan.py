@@ -0,0 +1,520 @@
+# scan.py
+
+"""
+Server-side stage scans synchronized with the SLM.
+
+A scan visits every point of a grid spanned by one or more stage axes. At each
+point the stages move, a frame is shown and, after the dwell time, a trigger
+fires. The spec is a JSON-compatible dict:
+
+    {
+        'axes': [
+            {'stage': 1, 'start': 0, 'stop': 90, 'step': 10},         # outer (slowest) axis
+            {'stage': 2, 'positions': [0.0, 0.5, 1.0], 'backlash': 0.05},
+        ],
+        'frames': 'bank_or_sequence_id',    # optional frame source
+        'frame_index': None,                # None: grid index, or one frame index per grid point
+        'pattern': {'type': 'fresnel'},     # alternative: generated pattern
+        'pattern_axes': {'focal_length': 1},  # pattern parameter <- axis position
+        'trigger': ('click', 100, 200),     # see trigger.make_trigger
+        'dwell_s': 0.05,                    # wait after move and display, before the trigger
+        'path': 'auto',                     # 'serpentine', 'raster' or 'auto' (shorter travel)
+        'move_timeout_s': 60.0,
+    }
+
+The grid is visited in the planned order (a serpentine flips the direction of
+every inner axis on each step of the axes outside it). Axes with a backlash b
+always approach their targets moving in the direction of b: a move against it
+first overshoots to target - b. For each point the moves are started, the frame
+is uploaded while the stages travel, and the trigger fires once both are done
+and the dwell has elapsed. Only axes whose target changes are moved.
+
+Progress is recorded per point (see POINT_FIELDS), passed to listeners and
+published on the event bus as 'scan.point' and 'scan.end' events.
+With a checkpoint directory, the number of completed points is saved after each
+point, so an interrupted scan can be resumed from where it stopped, also after a
+server restart.
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from events import BUS
+from trigger import make_trigger, wait_until
+
+logger = logging.getLogger(__name__)
+
+PATHS = ('auto', 'serpentine', 'raster')
+
+# Column order of the per-point records in ScanEngine.status()
+POINT_FIELDS = ('order', 'grid_index', 'positions', 't_start', 't_displayed', 't_moved', 't_triggered')
+
+RUNNING = 'running'
+STOPPED = 'stopped'
+FAILED = 'failed'
+COMPLETED = 'completed'
+
+
+def _axis_positions(axis):
+    if 'positions' in axis:
+        positions = [float(p) for p in axis['positions']]
+    else:
+        start, stop, step = float(axis['start']), float(axis['stop']), float(axis['step'])
+        if step == 0 or (stop - start) / step < 0:
+            raise ValueError(f"Invalid range for stage {axis['stage']}: {start} to {stop} by {step}")
+        count = int((stop - start) / step + 1e-9) + 1
+        positions = [start + i * step for i in range(count)]
+    if not positions:
+        raise ValueError(f"Stage {axis['stage']} has no positions")
+    return positions
+
+
+def normalize_spec(spec):
+    """
+    Validate a scan spec and expand axis ranges into position lists.
+
+    Args:
+        spec: Scan spec dict (see module docstring) or its JSON string
+
+    Returns:
+        dict: Spec with defaults filled in, JSON-serializable
+
+    Raises:
+        ValueError: For invalid specs
+    """
+    if isinstance(spec, str):
+        spec = json.loads(spec)
+    spec = dict(spec)
+    unknown = set(spec) - {'axes', 'frames', 'frame_index', 'pattern', 'pattern_axes',
+                           'trigger', 'dwell_s', 'path', 'move_timeout_s'}
+    if unknown:
+        raise ValueError(f"Unknown scan spec keys: {sorted(unknown)}")
+    if not spec.get('axes'):
+        raise ValueError("A scan needs at least one axis")
+
+    axes = []
+    for axis in spec['axes']:
+        stage = int(axis['stage'])
+        if any(a['stage'] == stage for a in axes):
+            raise ValueError(f"Stage {stage} appears twice")
+        axes.append({
+            'stage': stage,
+            'positions': _axis_positions(axis),
+            'backlash': float(axis.get('backlash') or 0.0),
+        })
+    n_points = 1
+    for axis in axes:
+        n_points *= len(axis['positions'])
+
+    if spec.get('frames') is not None and spec.get('pattern') is not None:
+        raise ValueError("Give either frames or pattern, not both")
+    frame_index = spec.get('frame_index')
+    if frame_index is not None:
+        frame_index = [int(i) for i in frame_index]
+        if len(frame_index) != n_points:
+            raise ValueError(f"frame_index has {len(frame_index)} entries, expected {n_points}")
+        if any(i < 0 for i in frame_index):
+            raise ValueError("frame_index entries must not be negative")
+    pattern_axes = {str(k): int(v) for k, v in (spec.get('pattern_axes') or {}).items()}
+    if any(not 0 <= v < len(axes) for v in pattern_axes.values()):
+        raise ValueError(f"pattern_axes refers to a missing axis: {pattern_axes}")
+
+    path = spec.get('path', 'auto')
+    if path not in PATHS:
+        raise ValueError(f"Unknown path {path!r}, expected one of {PATHS}")
+    trigger = spec.get('trigger')
+    return {
+        'axes': axes,
+        'frames': spec.get('frames'),
+        'frame_index': frame_index,
+        'pattern': None if spec.get('pattern') is None else dict(spec['pattern']),
+        'pattern_axes': pattern_axes,
+        'trigger': trigger if trigger is None or isinstance(trigger, str) else list(trigger),
+        'dwell_s': float(spec.get('dwell_s') or 0.0),
+        'path': path,
+        'move_timeout_s': float(spec.get('move_timeout_s', 60.0)),
+    }
+
+
+def scan_id(spec):
+    """Stable id of a normalized spec (resubmitting the same spec gives the same id)"""
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _order(sizes, serpentine):
+    """Grid index tuples in visiting order, first axis slowest"""
+    if not serpentine:
+        return list(itertools.product(*(range(n) for n in sizes)))
+    order = [()]
+    for n in sizes:
+        forward, backward = range(n), range(n - 1, -1, -1)
+        order = [prefix + (i,) for j, prefix in enumerate(order)
+                 for i in (forward if j % 2 == 0 else backward)]
+    return order
+
+
+def _legs(current, target, backlash):
+    """Moves of one axis from current to target: [target] or [overshoot, target]"""
+    if target == current:
+        return []
+    if backlash and (target - current) * backlash < 0:
+        return [target - backlash, target]
+    return [target]
+
+
+def _travel(axes, order):
+    """Total travel of a visiting order summed over axes, including backlash overshoots"""
+    total = 0.0
+    for k, axis in enumerate(axes):
+        positions = axis['positions']
+        current = positions[order[0][k]]
+        for index in order[1:]:
+            for leg in _legs(current, positions[index[k]], axis['backlash']):
+                total += abs(leg - current)
+                current = leg
+    return total
+
+
+def plan_scan(spec):
+    """
+    Visiting order of a normalized spec.
+
+    Returns:
+        tuple: (path, points) with path 'serpentine' or 'raster' (the shorter
+        one for 'auto') and points a list of (grid_index, index tuple)
+    """
+    axes = spec['axes']
+    sizes = [len(axis['positions']) for axis in axes]
+    if spec['path'] == 'auto':
+        orders = {path: _order(sizes, path == 'serpentine') for path in ('serpentine', 'raster')}
+        path = min(orders, key=lambda p: _travel(axes, orders[p]))
+        order = orders[path]
+    else:
+        path = spec['path']
+        order = _order(sizes, path == 'serpentine')
+    strides = [1] * len(sizes)
+    for k in range(len(sizes) - 2, -1, -1):
+        strides[k] = strides[k + 1] * sizes[k + 1]
+    return path, [(sum(i * s for i, s in zip(index, strides)), index) for index in order]
+
+
+class ScanEngine:
+    """Runs one scan at a time in a worker thread, with checkpoints for resuming"""
+
+    def __init__(self, slm_manager, stages, ahk_manager, sequence_player=None, checkpoint_dir=None):
+        """
+        Args:
+            slm_manager: SLMManager showing the frames
+            stages: Dict stage_type -> ThorlabsStage (looked up when a scan starts)
+            ahk_manager: AHKManager for click triggers
+            sequence_player: SequencePlayer whose sequences can be used as frames
+            checkpoint_dir: Directory for checkpoint files, None keeps progress in memory only
+        """
+        self.slm_manager = slm_manager
+        self.stages = stages
+        self.ahk_manager = ahk_manager
+        self.sequence_player = sequence_player
+        self.checkpoint_dir = checkpoint_dir
+        self.listeners = []         # fn(event dict), called from the scan thread
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        if sequence_player is not None:
+            # Scans and playback drive the same devices: starting either one
+            # checks the other under the same lock
+            self._lock = sequence_player._lock
+            sequence_player.scan_engine = self
+        self._scan = None           # state of the current/last scan
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, spec, resume=False, wait=False):
+        """
+        Start a scan.
+
+        Args:
+            spec: Scan spec (see module docstring)
+            resume: Continue from the checkpoint of the same spec if there is one
+            wait: Block until the scan ends
+
+        Returns:
+            dict: :meth:`status`
+        """
+        spec = normalize_spec(spec)
+        sid = scan_id(spec)
+        completed = 0
+        if resume:
+            checkpoint = self._load_checkpoint(sid)
+            if checkpoint is not None:
+                completed = checkpoint['completed']
+            elif self._scan is not None and self._scan['scan_id'] == sid:
+                completed = self._scan['completed']
+        return self._start(sid, spec, completed, wait)
+
+    def resume(self, sid=None, wait=False):
+        """
+        Resume a stopped or failed scan from its last completed point.
+
+        Args:
+            sid: Scan id, None for the last scan; other scans are read from their checkpoint
+            wait: Block until the scan ends
+
+        Returns:
+            dict: :meth:`status`
+        """
+        if sid is None or (self._scan is not None and self._scan['scan_id'] == sid):
+            if self._scan is None:
+                raise RuntimeError("No scan to resume")
+            return self._start(self._scan['scan_id'], self._scan['spec'], self._scan['completed'], wait)
+        checkpoint = self._load_checkpoint(sid)
+        if checkpoint is None:
+            raise KeyError(f"No checkpoint for scan {sid}")
+        return self._start(sid, checkpoint['spec'], checkpoint['completed'], wait)
+
+    def stop(self):
+        """Stop the scan after its current point. Returns True if one was running."""
+        self._stop.set()
+        return self.is_running
+
+    def status(self, since=0):
+        """
+        State of the current or last scan.
+
+        Args:
+            since: Only include point records from this plan position on
+
+        Returns:
+            dict: scan_id, state, path, completed, total, error, elapsed (s) and
+            points, per-point tuples laid out as :data:`POINT_FIELDS` (times in
+            seconds since the scan started); None if no scan ran yet
+        """
+        scan = self._scan
+        if scan is None:
+            return None
+        first = scan['first']
+        return {
+            'scan_id': scan['scan_id'],
+            'state': scan['state'],
+            'path': scan['path'],
+            'completed': scan['completed'],
+            'total': len(scan['plan']),
+            'error': scan['error'],
+            'elapsed': (scan['t_end'] or time.perf_counter()) - scan['t0'],
+            'points': tuple(scan['points'][max(since - first, 0):]),
+        }
+
+    # ---- internals ----
+
+    def _start(self, sid, spec, completed, wait):
+        path, plan = plan_scan(spec)
+        frames = self._frame_source(spec, len(plan))
+        stages = {}
+        for axis in spec['axes']:
+            stage = self.stages.get(axis['stage'])
+            if stage is None or not stage.is_connected:
+                raise ConnectionError(f"Stage {axis['stage']} not connected")
+            stages[axis['stage']] = stage
+        trigger = make_trigger(spec['trigger'], self.ahk_manager)
+
+        with self._lock:
+            if self.is_running:
+                raise RuntimeError("A scan is already running")
+            if self.sequence_player is not None and self.sequence_player.is_playing:
+                raise RuntimeError("A sequence is playing")
+            self._stop.clear()
+            self._scan = {
+                'scan_id': sid, 'spec': spec, 'path': path, 'plan': plan,
+                'state': RUNNING, 'completed': completed, 'first': completed,
+                'error': None, 'points': [], 't0': time.perf_counter(), 't_end': None,
+            }
+            self._save_checkpoint(self._scan, spec=True)
+            self._thread = threading.Thread(
+                target=self._run, args=(self._scan, stages, frames, trigger),
+                name="scan-engine", daemon=True,
+            )
+            self._thread.start()
+        logger.info(f"🗺️ Scan {sid} {'resumed at' if completed else 'started'}: "
+                    f"{completed}/{len(plan)} points, {path} path")
+        if wait:
+            self._thread.join()
+        return self.status()
+
+    def _frame_source(self, spec, n_points):
+        """Callable grid_index, positions -> frame (or None when the scan shows no frames)"""
+        if spec['pattern'] is not None:
+            pattern, pattern_axes = spec['pattern'], spec['pattern_axes']
+
+            def generated(grid_index, positions):
+                params = dict(pattern)
+                for name, k in pattern_axes.items():
+                    params[name] = positions[k]
+                return self.slm_manager.patterns.get(params)[1]
+            return generated
+
+        if spec['frames'] is None:
+            return None
+        frames = None
+        if self.sequence_player is not None:
+            frames = self.sequence_player.sequences.get(spec['frames'])
+        if frames is None:
+            frames = self.slm_manager.frame_banks.get(spec['frames'])
+        if frames is None:
+            raise KeyError(f"Unknown sequence or frame bank {spec['frames']}")
+        frame_index = spec['frame_index'] or range(n_points)
+        if max(frame_index) >= len(frames):
+            raise ValueError(f"Scan needs frame {max(frame_index)}, {spec['frames']} has {len(frames)}")
+
+        def stored(grid_index, positions):
+            return frames[frame_index[grid_index]]
+        return stored
+
+    def _checkpoint_path(self, sid, kind):
+        return os.path.join(self.checkpoint_dir, f"scan_{sid}.{kind}.json")
+
+    def _load_checkpoint(self, sid):
+        """dict with spec, state and completed, or None without a checkpoint"""
+        if self.checkpoint_dir is None:
+            return None
+        try:
+            with open(self._checkpoint_path(sid, 'spec')) as f:
+                spec = json.load(f)
+            with open(self._checkpoint_path(sid, 'progress')) as f:
+                progress = json.load(f)
+        except FileNotFoundError:
+            return None
+        return dict(progress, spec=spec)
+
+    def _write(self, path, obj):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(obj, f)
+        os.replace(path + '.tmp', path)
+
+    def _save_checkpoint(self, scan, spec=False):
+        """Save the progress (after every point, so it stays small) and optionally the spec"""
+        if self.checkpoint_dir is None:
+            return
+        sid = scan['scan_id']
+        if spec:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            self._write(self._checkpoint_path(sid, 'spec'), scan['spec'])
+        self._write(self._checkpoint_path(sid, 'progress'),
+                    {'scan_id': sid, 'state': scan['state'], 'completed': scan['completed'],
+                     'total': len(scan['plan'])})
+
+    def _notify(self, event):
+        BUS.publish(f"scan.{event['type']}", source='scan', **event)
+        for fn in list(self.listeners):
+            try:
+                fn(event)
+            except Exception as e:
+                logger.debug(f"Scan listener failed: {e}")
+
+    def _move(self, stages, axes, commanded, targets, timeout):
+        """
+        Start the moves of all axes whose target changed; uploads happen between
+        start and wait.
+
+        Returns:
+            tuple: (wait, cancel) callables. wait() blocks until every axis is at
+            its target and stops all axes if one of them fails or times out;
+            cancel() stops all axes still moving.
+        """
+        pending = {}
+        for axis, target in zip(axes, targets):
+            legs = _legs(commanded[axis['stage']], target, axis['backlash'])
+            if legs:
+                pending[axis['stage']] = legs
+        handles = {}
+
+        def cancel():
+            for handle in handles.values():
+                handle.cancel()
+            handles.clear()
+
+        def wait():
+            deadline = time.perf_counter() + timeout
+            try:
+                while handles:
+                    for stage_type, handle in list(handles.items()):
+                        if not handle.wait(max(deadline - time.perf_counter(), 0)):
+                            raise TimeoutError(f"Stage {stage_type} did not reach {handle.target}")
+                        if handle.state != 'done':
+                            raise RuntimeError(f"Move of stage {stage_type} "
+                                               f"{'was cancelled' if handle.cancelled() else 'failed'}")
+                        commanded[stage_type] = handle.target
+                        legs = pending[stage_type]
+                        if legs:
+                            handles[stage_type] = stages[stage_type].move_to_async(legs.pop(0))
+                        else:
+                            del handles[stage_type]
+            except BaseException:
+                # Do not leave the other axes travelling on their own
+                cancel()
+                raise
+
+        try:
+            for stage_type, legs in pending.items():
+                handles[stage_type] = stages[stage_type].move_to_async(legs.pop(0))
+        except BaseException:
+            cancel()
+            raise
+        return wait, cancel
+
+    def _run(self, scan, stages, frames, trigger):
+        spec, plan = scan['spec'], scan['plan']
+        axes = spec['axes']
+        timeout = spec['move_timeout_s']
+        t0 = scan['t0']
+        commanded = {stage_type: stage.get_position() for stage_type, stage in stages.items()}
+        try:
+            for order in range(scan['completed'], len(plan)):
+                if self._stop.is_set():
+                    break
+                grid_index, index = plan[order]
+                targets = [axis['positions'][i] for axis, i in zip(axes, index)]
+                t_start = time.perf_counter()
+
+                wait_moves, cancel_moves = self._move(stages, axes, commanded, targets, timeout)
+                t_displayed = None
+                if frames is not None:
+                    # The frame goes up while the stages travel
+                    try:
+                        if not self.slm_manager.upload(frames(grid_index, targets), verbose=False):
+                            raise RuntimeError("Frame upload failed")
+                        self.slm_manager.flush()
+                    except BaseException:
+                        cancel_moves()
+                        raise
+                    t_displayed = time.perf_counter()
+                wait_moves()
+                t_moved = time.perf_counter()
+
+                wait_until(max(t_moved, t_displayed or 0.0) + spec['dwell_s'])
+                t_triggered = time.perf_counter()
+                trigger.fire()
+
+                point = (order, grid_index, tuple(targets), t_start - t0,
+                         None if t_displayed is None else t_displayed - t0, t_moved - t0, t_triggered - t0)
+                scan['points'].append(point)
+                scan['completed'] = order + 1
+                self._save_checkpoint(scan)
+                self._notify({'type': 'point', 'scan_id': scan['scan_id'], 'completed': order + 1,
+                              'total': len(plan), 'point': dict(zip(POINT_FIELDS, point))})
+            scan['state'] = COMPLETED if scan['completed'] == len(plan) else STOPPED
+        except Exception as e:
+            scan['state'] = FAILED
+            scan['error'] = str(e)
+            logger.error(f"❌ Scan {scan['scan_id']} failed at point {scan['completed']}: {e}")
+        scan['t_end'] = time.perf_counter()
+        self._save_checkpoint(scan)
+        self._notify({'type': 'end', 'scan_id': scan['scan_id'], 'state': scan['state'],
+                      'completed': scan['completed'], 'total': len(plan), 'error': scan['error']})
+        logger.info(f"🗺️ Scan {scan['scan_id']} {scan['state']}: {scan['completed']}/{len(plan)} points "
+                    f"in {scan['t_end'] - t0:.3f} s")
@@ -0,0 +1,283 @@
+# sequence.py
+
+"""
+Server-side storage and timed playback of frame sequences.
+
+A sequence is an N x H x W stack of frames uploaded in a single call. Playback runs
+a schedule (dwell per frame, optional stage position per frame, optional AHK click
+per frame) in a dedicated thread, so a whole acquisition costs one RPC.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from events import BUS
+from hardware import frame_digest
+
+logger = logging.getLogger(__name__)
+
+# Column order of the per-step timestamps returned by SequencePlayer.result()
+STEP_FIELDS = ('index', 't_start', 't_moved', 't_displayed', 't_clicked')
+
+# Default byte budget of stored sequences (~900 full 1152x1920 uint8 frames)
+SEQUENCE_BUDGET_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def _per_step(value, n, name):
+    """Broadcast a scalar/None to n steps, or validate a per-step sequence."""
+    if value is None or np.isscalar(value):
+        return (value,) * n
+    value = tuple(value)
+    if len(value) != n:
+        raise ValueError(f"{name} has {len(value)} entries, expected {n}")
+    return value
+
+
+class SequencePlayer:
+    """
+    Stores uploaded frame stacks and plays them back in a worker thread.
+
+    Stored sequences are bounded by a byte budget: uploading past it drops the
+    least recently uploaded or played sequences, except the one playing.
+    """
+
+    def __init__(self, slm_manager, stages, ahk_manager, max_bytes=SEQUENCE_BUDGET_BYTES):
+        """
+        Args:
+            slm_manager: SLMManager showing the frames
+            stages: Dict stage_type -> ThorlabsStage
+            ahk_manager: AHKManager for clicks
+            max_bytes: Byte budget of stored sequences
+        """
+        self.slm_manager = slm_manager
+        self.stages = stages
+        self.ahk_manager = ahk_manager
+        self.max_bytes = int(max_bytes)
+        self.sequences = OrderedDict()
+        self.nbytes = 0
+        self.evictions = 0
+        self.scan_engine = None     # ScanEngine sharing the devices, set by ScanEngine
+        self._thread = None
+        self._playing = None        # id of the sequence being played
+        self._stop = threading.Event()
+        self._result = None
+        self._lock = threading.Lock()
+
+    def upload(self, data_bytes, shape, dtype_str):
+        """
+        Store an N x H x W frame stack.
+
+        Args:
+            data_bytes: Raw buffer of all frames, C order
+            shape: (N, H, W)
+            dtype_str: Numpy dtype string
+
+        Returns:
+            str: Sequence id (content digest of the stack)
+
+        Raises:
+            ValueError: If the stack does not fit in the byte budget
+        """
+        shape = tuple(int(s) for s in shape)
+        if len(shape) != 3:
+            raise ValueError(f"Expected (N, H, W) shape, got {shape}")
+        nbytes = int(np.prod(shape)) * np.dtype(dtype_str).itemsize
+        if nbytes > self.max_bytes:
+            raise ValueError(f"Sequence of {nbytes} bytes exceeds the budget of {self.max_bytes} bytes")
+        sequence_id = frame_digest(data_bytes, shape, dtype_str)
+        with self._lock:
+            if sequence_id in self.sequences:
+                self.sequences.move_to_end(sequence_id)
+                return sequence_id
+
+        frames = np.frombuffer(data_bytes, dtype=np.dtype(dtype_str)).reshape(shape).copy()
+        frames.flags.writeable = False
+        with self._lock:
+            if sequence_id not in self.sequences:
+                self._evict(self.max_bytes - frames.nbytes)
+                if self.nbytes + frames.nbytes > self.max_bytes:
+                    raise ValueError(f"Sequence of {frames.nbytes} bytes does not fit next to the "
+                                     f"playing sequence ({self.nbytes} of {self.max_bytes} bytes used)")
+                self.sequences[sequence_id] = frames
+                self.nbytes += frames.nbytes
+        logger.info(f"🎞️ Sequence {sequence_id[:8]} stored: {shape[0]} frames of {shape[1:]}")
+        return sequence_id
+
+    def delete(self, sequence_id):
+        """Forget a stored sequence. Returns True if it existed."""
+        with self._lock:
+            frames = self.sequences.pop(sequence_id, None)
+            if frames is None:
+                return False
+            self.nbytes -= frames.nbytes
+            return True
+
+    def stats(self):
+        """
+        Snapshot of the sequence store.
+
+        Returns:
+            dict: Sequence count, bytes used, budget and eviction counter
+        """
+        with self._lock:
+            return {
+                'sequences': len(self.sequences),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
+
+    def _evict(self, max_bytes):
+        """Drop least recently used sequences, except the playing one, until within max_bytes (lock held)."""
+        for sequence_id in list(self.sequences):
+            if self.nbytes <= max_bytes:
+                return
+            if sequence_id == self._playing and self.is_playing:
+                continue
+            frames = self.sequences.pop(sequence_id)
+            self.nbytes -= frames.nbytes
+            self.evictions += 1
+            logger.info(f"🎞️ Sequence {sequence_id[:8]} evicted to stay within "
+                        f"{self.max_bytes} bytes")
+
+    @property
+    def is_playing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def play(self, sequence_id, dwell_s=0.0, positions=None, clicks=None,
+             stage_type=2, timeout=60000, wait=True, timeout_s=None):
+        """
+        Run a stored sequence in a dedicated thread.
+
+        For every step the stage is moved (if a position is given), the frame is
+        uploaded, the dwell time elapses and then the click (if given) is sent.
+
+        Args:
+            sequence_id: Id returned by :meth:`upload`, or the name of a frame bank
+                registered with SLMManager.register_frame_bank
+            dwell_s: Dwell time in seconds, scalar or one per frame
+            positions: None, a scalar, or one stage position (or None) per frame
+            clicks: None, or one (x, y) tuple (or None) per frame
+            stage_type: Stage moved by ``positions``
+            timeout: Stage move timeout in ms
+            wait: Block until playback finishes and return the result
+            timeout_s: Stage move timeout in seconds, replaces timeout if given
+
+        Returns:
+            dict: :meth:`result` if ``wait``, otherwise None once playback started
+        """
+        with self._lock:
+            frames = self.sequences.get(sequence_id)
+            if frames is not None:
+                self.sequences.move_to_end(sequence_id)
+        if frames is None:
+            frames = self.slm_manager.frame_banks.get(sequence_id)
+        if frames is None:
+            raise KeyError(f"Unknown sequence {sequence_id}")
+        n = len(frames)
+
+        dwell_s = _per_step(dwell_s, n, "dwell_s")
+        positions = _per_step(positions, n, "positions")
+        if clicks is None:
+            clicks = (None,) * n
+        else:
+            clicks = tuple(None if c is None else (int(c[0]), int(c[1])) for c in clicks)
+            if len(clicks) != n:
+                raise ValueError(f"clicks has {len(clicks)} entries, expected {n}")
+
+        if any(p is not None for p in positions):
+            stage = self.stages.get(stage_type)
+            if stage is None or not stage.is_connected:
+                raise ConnectionError(f"Stage {stage_type} not connected")
+        else:
+            stage = None
+
+        with self._lock:
+            if self.is_playing:
+                raise RuntimeError("A sequence is already playing")
+            if self.scan_engine is not None and self.scan_engine.is_running:
+                raise RuntimeError("A scan is running")
+            self._stop.clear()
+            self._result = None
+            self._playing = sequence_id
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(sequence_id, frames, dwell_s, positions, clicks, stage,
+                      timeout / 1000 if timeout_s is None else timeout_s),
+                name="sequence-player",
+                daemon=True,
+            )
+            self._thread.start()
+
+        if wait:
+            self._thread.join()
+            return self.result()
+        return None
+
+    def stop(self):
+        """Abort playback after the current step"""
+        self._stop.set()
+        return self.is_playing
+
+    def result(self):
+        """
+        Outcome of the last playback.
+
+        Returns:
+            dict: ``sequence_id``, ``completed`` step count, ``aborted``, ``error``,
+            ``t0`` (wall clock start) and ``steps``, a tuple of per-step tuples laid
+            out as :data:`STEP_FIELDS` with times in seconds since ``t0``
+            (None where the action was skipped). None while still playing.
+        """
+        if self.is_playing:
+            return None
+        return self._result
+
+    def _run(self, sequence_id, frames, dwell_s, positions, clicks, stage, timeout_s):
+        t0_wall = time.time()
+        t0 = time.perf_counter()
+        steps = []
+        error = None
+        try:
+            for i in range(len(frames)):
+                if self._stop.is_set():
+                    break
+                t_start = time.perf_counter() - t0
+
+                t_moved = None
+                if positions[i] is not None:
+                    stage.move_to(float(positions[i]), timeout_s=timeout_s)
+                    t_moved = time.perf_counter() - t0
+
+                if not self.slm_manager.upload(frames[i], verbose=False):
+                    raise RuntimeError("Frame upload failed")
+                t_displayed = time.perf_counter() - t0
+
+                if dwell_s[i]:
+                    self._stop.wait(float(dwell_s[i]))
+
+                t_clicked = None
+                if clicks[i] is not None:
+                    self.ahk_manager.click_at(*clicks[i])
+                    t_clicked = time.perf_counter() - t0
+
+                steps.append((i, t_start, t_moved, t_displayed, t_clicked))
+        except Exception as e:
+            error = str(e)
+            logger.error(f"❌ Sequence playback error at step {len(steps)}: {e}")
+
+        self._result = {
+            'sequence_id': sequence_id,
+            'completed': len(steps),
+            'aborted': len(steps) < len(frames) and error is None,
+            'error': error,
+            't0': t0_wall,
+            'steps': tuple(steps),
+        }
+        BUS.publish('sequence.end', source='sequence', sequence_id=sequence_id,
+                    completed=len(steps), total=len(frames), aborted=self._result['aborted'], error=error)
+        logger.info(f"🎞️ Sequence {sequence_id[:8]} finished: "
+                    f"{len(steps)}/{len(frames)} steps in {time.perf_counter() - t0:.3f} s")
@@ -0,0 +1,320 @@
+# sim_hardware.py
+
+"""
+Hardware-free stand-ins for the vendor SDKs, for testing and benchmarking on
+machines without the devices (or without Windows).
+
+SimBlinkSDK mimics the Blink C wrapper (slm_lib) used by Meadowlark: it keeps a
+record of written frames and sleeps for a configurable DMA transfer time.
+
+SimKinesis mimics the parts of the Thorlabs Kinesis .NET API used by
+ThorlabsStage: DeviceManagerCLI, KCubeDCServo (with a trapezoidal velocity
+profile and settle time), KCubeMotor settings and DeviceSettingsSectionBase.
+
+Select them with SLMManager(simulate=True), ThorlabsStage(simulate=True) or
+``python run_local_server.py --simulate``.
+"""
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+
+# Default Blink timing: fixed per-write overhead plus transfer at the DMA bandwidth
+SIM_SLM_WRITE_OVERHEAD_S = 0.5e-3
+SIM_SLM_DMA_BYTES_PER_S = 1.0e9
+SIM_SLM_TEMPERATURE = 25.0
+
+# Default kinematics (Z825B-like: mm, mm/s, mm/s^2, s)
+SIM_STAGE_VELOCITY = 2.3
+SIM_STAGE_ACCELERATION = 4.0
+SIM_STAGE_SETTLE_S = 0.05
+
+
+class SimBlinkSDK:
+    """
+    Simulated Blink SDK library, a drop-in for ``Meadowlark(slm_lib=...)``.
+
+    ``Write_image`` copies the frame, then sleeps for the write overhead plus the
+    transfer time at the DMA bandwidth; ``ImageWriteComplete`` sleeps for
+    ``complete_latency_s``. The last ``record`` frames are kept in
+    :attr:`frames` together with their write timestamps.
+    """
+
+    def __init__(self, width=1920, height=1152, depth=8,
+                 write_overhead_s=SIM_SLM_WRITE_OVERHEAD_S,
+                 dma_bytes_per_s=SIM_SLM_DMA_BYTES_PER_S,
+                 complete_latency_s=0.0, record=16):
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.write_overhead_s = write_overhead_s
+        self.dma_bytes_per_s = dma_bytes_per_s
+        self.complete_latency_s = complete_latency_s
+        self.frames = deque(maxlen=record)     # (perf_counter time, frame bytes)
+        self.writes = 0
+        self.lut_path = None
+        self.sdk_open = False
+        self._lock = threading.Lock()
+
+    def Create_SDK(self, bit_depth, num_boards_found, constructed_okay, *args):
+        # num_boards_found and constructed_okay are ctypes.byref() pointers
+        num_boards_found._obj.value = 1
+        constructed_okay._obj.value = True
+        self.sdk_open = True
+
+    def Delete_SDK(self):
+        self.sdk_open = False
+
+    def Get_last_error_message(self):
+        return b""
+
+    def Get_image_width(self, board):
+        return self.width
+
+    def Get_image_height(self, board):
+        return self.height
+
+    def Get_image_depth(self, board):
+        return self.depth
+
+    def Load_LUT_file(self, board, lut_path):
+        self.lut_path = lut_path
+        return 1
+
+    def Read_SLM_temperature(self, board):
+        return SIM_SLM_TEMPERATURE
+
+    def Write_image(self, board, image, nbytes, *timing):
+        t0 = time.perf_counter()
+        frame = bytes(np.ctypeslib.as_array(image, shape=(int(nbytes),)))
+        with self._lock:
+            self.frames.append((t0, frame))
+            self.writes += 1
+        remaining = self.write_overhead_s + nbytes / self.dma_bytes_per_s - (time.perf_counter() - t0)
+        if remaining > 0:
+            time.sleep(remaining)
+        return 0
+
+    def ImageWriteComplete(self, board, timeout_ms):
+        if self.complete_latency_s > 0:
+            time.sleep(self.complete_latency_s)
+        return 0
+
+    @property
+    def last_frame(self):
+        """Last written frame as a (height, width) uint8 array, or None"""
+        with self._lock:
+            if not self.frames:
+                return None
+            data = self.frames[-1][1]
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, -1)
+
+
+class SimMotionProfile:
+    """Trapezoidal (or triangular, for short moves) velocity profile between two positions"""
+
+    def __init__(self, start, target, velocity, acceleration, settle=0.0, t0=None):
+        self.start = float(start)
+        self.target = float(target)
+        self.t0 = time.perf_counter() if t0 is None else t0
+        distance = abs(self.target - self.start)
+        self.direction = math.copysign(1.0, self.target - self.start)
+        self.acceleration = acceleration
+
+        t_ramp = velocity / acceleration
+        d_ramp = 0.5 * acceleration * t_ramp ** 2
+        if distance >= 2 * d_ramp:
+            self.t_ramp = t_ramp
+            self.v_peak = velocity
+            self.t_cruise = (distance - 2 * d_ramp) / velocity
+        else:
+            self.t_ramp = math.sqrt(distance / acceleration)
+            self.v_peak = acceleration * self.t_ramp
+            self.t_cruise = 0.0
+        self.duration = 2 * self.t_ramp + self.t_cruise
+        # Motion is reported as complete once the stage has settled at the target
+        self.settle = settle
+        self.total = self.duration + settle
+
+    def position(self, now=None):
+        """Position at time ``now`` (perf_counter seconds)"""
+        t = (time.perf_counter() if now is None else now) - self.t0
+        if t >= self.duration:
+            return self.target
+        if t <= 0:
+            return self.start
+        a, t_ramp, v = self.acceleration, self.t_ramp, self.v_peak
+        if t < t_ramp:
+            travelled = 0.5 * a * t ** 2
+        elif t < t_ramp + self.t_cruise:
+            travelled = 0.5 * a * t_ramp ** 2 + v * (t - t_ramp)
+        else:
+            t_left = self.duration - t
+            travelled = abs(self.target - self.start) - 0.5 * a * t_left ** 2
+        return self.start + self.direction * travelled
+
+
+class SimKCubeDCServo:
+    """Simulated KCube DC servo controller with a kinematic motion model"""
+
+    _task_ids = itertools.count(1)
+
+    def __init__(self, serial_no, velocity=SIM_STAGE_VELOCITY,
+                 acceleration=SIM_STAGE_ACCELERATION, settle_s=SIM_STAGE_SETTLE_S,
+                 home_position=0.0):
+        self.serial_no = serial_no
+        self.velocity = velocity
+        self.acceleration = acceleration
+        self.settle_s = settle_s
+        self.home_position = home_position
+        self.connected = False
+        self.enabled = False
+        self.polling_ms = None
+        self._position = float(home_position)
+        self._profile = None
+        self._homing = False
+        self._homed = False
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def CreateKCubeDCServo(serial_no):
+        return SimKCubeDCServo(serial_no)
+
+    # --- Connection ---
+    def Connect(self, serial_no):
+        self.connected = True
+
+    def Disconnect(self):
+        self.StopImmediate()
+        self.connected = False
+
+    def IsSettingsInitialized(self):
+        return True
+
+    def WaitForSettingsInitialized(self, timeout):
+        return True
+
+    def StartPolling(self, interval_ms):
+        self.polling_ms = interval_ms
+
+    def StopPolling(self):
+        self.polling_ms = None
+
+    def EnableDevice(self):
+        self.enabled = True
+
+    def LoadMotorConfiguration(self, serial_no):
+        return SimpleNamespace(LoadSettingsOption=None, DeviceSettingsName=None)
+
+    def SetSettings(self, settings, update_device, persist):
+        pass
+
+    # --- State ---
+    @property
+    def Position(self):
+        with self._lock:
+            if self._profile is not None:
+                return self._profile.position()
+            return self._position
+
+    @property
+    def Status(self):
+        with self._lock:
+            moving = self._profile is not None and time.perf_counter() < self._profile.t0 + self._profile.total
+            return SimpleNamespace(IsMoving=moving, IsHoming=moving and self._homing,
+                                   IsHomed=self._homed)
+
+    # --- Motion ---
+    def MoveTo(self, position, timeout_or_callback):
+        """Blocking with an int timeout in ms, non-blocking with a completion callback"""
+        return self._start(float(position), timeout_or_callback, homing=False)
+
+    def Home(self, timeout_or_callback):
+        return self._start(self.home_position, timeout_or_callback, homing=True)
+
+    def StopImmediate(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._profile is not None:
+                self._position = self._profile.position()
+                self._profile = None
+            self._homing = False
+
+    def Stop(self, timeout):
+        self.StopImmediate()
+
+    def _start(self, target, timeout_or_callback, homing):
+        if not self.connected or not self.enabled:
+            raise RuntimeError(f"Device {self.serial_no} is not connected and enabled")
+        self.StopImmediate()
+        task_id = next(self._task_ids)
+        with self._lock:
+            profile = SimMotionProfile(self._position, target, self.velocity, self.acceleration,
+                                       self.settle_s)
+            self._profile = profile
+            self._homing = homing
+
+        if callable(timeout_or_callback):
+            callback = timeout_or_callback
+            timer = threading.Timer(profile.total, self._complete, args=(profile, callback, task_id))
+            timer.daemon = True
+            with self._lock:
+                self._timer = timer
+            timer.start()
+            return task_id
+
+        timeout_s = timeout_or_callback / 1000
+        if timeout_s and profile.total > timeout_s:
+            time.sleep(timeout_s)
+            self.StopImmediate()
+            raise TimeoutError(f"Move of {profile.total:.3f} s exceeded timeout of {timeout_s} s")
+        time.sleep(profile.total)
+        self._complete(profile, None, task_id)
+        return task_id
+
+    def _complete(self, profile, callback, task_id):
+        with self._lock:
+            if self._profile is not profile:
+                return      # stopped or superseded
+            self._position = profile.target
+            self._profile = None
+            if self._homing:
+                self._homed = True
+            self._homing = False
+            self._timer = None
+        if callback is not None:
+            callback(task_id)
+
+
+class SimKinesis:
+    """Namespace with the Kinesis classes ThorlabsStage loads from the .NET DLLs"""
+
+    class DeviceManagerCLI:
+        @staticmethod
+        def BuildDeviceList():
+            return None
+
+    class DeviceSettingsSectionBase:
+        SettingsUseOptionType = SimpleNamespace(UseFileSettings=1)
+
+    KCubeDCServo = SimKCubeDCServo
+
+    class KCubeMotor:
+        class KCubeDCMotorSettingsFactory:
+            def GetSettings(self, motor_config):
+                return motor_config
+
+    # Stand-ins for System.Decimal and System.Action[UInt64]
+    Decimal = float
+
+    @staticmethod
+    def Action(fn):
+        return fn
@@ -4,10 +4,14 @@ Abstract functionality for SLMs.
 
 import time
 import os
+import logging
+import threading
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import warnings
+from PIL import Image
+from metrics import REGISTRY
 
 from slmsuite import __version__
 from slmsuite.hardware import _Picklable
@@ -17,6 +21,8 @@ from slmsuite.misc.math import INTEGER_TYPES, REAL_TYPES
 from slmsuite.holography import analysis
 from slmsuite.misc.files import generate_path, latest_path, save_h5, load_h5
 
+logger = logging.getLogger(__name__)
+
 
 class SLM(_Picklable):
     """
@@ -63,11 +69,20 @@ class SLM(_Picklable):
     phase_scaling : float
         Wavelength normalized to the phase range of the SLM. See :attr:`wav_design_um`.
         Determined by ``phase_scaling = wav_um / wav_design_um``.
+    precision : numpy.dtype
+        Floating point type of the working arrays (:attr:`phase`, :attr:`grid` and the
+        :attr:`source` maps). Defaults to ``float32`` for SLMs of 8 bits or less, whose
+        output does not benefit from double precision, and ``float64`` otherwise.
+        Data passed in another precision is converted when it enters the SLM.
     grid : (numpy.ndarray<float> (height, width), numpy.ndarray<float> (height, width))
         :math:`x` and :math:`y` coordinates of the SLM's pixels in wavelengths
         (see :attr:`wav_um`, :attr:`pitch_um`)
         measured from the center of the SLM.
-        Of size :attr:`shape`. Produced by :meth:`numpy.meshgrid`.
+        Of size :attr:`shape`. Produced by :meth:`numpy.meshgrid` from :attr:`grid_axes`
+        the first time it is read, and cached until the grid is recentered.
+    grid_axes : (numpy.ndarray<float> (1, width), numpy.ndarray<float> (height, 1))
+        The same coordinates as broadcastable axis vectors. Prefer this over :attr:`grid`
+        when broadcasting is enough, to avoid materializing two full-size arrays.
     source : dict
         Stores data describing measured, simulated, or estimated properties of the source,
         such as amplitude and phase.
@@ -90,8 +105,13 @@ class SLM(_Picklable):
         When :meth:`.fit_source_amplitude()` is called,
     phase : numpy.ndarray
         Displayed data in units of phase (radians).
+        Computed from :attr:`display` only when read, unless the exact float data is
+        already available (see :meth:`set_phase()`).
     display : numpy.ndarray
         Displayed data in SLM units (integers).
+    correct_integer_frames : bool
+        Whether the gray-level phase correction (see :meth:`set_phase()`) is also applied
+        to pre-quantized integer data. Defaults to ``False``.
     """
 
     _pickle = [
@@ -112,6 +132,11 @@ class SLM(_Picklable):
         "display",
     ]
 
+    # Fixed-point steps per gray level used by _phase2gray when phase_scaling != 1.
+    PHASE_LUT_OVERSAMPLING = 64
+    # Pixels converted per block by _phase2gray (keeps intermediates in cache).
+    PHASE2GRAY_BLOCK = 65536
+
     def __init__(
         self,
         resolution,
@@ -121,6 +146,7 @@ class SLM(_Picklable):
         wav_design_um=None,
         pitch_um=(8, 8),
         settle_time_s=0.01,
+        precision=None,
     ):
         """
         Initialize SLM.
@@ -146,6 +172,8 @@ class SLM(_Picklable):
             See :attr:`pitch_um`. Defaults to 8 micron square pixels.
         settle_time_s
             See :attr:`settle_time_s`.
+        precision
+            See :attr:`precision`. If ``None``, chosen from ``bitdepth``.
         """
         self.name = str(name)
         width, height = resolution
@@ -165,6 +193,13 @@ class SLM(_Picklable):
         self.bitdepth = int(bitdepth)
         self.bitresolution = 2**bitdepth
 
+        # Working precision of floating point data.
+        if precision is None:
+            precision = np.float32 if self.bitdepth <= 8 else np.float64
+        self.precision = np.dtype(precision)
+        if self.precision.kind != "f":
+            raise ValueError("Expected a floating point precision; got {}".format(precision))
+
         # time to delay after writing (allows SLM to stabilize).
         self.settle_time_s = float(settle_time_s)
 
@@ -178,10 +213,12 @@ class SLM(_Picklable):
 
         self.pitch = self.pitch_um / self.wav_um
 
-        # Make normalized coordinate grids.
+        # Make normalized coordinate axes. The dense grids are built on demand.
         xpix = (width - 1) * np.linspace(-0.5, 0.5, width)
         ypix = (height - 1) * np.linspace(-0.5, 0.5, height)
-        self.grid = list(np.meshgrid(self.pitch[0] * xpix, self.pitch[1] * ypix))
+        self._grid_x = (self.pitch[0] * xpix).astype(self.precision)
+        self._grid_y = (self.pitch[1] * ypix).astype(self.precision)
+        self._grid = None
 
         # Source profile dictionary
         self.source = {}
@@ -192,10 +229,75 @@ class SLM(_Picklable):
         else:
             self.dtype = np.uint16
 
-        # Display caches for user reference.
-        self.phase = np.zeros(self.shape)
+        # Display caches for user reference. The phase cache is allocated on first read.
+        self._phase = None
+        self._phase_stale = "zero"
         self.display = np.zeros(self.shape, dtype=self.dtype)
 
+        # Phase correction in gray levels, derived from source["phase"].
+        self.correct_integer_frames = False
+        self._correction_gray = None
+        self._correction_source = None
+
+    @property
+    def grid_axes(self):
+        """
+        Broadcastable ``(x, y)`` coordinate vectors of shapes ``(1, width)`` and
+        ``(height, 1)``. See :attr:`SLM.grid_axes`.
+        """
+        return [self._grid_x[np.newaxis, :], self._grid_y[:, np.newaxis]]
+
+    @property
+    def grid(self):
+        """
+        Dense ``(x, y)`` coordinate grids of :attr:`shape`, materialized on first use.
+        See :attr:`SLM.grid`.
+        """
+        if self._grid is None:
+            self._grid = list(np.meshgrid(self._grid_x, self._grid_y))
+        return self._grid
+
+    @grid.setter
+    def grid(self, value):
+        # The grid is separable, so only the first row of x and column of y are kept.
+        x, y = (np.asarray(g) for g in value)
+        self._grid_x = np.array(x[0, :] if x.ndim == 2 else x, dtype=self.precision)
+        self._grid_y = np.array(y[:, 0] if y.ndim == 2 else y, dtype=self.precision)
+        self._grid = None
+
+    def _shift_grid(self, dx, dy):
+        """Offsets the coordinate axes, invalidating the dense :attr:`grid`."""
+        self._grid_x += dx
+        self._grid_y += dy
+        self._grid = None
+
+    @property
+    def phase(self):
+        """
+        Displayed data in units of phase (radians). See :attr:`SLM.phase`.
+        If only integer data is known, the equivalent floating point phase is computed
+        from :attr:`display` here rather than on every :meth:`set_phase()`.
+        """
+        if self._phase_stale is not None:
+            if self._phase is None or self._phase.shape != self.shape:
+                self._phase = np.zeros(self.shape, dtype=self.precision)
+            if self._phase_stale == "zero":
+                self._phase.fill(0)
+            else:
+                np.multiply(
+                    self.display,
+                    -2 * np.pi / self.phase_scaling / self.bitresolution,
+                    out=self._phase,
+                )
+                self._phase += 2 * np.pi
+            self._phase_stale = None
+        return self._phase
+
+    @phase.setter
+    def phase(self, value):
+        self._phase = np.array(value, dtype=self.precision)
+        self._phase_stale = None
+
     def close(self):
         """Abstract method to close the SLM and delete related objects."""
         raise NotImplementedError()
@@ -214,7 +316,7 @@ class SLM(_Picklable):
         Parameters
         ----------
         verbose : bool
-            Whether or not to print display information.
+            Whether or not to log display information.
 
         Returns
         -------
@@ -222,7 +324,7 @@ class SLM(_Picklable):
             An empty list.
         """
         if verbose:
-            print(".info() NotImplemented.")
+            logger.info(".info() NotImplemented.")
         return []
 
     def load_vendor_phase_correction(self, file_path):
@@ -247,7 +349,7 @@ class SLM(_Picklable):
         """
         # Load an invert the image file (see phase sign convention rules in set_phase).
         phase_correction = (
-            self.bitresolution - 1 - np.array(Image.open(file_path), dtype=float)
+            self.bitresolution - 1 - np.array(Image.open(file_path), dtype=self.precision)
         )
 
         if phase_correction.ndim != 2:
@@ -277,6 +379,9 @@ class SLM(_Picklable):
         else:
             self.source["phase"] = phase_correction
 
+        # Precompute the correction in gray levels for set_phase.
+        self._get_gray_correction()
+
         return self.source["phase"]
 
     def plot(self, phase=None, limits=None, title="Phase", ax=None, cbar=True):
@@ -381,6 +486,14 @@ class SLM(_Picklable):
         """
         raise NotImplementedError()
 
+    def _prepare_display(self):
+        """
+        Hook called before :attr:`display` is overwritten with a new frame.
+        Subclasses which transfer :attr:`display` asynchronously can point
+        :attr:`display` at a buffer which is not in flight. Does nothing by default.
+        """
+        pass
+
     def set_phase(
         self,
         phase,
@@ -409,21 +522,18 @@ class SLM(_Picklable):
 
         Important
         ~~~~~~~~~
-        The user does not need to wrap (e.g. :mod:`numpy.mod(data, 2*numpy.pi)`) the passed phase data,
-        unless they are pre-caching data for speed (see below).
-        :meth:`.set_phase()` uses optimized routines to wrap the phase (see the
-        private method :meth:`_phase2gray()`).
-        Which routine is used depends on :attr:`phase_scaling`:
+        The user does not need to wrap (e.g. :mod:`numpy.mod(data, 2*numpy.pi)`) the passed phase data.
+        :meth:`.set_phase()` quantizes the phase to a fixed-point index and maps it
+        through a precomputed gray-level table (see the private method :meth:`_phase2gray()`),
+        so wrapping costs the same as not wrapping. The table depends on :attr:`phase_scaling`:
 
         -  :attr:`phase_scaling` is one.
-            Fast bitwise integer modulo is used. Much faster than the other routines which
-            depend on :meth:`numpy.mod()`.
+            The index is the gray level itself, modulo :attr:`bitresolution`.
 
         -  :attr:`phase_scaling` is less than one.
             In this case, the SLM has **more phase tuning range** than necessary.
-            If the data is within the SLM range ``[0, 2*pi/phase_scaling]``, then the data is passed directly.
-            Otherwise, the data is wrapped by :math:`2\pi` using the very slow :meth:`numpy.mod()`.
-            Try to avoid this in applications where speed is important.
+            The data is wrapped by :math:`2\pi` onto the top ``phase_scaling`` fraction
+            of the gray levels.
 
         -  :attr:`phase_scaling` is more than one.
             In this case, the SLM has **less phase tuning range** than necessary.
@@ -433,13 +543,13 @@ class SLM(_Picklable):
 
         Caution
         ~~~~~~~
-        After scale conversion, data is ``floor()`` ed to integers with ``np.copyto``, rather than
-        rounded to the nearest integer (``np.rint()`` equivalent). While this is
-        irrelevant for the average user, it may be significant in some cases.
-        If this behavior is undesired consider either: :meth:`set_phase()` integer data
-        directly or modifying the behavior of the private method :meth:`_phase2gray()` in
-        a pull request. We have not been able to find an example of ``np.copyto``
-        producing undesired behavior, but will change this if such behavior is found.
+        When :attr:`phase_scaling` is one, data is rounded to the nearest gray level.
+        Otherwise, phase is resolved to :attr:`PHASE_LUT_OVERSAMPLING` steps per gray level
+        before the table lookup, and the table entries are ``floor()`` ed rather than
+        rounded to the nearest integer.
+        Data within ``[0, 2*pi/phase_scaling)`` is no longer passed through unwrapped
+        when :attr:`phase_scaling` is less than one; it is wrapped by :math:`2\pi` like
+        all other data, which is optically equivalent.
 
         Parameters
         ----------
@@ -459,20 +569,23 @@ class SLM(_Picklable):
                then this data is **directly** passed to the
                SLM, without going through the "phase delay to grayscale" conversion
                defined in the private method :meth:`_phase2gray`. In this situation,
-               ``phase_correct`` is **ignored**.
+               ``phase_correct`` is **ignored** unless :attr:`correct_integer_frames`
+               is set.
                This is error-checked such that bits with greater significance than the
                bitdepth of the SLM are zero (e.g. the final 6 bits of 16 bit data for a
                10-bit SLM). Integer data with type different from :attr:`display` leads
                to a TypeError.
 
-            Usually, an **exact** stored copy of the data passed by the user under
-            ``phase`` is stored in the attribute :attr:`phase`.
-            However, in cases where :attr:`phase_scaling` not one, this
-            copy is modified to include how the data was wrapped. If the data was
-            cropped, then the cropped data is stored, etc. If integer data was passed, the
-            equivalent floating point phase is computed and stored in the attribute :attr:`phase`.
+            The float mirror :attr:`phase` is not computed while displaying. It is
+            derived from :attr:`display` when it is read (e.g. by :meth:`plot()` or
+            :meth:`save_phase()`), except when the corrected phase had to be formed in
+            float anyway (:attr:`phase_scaling` not one), in which case that exact
+            data is kept.
         phase_correct : bool
             Whether or not to add :attr:`~slmsuite.hardware.slms.slm.SLM.source```["phase"]`` to ``phase``.
+            When :attr:`phase_scaling` is one, the correction is precomputed in gray
+            levels and added to :attr:`display` with a single modular integer add,
+            which can differ from adding in float by one gray level due to rounding.
         settle : bool
             Whether to sleep for :attr:`~slmsuite.hardware.slms.slm.SLM.settle_time_s`.
 
@@ -487,21 +600,21 @@ class SLM(_Picklable):
             If integer data is incompatible with the bitdepth or if the passed phase is
             otherwise incompatible (not a 2D array or smaller than the SLM shape, etc).
         """
-        # Helper variable to speed the case where phase is None.
-        zero_phase = False
+        # Make sure the display buffer is free to be overwritten.
+        self._prepare_display()
+
+        # Correction in gray levels, if available.
+        has_correction = phase_correct and ("phase" in self.source)
+        correction = self._get_gray_correction() if has_correction else None
 
         # Parse phase.
-        if phase is None:
-            # Zero the phase pattern.
-            self.phase.fill(0)
-            zero_phase = True
-        else:
-            # Make sure the array is an ndarray.
-            phase = np.array(phase)
+        if phase is not None:
+            if hasattr(phase, "get_phase"):
+                # If we passed a hologram, grab the phase from there.
+                phase = phase.get_phase()
 
-        if hasattr(phase, "get_phase"):
-            # If we passed a hologram, grab the phase from there.
-            phase = phase.get_phase()
+            # Make sure the array is an ndarray (without copying; data is copied below).
+            phase = np.asarray(phase)
 
         if phase is not None and np.issubdtype(phase.dtype, np.integer):
             # Check the type.
@@ -526,31 +639,46 @@ class SLM(_Picklable):
             else:
                 np.copyto(self.display, phase)
 
-            # Update the phase variable with the integer data that we displayed.
-            self.phase = 2 * np.pi - self.display * (
-                2 * np.pi / self.phase_scaling / self.bitresolution
-            )
+            if correction is not None and self.correct_integer_frames:
+                self._add_gray_correction(correction)
+
+            # The phase variable is derived from display when read.
+            self._phase_stale = "display"
         else:
             # If float data was passed (or the None case).
-            # Copy the pattern and unpad if necessary.
-            if phase is not None:
-                if self.phase.shape != self.shape:
-                    np.copyto(self.phase, toolbox.unpad(self.phase, self.shape))
+            # Unpad if necessary.
+            if phase is not None and phase.shape != self.shape:
+                phase = toolbox.unpad(phase, self.shape)
+
+            if has_correction and correction is None:
+                # phase_scaling is not one: add the correction in float.
+                if self._phase is None or self._phase.shape != self.shape:
+                    self._phase = np.zeros(self.shape, dtype=self.precision)
+                if phase is None:
+                    np.copyto(self._phase, self.source["phase"], casting="same_kind")
                 else:
-                    np.copyto(self.phase, phase)
-
-            # Add phase correction if requested.
-            if phase_correct and ("phase" in self.source):
-                self.phase += self.source["phase"]
-                zero_phase = False
-
-            # Pass the data to self.display.
-            if zero_phase:
-                # If None was passed and phase_correct is False, then use a faster method.
-                self.display.fill(0)
+                    # Data in another precision is explicitly converted to the working precision.
+                    np.add(phase, self.source["phase"], out=self._phase, casting="same_kind")
+                self._phase_stale = None
+                with REGISTRY.timer("slm_phase2gray_seconds", "Phase to gray level conversion"):
+                    self._phase2gray(self._phase, out=self.display)
+            elif phase is None:
+                if correction is None:
+                    # If None was passed and there is no correction, use a faster method.
+                    self.display.fill(0)
+                    self._phase_stale = "zero"
+                else:
+                    # Gray level of zero phase, plus the correction.
+                    self.display.fill(self.bitresolution - 1)
+                    self._add_gray_correction(correction)
+                    self._phase_stale = "display"
             else:
                 # Turn the floats in phase space to integer data for the SLM.
-                self.display = self._phase2gray(self.phase, out=self.display)
+                with REGISTRY.timer("slm_phase2gray_seconds", "Phase to gray level conversion"):
+                    self._phase2gray(phase, out=self.display)
+                if correction is not None:
+                    self._add_gray_correction(correction)
+                self._phase_stale = "display"
 
         # Write!
         self._set_phase_hw(self.display)
@@ -561,12 +689,133 @@ class SLM(_Picklable):
 
         return self.display
 
+    def set_display_buffer(self, buffer, settle=False):
+        """
+        Sends pre-quantized integer data to the SLM with a single copy.
+
+        This is the ingestion path for frames arriving over the network: ``buffer``
+        is validated before it is copied straight into :attr:`display`, which is then
+        handed to :meth:`_set_phase_hw()`. Compared to :meth:`set_phase()` with
+        integer data, the intermediate ``np.array`` copy is skipped.
+        The gray-level phase correction is applied if :attr:`correct_integer_frames`
+        is set.
+
+        Parameters
+        ----------
+        buffer : numpy.ndarray OR bytes-like
+            Integer data of the same type and size as :attr:`display`.
+            Bytes-like objects are interpreted without copying.
+        settle : bool
+            Whether to sleep for :attr:`~slmsuite.hardware.slms.slm.SLM.settle_time_s`.
+
+        Returns
+        -------
+        numpy.ndarray
+           :attr:`~slmsuite.hardware.slms.slm.SLM.display`, the integer data sent to the SLM.
+
+        Raises
+        ------
+        TypeError
+            If the data type or size does not match :attr:`display`, or if the data
+            exceeds the bitdepth of the SLM.
+        """
+        if not isinstance(buffer, np.ndarray):
+            buffer = np.frombuffer(buffer, dtype=self.display.dtype)
+
+        if buffer.dtype != self.display.dtype:
+            raise TypeError(
+                "Unexpected integer type {}. Expected {}.".format(
+                    buffer.dtype, self.display.dtype
+                )
+            )
+        if buffer.size != self.display.size:
+            raise TypeError(
+                "Expected {} pixels for SLM shape {}; got {}.".format(
+                    self.display.size, self.shape, buffer.size
+                )
+            )
+
+        # Only SLMs which do not fill their integer type can receive out-of-range data.
+        # Checked before copying so that a rejected frame leaves the display untouched.
+        if self.bitresolution < np.iinfo(self.display.dtype).max + 1:
+            if buffer.max() >= self.bitresolution:
+                raise TypeError(
+                    "Integer data must be within the bitdepth ({}-bit) of the SLM.".format(
+                        self.bitdepth
+                    )
+                )
+
+        self._prepare_display()
+        np.copyto(self.display, buffer.reshape(self.shape))
+
+        if self.correct_integer_frames and ("phase" in self.source):
+            correction = self._get_gray_correction()
+            if correction is not None:
+                self._add_gray_correction(correction)
+        self._phase_stale = "display"
+
+        self._set_phase_hw(self.display)
+
+        if settle:
+            time.sleep(self.settle_time_s)
+
+        return self.display
+
+    def _get_gray_correction(self):
+        r"""
+        Returns :attr:`source` ``["phase"]`` converted to an additive offset in gray
+        levels, or ``None`` if there is no correction or if :attr:`phase_scaling` is
+        not one (where gray levels do not wrap at :attr:`bitresolution`).
+
+        The offset is recomputed only when ``source["phase"]`` is replaced by a new
+        array; modify it by assignment rather than in place.
+
+        Returns
+        -------
+        numpy.ndarray OR None
+            Offset with the type of :attr:`display`.
+        """
+        source_phase = self.source.get("phase", None)
+        if source_phase is None or self.phase_scaling != 1:
+            return None
+
+        if self._correction_source is not source_phase:
+            # Adding phase lowers the gray level (see the sign convention in set_phase).
+            levels = np.rint(np.asarray(source_phase) * (self.bitresolution / (2 * np.pi)))
+            self._correction_gray = np.mod(-levels, self.bitresolution).astype(
+                self.display.dtype
+            )
+            self._correction_source = source_phase
+
+        return self._correction_gray
+
+    def _add_gray_correction(self, correction):
+        """Adds a gray-level correction to :attr:`display` modulo :attr:`bitresolution`."""
+        np.add(self.display, correction, out=self.display)
+        if self.bitresolution < np.iinfo(self.display.dtype).max + 1:
+            np.bitwise_and(self.display, self.bitresolution - 1, out=self.display)
+
     def _phase2gray(self, phase, out=None):
         r"""
         Helper function to convert an array of phases (units of :math:`2\pi`) to an array of
         :attr:`~slmsuite.hardware.slms.slm.SLM.bitresolution` -scaled and -cropped integers.
         This is used by :meth:`set_phase()`. See special cases described in :meth:`set_phase()`.
 
+        The phase is scaled to a fixed-point index with :math:`2\pi` spanning a power of two
+        number of levels, so that wrapping is integer truncation.
+        If :attr:`phase_scaling` is one, the index is the gray level and the sign flip is a
+        bitwise ``not``. Otherwise, the index is mapped through a table
+        (see :meth:`_get_phase_lut()`) which includes the sign flip,
+        :attr:`phase_scaling` and truncation.
+        The work is done in blocks of :attr:`PHASE2GRAY_BLOCK` pixels so that intermediates
+        stay in cache. ``phase`` is not modified and may be ``float32`` or ``float64``.
+
+        Note
+        ~~~~
+        The fixed-point index is a 32-bit integer, so phases must stay within
+        :math:`\pm 2^{31} \cdot 2\pi /` ``levels``
+        (about :math:`\pm 10^5` radians for an 8-bit SLM with :attr:`phase_scaling` not one).
+
         Parameters
         ----------
         phase : numpy.ndarray
@@ -580,68 +829,109 @@ class SLM(_Picklable):
         -------
         out
         """
+        phase = np.ascontiguousarray(phase)
         if out is None:
-            out = np.zeros(self.shape, dtype=self.display.dtype)
+            out = np.zeros(phase.shape, dtype=self.display.dtype)
+        target = out if out.flags.c_contiguous else np.empty(out.shape, out.dtype)
 
         if self.phase_scaling == 1:
-            # Prepare the 2pi -> integer conversion factor and convert.
-            factor = -(self.bitresolution / 2 / np.pi)
-            phase *= factor
-
-            # There is some randomness involved in casting positive floats to integers.
-            # Avoid this by going all negative.
-            maximum = np.amax(phase)
-            if maximum >= 0:
-                toshift = self.bitresolution * 2 * np.ceil(maximum / self.bitresolution)
-                phase -= toshift
-
-            # Copy and case the data to the output (usually self.display)
-            np.rint(phase, out=phase)
-            np.copyto(out, phase, casting="unsafe")
-
-            # Restore phase (usually self.phase) as these operations are in-place.
-            phase *= 1 / factor
-
-            # Shift by one so that phase=0 --> display=max. That way, phase will be more continuous.
-            out -= 1
-
-            # This part (along with the choice of type), implements modulo much faster than np.mod().
-            if self.bitresolution != 8 and self.bitresolution != 16:
-                active_bits_mask = int(self.bitresolution - 1)
-                np.bitwise_and(out, active_bits_mask, out=out)
+            lut = None
+            levels = self.bitresolution
         else:
-            # phase_scaling is not included in the scaling.
-            factor = -(self.bitresolution * self.phase_scaling / 2 / np.pi)
-            phase *= factor
-
-            # Only if necessary, modulo the phase to remain within SLM bounds.
-            if np.amin(phase) <= -self.bitresolution or np.amax(phase) > 0:
-                # Minus 1 is to conform with the in-bound case.
-                phase -= 1
-                # np.mod is the slowest step. It could maybe be faster if phase is converted to
-                # an integer beforehand, but there is an amount of risk for overflow.
-                # For instance, a standard double can represent numbers far larger than
-                # even a 64 bit integer. If this optimization is implemented, take care to
-                # generate checks for the conversion to long integer / etc before the final
-                # conversion to dtype of uint8 or uint16.
-                np.mod(phase, self.bitresolution * self.phase_scaling, out=phase)
-                phase += self.bitresolution * (1 - self.phase_scaling)
-
-                # Set values still out of range to zero.
-                if self.phase_scaling > 1:
-                    phase[phase < 0] = self.bitresolution - 1
-            else:
-                # Go from negative to positive.
-                phase += self.bitresolution - 1
+            lut = self._get_phase_lut()
+            levels = lut.size
+        factor = levels / (2 * np.pi)
+        mask = None
+        if self.bitresolution < np.iinfo(out.dtype).max + 1:
+            mask = self.bitresolution - 1
+
+        phase_flat = phase.reshape(-1)
+        out_flat = target.reshape(-1)
+        index_float, index = self._get_phase2gray_scratch(
+            np.result_type(phase.dtype, np.float32)
+        )
 
-            # Copy and case the data to the output (usually self.display)
-            np.copyto(out, phase, casting="unsafe")
+        for start in range(0, phase_flat.size, self.PHASE2GRAY_BLOCK):
+            stop = min(start + self.PHASE2GRAY_BLOCK, phase_flat.size)
+            f = index_float[: stop - start]
+            i = index[: stop - start]
+            o = out_flat[start:stop]
+
+            # Fixed-point index of the phase.
+            np.multiply(phase_flat[start:stop], factor, out=f)
+            np.rint(f, out=f)
+            np.copyto(i, f, casting="unsafe")
+
+            if lut is None:
+                # Integer truncation wraps modulo 2pi; not(k) = -k - 1 flips the sign and
+                # shifts by one so that phase=0 --> display=max.
+                np.copyto(o, i, casting="unsafe")
+                np.invert(o, out=o)
+                if mask is not None:
+                    np.bitwise_and(o, mask, out=o)
+            else:
+                np.bitwise_and(i, levels - 1, out=i)
+                np.take(lut, i, out=o, mode="clip")
 
-            # Restore phase (though we do not unmodulo)
-            phase *= 1 / factor
+        if target is not out:
+            np.copyto(out, target)
 
         return out
 
+    def _get_phase_lut(self):
+        r"""
+        Builds (or returns the cached) phase-index to gray-level table used by
+        :meth:`_phase2gray()` when :attr:`phase_scaling` is not one.
+
+        Entry ``k`` holds the gray level for the phase :math:`2\pi k /` ``levels``,
+        where ``levels`` is :attr:`bitresolution` times :attr:`PHASE_LUT_OVERSAMPLING`.
+        The table is rebuilt whenever :attr:`bitresolution` or :attr:`phase_scaling` change.
+
+        Returns
+        -------
+        numpy.ndarray
+            Table of length ``levels`` with the type of :attr:`display`.
+        """
+        key = (self.bitresolution, self.phase_scaling, np.dtype(self.display.dtype))
+        if getattr(self, "_phase_lut_key", None) == key:
+            return self._phase_lut
+
+        bitresolution = self.bitresolution
+        levels = min(bitresolution * self.PHASE_LUT_OVERSAMPLING, 2**20)
+        range_scaled = bitresolution * self.phase_scaling
+
+        # Gray value (negative, scaled by phase_scaling) of each table phase.
+        lut = -np.arange(levels) * (range_scaled / levels)
+        # Minus 1 is to conform with the phase=0 --> display=max convention.
+        lut = np.mod(lut - 1, range_scaled) + bitresolution * (1 - self.phase_scaling)
+        # Set values out of range (phase_scaling > 1) to the top gray level.
+        lut[lut < 0] = bitresolution - 1
+
+        self._phase_lut = np.floor(lut).astype(self.display.dtype)
+        self._phase_lut_key = key
+        return self._phase_lut
+
+    def _get_phase2gray_scratch(self, dtype):
+        """
+        Returns reusable float and int32 blocks of :attr:`PHASE2GRAY_BLOCK` pixels
+        for :meth:`_phase2gray()`, so that no frame-sized memory is allocated per call.
+        The blocks belong to the calling thread, as frames may be converted by
+        several threads at once.
+        """
+        dtype = np.dtype(dtype)
+        local = getattr(self, "_phase2gray_scratch", None)
+        if local is None:
+            # A concurrent first call may replace this; each call keeps the blocks it got.
+            local = self._phase2gray_scratch = threading.local()
+        scratch = getattr(local, "blocks", None)
+        if scratch is None or scratch[0].dtype != dtype:
+            scratch = (
+                np.empty(self.PHASE2GRAY_BLOCK, dtype=dtype),
+                np.empty(self.PHASE2GRAY_BLOCK, dtype=np.int32),
+            )
+            local.blocks = scratch
+        return scratch
+
     def save_phase(self, path=".", name=None):
         """
         Saves :attr:`~slmsuite.hardware.slms.slm.SLM.phase` and
@@ -715,8 +1005,8 @@ class SLM(_Picklable):
         data = load_h5(file_path)
 
         self._set_phase_hw(data["display"])
-        self.display = data["display"]
-        self.phase = data["phase"]
+        np.copyto(self.display, data["display"])
+        self.phase = np.asarray(data["phase"], dtype=self.precision)
 
         if not np.all(np.isclose(data["display"], self._phase2gray(data["phase"]))):
             warnings.warn(
@@ -788,7 +1078,7 @@ class SLM(_Picklable):
             scaling = (1, 1)
         # Fractions of the display
         elif units == "frac":
-            scaling = [g.ptp() for g in self.grid]
+            scaling = [np.ptp(g) for g in self.grid_axes]
         # Physical units
         else:
             if units in toolbox.LENGTH_FACTORS.keys():
@@ -797,7 +1087,8 @@ class SLM(_Picklable):
                 raise RuntimeError("Did not recognize units '{}'".format(units))
             scaling = [factor / self.wav_um, factor / self.wav_um]
 
-        xy = [g / s for g, s in zip(self.grid, scaling)]
+        # Broadcastable axes; fit_function expands them to the full shape.
+        xy = [g / s for g, s in zip(self.grid_axes, scaling)]
 
         if (
             len(kwargs) == 0
@@ -810,10 +1101,18 @@ class SLM(_Picklable):
         if isinstance(fit_function, str):
             fit_function = getattr(fitfunctions, fit_function)
 
-        source = fit_function(xy, **kwargs)
+        source = np.broadcast_to(fit_function(xy, **kwargs), self.shape)
 
-        self.source["amplitude_sim" if sim else "amplitude"] = np.abs(source)
-        self.source["phase_sim" if sim else "phase"] = np.angle(source) + phase_offset
+        self.source["amplitude_sim" if sim else "amplitude"] = np.abs(source).astype(
+            self.precision
+        )
+        self.source["phase_sim" if sim else "phase"] = (
+            np.angle(source) + phase_offset
+        ).astype(self.precision)
+
+        # Precompute the correction in gray levels for set_phase.
+        if not sim:
+            self._get_gray_correction()
 
         return self.source
 
@@ -905,8 +1204,8 @@ class SLM(_Picklable):
 
         center_grid = np.array(
             [
-                np.argmin(np.abs(self.grid[0][0, :])),
-                np.argmin(np.abs(self.grid[1][:, 0])),
+                np.argmin(np.abs(self._grid_x)),
+                np.argmin(np.abs(self._grid_y)),
             ]
         )
 
@@ -917,10 +1216,11 @@ class SLM(_Picklable):
                 (self.shape[1] * self.pitch[0], self.shape[0] * self.pitch[1])
             )
             self.source["amplitude_extent"] = np.array(
-                [np.max(np.abs(self.grid[0])), np.max(np.abs(self.grid[1]))]
+                [np.max(np.abs(self._grid_x)), np.max(np.abs(self._grid_y))]
             )
+            # The grid is separable, so the largest radius is at a corner.
             self.source["amplitude_extent_radius"] = np.sqrt(
-                np.amax(np.square(self.grid[0]) + np.square(self.grid[1]))
+                np.amax(np.square(self._grid_x)) + np.amax(np.square(self._grid_y))
             )
         else:
             # Otherwise, use the measured amplitude distribution.
@@ -954,26 +1254,25 @@ class SLM(_Picklable):
             # Handle centering.
             dcenter = center_grid - center
 
-            self.grid[0] += dcenter[0] * self.pitch[0]
-            self.grid[1] += dcenter[1] * self.pitch[1]
-
-            center_grid = np.array(
-                [np.argmin(self.grid[0][0, :]), np.argmin(self.grid[1][:, 0])]
-            )
+            # Offset the axes rather than both full grids.
+            self._shift_grid(dcenter[0] * self.pitch[0], dcenter[1] * self.pitch[1])
 
             extent_mask = amp > (extent_threshold * np.amax(amp))
+            columns = np.any(extent_mask, axis=0)
+            rows = np.any(extent_mask, axis=1)
 
             self.source["amplitude_extent"] = np.array(
                 [
-                    np.max(np.abs(self.grid[0][extent_mask])),
-                    np.max(np.abs(self.grid[1][extent_mask])),
+                    np.max(np.abs(self._grid_x[columns])),
+                    np.max(np.abs(self._grid_y[rows])),
                 ]
             )
+            radius_squared = (
+                np.square(self._grid_x)[np.newaxis, :]
+                + np.square(self._grid_y)[:, np.newaxis]
+            )
             self.source["amplitude_extent_radius"] = np.sqrt(
-                np.amax(
-                    np.square(self.grid[0][extent_mask])
-                    + np.square(self.grid[1][extent_mask])
-                )
+                np.amax(radius_squared[extent_mask])
             )
 
     def get_source_radius(self):
@@ -1011,14 +1310,14 @@ class SLM(_Picklable):
         if "amplitude" in self.source:
             return self.source["amplitude"]
         else:
-            return np.ones(self.shape)
+            return np.ones(self.shape, dtype=self.precision)
 
     def _get_source_phase(self):
         """Deals with the case of an unmeasured source phase."""
         if "phase" in self.source:
             return self.source["phase"]
         else:
-            return np.zeros(self.shape)
+            return np.zeros(self.shape, dtype=self.precision)
 
     def plot_source(self, sim=False, power=False):
         """
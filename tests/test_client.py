@@ -0,0 +1,166 @@
+# tests/test_client.py
+
+"""HardwareClient against the simulated server from start_background_server()."""
+
+import socket
+import threading
+import time
+import uuid
+
+import numpy as np
+import pytest
+import rpyc
+
+import run_local_server as rls
+from client import HardwareClient
+
+
+@pytest.fixture(scope='module')
+def server():
+    srv = rls.start_background_server()
+    yield srv
+    srv.close()
+    rls.cleanup()
+
+
+@pytest.fixture
+def client(server):
+    c = HardwareClient(port=server.port, pool_size=1, retry_delay=0.05)
+    yield c
+    c.close()
+
+
+def _last_frame():
+    """Last frame written to the simulated SLM"""
+    slm = rls.global_slm_manager.slm
+    slm.flush(5)
+    return slm.slm_lib.last_frame
+
+
+def _frame(value):
+    shape = tuple(rls.global_slm_manager.shape)
+    frame = np.full(shape, value, np.uint8)
+    frame[:16, :16] = 255 - value
+    return frame
+
+
+def _finish_motion(c):
+    c.stage_stop(2)
+    c.stage_wait_motion(2, timeout_s=10)
+
+
+def test_pool_reuses_connection(client):
+    for _ in range(5):
+        assert client.ping()
+        client.stage_get_position(2)
+    assert len(client.pool._connections) == 1
+    assert client.pool.reconnects == 0
+
+
+def test_pool_bounds_concurrent_connections(server):
+    with HardwareClient(port=server.port, pool_size=2) as c:
+        threads = [threading.Thread(target=lambda: [c.stage_get_position(2) for _ in range(5)])
+                   for _ in range(6)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        assert 1 <= len(c.pool._connections) <= 2
+        assert c.pool.reconnects == 0
+
+
+def test_call_async_wait_returns_result(client):
+    pending = client.call_async('stage_get_position', 2)
+    assert pending.wait(10) == pytest.approx(client.stage_get_position(2))
+    assert pending.ready
+
+
+def test_pending_call_timeout_frees_pool_slot(client):
+    start = client.stage_get_position(2)
+    pending = client.call_async('stage_move_to', start + 3.0, 2)
+    try:
+        with pytest.raises(TimeoutError):
+            pending.wait(0.1)
+        assert not pending.ready
+        # The only pool slot was given up, so other calls are not held up
+        t0 = time.perf_counter()
+        client.stage_get_position(2)
+        assert time.perf_counter() - t0 < 1.0
+        with pytest.raises(TimeoutError):
+            pending.wait(0.05)
+    finally:
+        assert pending.wait(30) is True
+    assert pending.ready
+    assert client.stage_get_position(2) == pytest.approx(start + 3.0, abs=0.01)
+
+
+def test_retry_after_dropped_connection(server, client):
+    assert client.ping()
+    # Drop every connection from the server side; the pooled one is now dead
+    for sock in list(server.clients):
+        sock.shutdown(socket.SHUT_RDWR)
+    time.sleep(0.1)
+    assert isinstance(client.stage_get_position(2), float)
+    assert client.pool.reconnects == 1
+    assert len(client.pool._connections) == 1
+
+
+def test_no_retry_when_disabled(server, client):
+    assert client.ping()
+    for sock in list(server.clients):
+        sock.shutdown(socket.SHUT_RDWR)
+    time.sleep(0.1)
+    with pytest.raises(EOFError):
+        client.call('stage_get_position', 2, retry=False)
+    assert client.stage_get_position(2) is not None
+
+
+def test_no_retry_on_request_timeout(server):
+    with HardwareClient(port=server.port, pool_size=1, request_timeout=0.3) as c:
+        start = c.stage_get_position(2)
+        subscription = rls.BUS.subscribe(('stage.motion',))
+        try:
+            t0 = time.perf_counter()
+            with pytest.raises(rpyc.AsyncResultTimeout):
+                c.stage_move_to(start + 5.0, 2)
+            # Raised after one request timeout, without reconnect delays
+            assert time.perf_counter() - t0 < 1.0
+            # The timed out connection is discarded, not reused
+            assert c.pool.reconnects == 1
+            time.sleep(0.3)
+            started = [e for e in subscription.take(0) if e['state'] == 'started']
+            assert len(started) == 1
+        finally:
+            rls.BUS.unsubscribe(subscription.id)
+            _finish_motion(c)
+
+
+def test_upload_frame_raw(client):
+    frame = _frame(10)
+    assert client.upload_frame(frame) is True
+    np.testing.assert_array_equal(_last_frame(), frame)
+    assert client.frame_encoding_stats() is None
+
+
+def test_upload_frame_encoded(server):
+    with HardwareClient(port=server.port, encode_frames=True) as c:
+        frames = [_frame(20), _frame(20), _frame(21)]
+        frames[1][100:120, 200:260] = 7
+        for frame in frames:
+            assert c.upload_frame(frame) is True
+            np.testing.assert_array_equal(_last_frame(), frame)
+        stats = c.frame_encoding_stats()
+        assert stats['frames'] == len(frames)
+        assert stats['bytes_sent'] < stats['bytes_raw']
+
+
+def test_upload_frame_encoded_resends_full_frame(server):
+    with HardwareClient(port=server.port, encode_frames=True) as c:
+        assert c.upload_frame(_frame(30)) is True
+        # A stream the server has no base frame for rejects the next delta
+        c._stream = uuid.uuid4().hex
+        frame = _frame(30)
+        frame[0, :64] = 1
+        assert c.upload_frame(frame) is True
+        np.testing.assert_array_equal(_last_frame(), frame)
+        pending = c.upload_frame_async(_frame(31))
+        assert pending.wait(10) is True
+        np.testing.assert_array_equal(_last_frame(), _frame(31))
@@ -0,0 +1,60 @@
+# tests/test_frame_channel.py
+
+"""Frame channel header validation."""
+
+import socket
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from frame_channel import (ACK, ACK_MAGIC, FLAG_ACK, HEADER, MAGIC, STATUS_BAD_HEADER,
+                           VERSION, FrameChannelServer, pack_header, unpack_header)
+
+
+def _header(dtype_str, shape=(4, 8), nbytes=32):
+    padded = tuple(shape) + (0,) * (3 - len(shape))
+    return HEADER.pack(MAGIC, VERSION, FLAG_ACK, len(shape), dtype_str, *padded, 7, nbytes)
+
+
+@pytest.mark.parametrize('dtype', ['|u1', '<u2', '<f4', '<f8', '|b1', '<i4'])
+def test_round_trip(dtype):
+    shape = (4, 8)
+    header = pack_header(shape, dtype, 7)
+    assert unpack_header(header) == (shape, np.dtype(dtype), 7, FLAG_ACK,
+                                     32 * np.dtype(dtype).itemsize)
+
+
+@pytest.mark.parametrize('dtype_str', [b'zz', b'\xff\xfe', b'<u3', b'', b'|O'])
+def test_garbage_dtype_raises_value_error(dtype_str):
+    with pytest.raises(ValueError):
+        unpack_header(_header(dtype_str))
+
+
+@pytest.mark.parametrize('dtype_str', [b'|O', b'|S4', b'<U1', b'|V4', b'<M8', b'<c16'])
+def test_non_numeric_dtype_rejected(dtype_str):
+    nbytes = 32 * np.dtype(dtype_str.decode()).itemsize
+    with pytest.raises(ValueError):
+        unpack_header(_header(dtype_str, nbytes=nbytes))
+
+
+def test_bad_magic_and_size():
+    with pytest.raises(ValueError):
+        unpack_header(b'XXXX' + _header(b'|u1')[4:])
+    with pytest.raises(ValueError):
+        unpack_header(_header(b'|u1', nbytes=31))
+
+
+def test_server_answers_bad_dtype_and_closes():
+    uploads = []
+    manager = SimpleNamespace(shape=(4, 8), upload_bytes=lambda *args, **kwargs: uploads.append(args))
+    server = FrameChannelServer(manager, port=0).start()
+    try:
+        with socket.create_connection(('127.0.0.1', server.port), timeout=5) as sock:
+            sock.sendall(_header(b'zz'))
+            magic, seq, status = ACK.unpack(sock.recv(ACK.size, socket.MSG_WAITALL))
+            assert (magic, status) == (ACK_MAGIC, STATUS_BAD_HEADER)
+            assert sock.recv(1) == b''
+        assert uploads == []
+    finally:
+        server.close()
@@ -0,0 +1,63 @@
+# tests/test_frame_codec.py
+
+"""FrameEncoder/FrameDecoder round trips and bounded decompression."""
+
+import zlib
+
+import numpy as np
+import pytest
+
+from frame_codec import COMPRESSORS, FrameDecoder, FrameEncoder
+
+SHAPE = (64, 96)
+
+
+def _frames():
+    rng = np.random.default_rng(2)
+    base = np.zeros(SHAPE, np.uint8)
+    roi = base.copy()
+    roi[10:20, 30:50] = 7
+    noisy = rng.integers(0, 256, SHAPE, dtype=np.uint8)
+    return [base, roi, roi + np.uint8(3), noisy, noisy]
+
+
+@pytest.mark.parametrize('compressor', sorted(COMPRESSORS))
+def test_round_trip(compressor):
+    encoder, decoder = FrameEncoder(compressors=(compressor,)), FrameDecoder()
+    for frame in _frames():
+        payload, encoding, meta = encoder.encode(frame)
+        decoded = decoder.decode(payload, frame.shape, frame.dtype.str, encoding, meta)
+        np.testing.assert_array_equal(decoded, frame)
+
+
+@pytest.mark.parametrize('compressor', sorted(COMPRESSORS))
+def test_decompression_bomb_rejected(compressor):
+    compress = COMPRESSORS[compressor][0]
+    # 256 MiB of zeros compress to a few hundred kB
+    bomb = compress(bytes(256 * 1024 * 1024))
+    decoder = FrameDecoder()
+    with pytest.raises(ValueError, match="more than"):
+        decoder.decode(bomb, SHAPE, '|u1', f'full+{compressor}')
+    assert decoder.reference is None
+
+
+@pytest.mark.parametrize('compressor', sorted(COMPRESSORS))
+def test_short_and_truncated_payloads_rejected(compressor):
+    compress = COMPRESSORS[compressor][0]
+    frame_bytes = SHAPE[0] * SHAPE[1]
+    decoder = FrameDecoder()
+    with pytest.raises(ValueError):
+        decoder.decode(compress(bytes(frame_bytes - 1)), SHAPE, '|u1', f'full+{compressor}')
+    data = compress(np.random.default_rng(3).integers(0, 256, frame_bytes, dtype=np.uint8).tobytes())
+    with pytest.raises(ValueError):
+        decoder.decode(data[:len(data) // 2], SHAPE, '|u1', f'full+{compressor}')
+    with pytest.raises(ValueError):
+        decoder.decode(b'not compressed at all', SHAPE, '|u1', f'full+{compressor}')
+
+
+def test_exact_size_with_trailing_stream_rejected():
+    frame_bytes = SHAPE[0] * SHAPE[1]
+    decoder = FrameDecoder()
+    decoder.decode(zlib.compress(bytes(frame_bytes)), SHAPE, '|u1', 'full+zlib')
+    with pytest.raises(ValueError):
+        decoder.decode(zlib.compress(bytes(frame_bytes + 1)), SHAPE, '|u1', 'full+zlib')
@@ -0,0 +1,102 @@
+# tests/test_input_driver.py
+
+"""AHKWorkerDriver against a Python stand-in for input_worker.ahk."""
+
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import input_driver
+from input_driver import AHKWorkerDriver
+
+# Speaks the input_worker.ahk line protocol; CAPTURE never sees a click
+WORKER = '''
+import os, sys, time
+if os.environ.get('FAKE_AHK_SILENT'):
+    time.sleep(60)
+print('READY', flush=True)
+for line in sys.stdin:
+    cmd = line.split()
+    if cmd[0] == 'CLICK':
+        print('OK', flush=True)
+    elif cmd[0] == 'CAPTURE':
+        time.sleep(60)
+    elif cmd[0] == 'EXIT':
+        break
+'''
+
+
+@pytest.fixture
+def worker_script(tmp_path):
+    path = tmp_path / 'worker.py'
+    path.write_text(WORKER)
+    return str(path)
+
+
+@pytest.fixture
+def processes(monkeypatch):
+    """Records the worker processes started by the driver"""
+    started = []
+    popen = subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        process = popen(*args, **kwargs)
+        started.append(process)
+        return process
+    monkeypatch.setattr(input_driver.subprocess, 'Popen', recording_popen)
+    yield started
+    for process in started:
+        if process.poll() is None:
+            process.kill()
+
+
+def test_click(worker_script, processes):
+    driver = AHKWorkerDriver(sys.executable, worker_script)
+    try:
+        driver.click(10, 20)
+    finally:
+        driver.close()
+    assert processes[0].wait(5) == 0
+
+
+def test_worker_not_ready_is_killed(worker_script, processes, monkeypatch):
+    monkeypatch.setattr(input_driver, 'WORKER_START_TIMEOUT', 0.3)
+    monkeypatch.setenv('FAKE_AHK_SILENT', '1')
+    with pytest.raises(RuntimeError, match="did not start"):
+        AHKWorkerDriver(sys.executable, worker_script)
+    assert processes[0].wait(5) is not None
+
+
+def test_capture_timeout_is_finite_and_frees_clicks(worker_script, processes, monkeypatch):
+    monkeypatch.setattr(input_driver, 'CAPTURE_TIMEOUT', 0.3)
+    driver = AHKWorkerDriver(sys.executable, worker_script)
+    try:
+        t0 = time.perf_counter()
+        assert driver.capture_position(timeout=None) is None
+        assert time.perf_counter() - t0 < 2
+        # The stuck worker was killed; the next click starts a fresh one
+        assert processes[0].wait(5) is not None
+        driver.click(1, 2)
+        assert len(processes) == 2
+    finally:
+        driver.close()
+
+
+def test_click_during_capture_times_out(worker_script, processes, monkeypatch):
+    monkeypatch.setattr(input_driver, 'CAPTURE_TIMEOUT', 2.0)
+    monkeypatch.setattr(input_driver, 'CLICK_TIMEOUT', 0.2)
+    driver = AHKWorkerDriver(sys.executable, worker_script)
+    capture = threading.Thread(target=driver.capture_position)
+    capture.start()
+    try:
+        time.sleep(0.1)
+        t0 = time.perf_counter()
+        with pytest.raises(TimeoutError, match="busy"):
+            driver.click(1, 2)
+        assert time.perf_counter() - t0 < 1
+    finally:
+        capture.join()
+        driver.close()
@@ -0,0 +1,148 @@
+# tests/test_meadowlark_async.py
+
+"""Asynchronous Meadowlark writes against the simulated Blink SDK."""
+
+import time
+
+import numpy as np
+import pytest
+
+from meadowlark import Meadowlark
+from sim_hardware import SimBlinkSDK
+
+WIDTH, HEIGHT = 64, 48
+
+
+def _make_meadowlark(write_overhead_s=0.002, record=64, **kwargs):
+    lib = SimBlinkSDK(width=WIDTH, height=HEIGHT, write_overhead_s=write_overhead_s, record=record)
+    slm = Meadowlark(verbose=False, lut_path="sim.lut", slm_lib=lib, **kwargs)
+    slm.flush(5)
+    return slm, lib
+
+
+def _frames(n):
+    """Distinct integer frames, so each recorded write identifies its source"""
+    rng = np.random.default_rng(1)
+    return [rng.integers(0, 256, size=(HEIGHT, WIDTH), dtype=np.uint8) for _ in range(n)]
+
+
+@pytest.fixture
+def async_slm():
+    slm, lib = _make_meadowlark(async_writes=True)
+    yield slm, lib
+    slm.close()
+
+
+def test_set_phase_async_returns_ticket_before_write_completes():
+    slm, lib = _make_meadowlark(write_overhead_s=0.2, async_writes=True)
+    try:
+        ticket = slm.set_phase_async(_frames(1)[0], phase_correct=False)
+        assert not ticket.done()
+        assert slm.last_ticket is ticket
+        assert slm.flush(5)
+        assert ticket.done()
+        assert ticket.result() is None
+    finally:
+        slm.close()
+
+
+def test_set_phase_sets_last_ticket(async_slm):
+    slm, lib = async_slm
+    slm.set_phase(_frames(1)[0], phase_correct=False)
+    assert slm.last_ticket is not None
+    assert slm.flush(5)
+    assert slm.last_ticket.done()
+
+
+def test_flush_times_out_on_pending_write():
+    slm, lib = _make_meadowlark(write_overhead_s=0.5, async_writes=True)
+    try:
+        slm.set_phase_async(_frames(1)[0], phase_correct=False)
+        assert slm.flush(0.01) is False
+        assert slm.flush(5) is True
+    finally:
+        slm.close()
+
+
+@pytest.mark.parametrize('n_buffers', [2, 3])
+def test_frames_written_in_order_without_corruption(n_buffers):
+    slm, lib = _make_meadowlark(async_writes=True, n_buffers=n_buffers)
+    try:
+        frames = _frames(20)
+        writes = lib.writes
+        for frame in frames:
+            slm.set_phase_async(frame, phase_correct=False)
+        assert slm.flush(5)
+        assert lib.writes == writes + len(frames)
+        written = [data for _, data in list(lib.frames)[-len(frames):]]
+        for frame, data in zip(frames, written):
+            assert data == frame.tobytes()
+    finally:
+        slm.close()
+
+
+def test_async_matches_synchronous_writes():
+    frames = _frames(8)
+    recorded = []
+    for async_writes in (False, True):
+        slm, lib = _make_meadowlark(async_writes=async_writes)
+        try:
+            for frame in frames:
+                slm.set_phase(frame, phase_correct=False)
+            assert slm.flush(5)
+            recorded.append([data for _, data in list(lib.frames)[-len(frames):]])
+        finally:
+            slm.close()
+    assert recorded[0] == recorded[1]
+
+
+def test_buffers_rotate_and_input_is_not_aliased(async_slm):
+    slm, lib = async_slm
+    frame = _frames(1)[0]
+    displays = []
+    for _ in range(4):
+        displays.append(slm.set_phase(frame, phase_correct=False))
+    assert displays[0] is not displays[1]
+    assert displays[0] is displays[2]
+    assert all(d is not frame for d in displays)
+    slm.flush(5)
+
+
+def test_write_error_surfaces_on_next_call(async_slm):
+    slm, lib = async_slm
+    lib.Write_image = lambda *args: -1
+    ticket = slm.set_phase_async(_frames(1)[0], phase_correct=False)
+    with pytest.raises(RuntimeError):
+        ticket.result(5)
+    with pytest.raises(RuntimeError):
+        slm.set_phase_async(_frames(1)[0], phase_correct=False)
+
+
+def test_set_phase_async_requires_async_writes():
+    slm, lib = _make_meadowlark()
+    try:
+        assert slm.last_ticket is None
+        with pytest.raises(RuntimeError):
+            slm.set_phase_async(_frames(1)[0])
+        with pytest.raises(ValueError):
+            slm.set_async_writes(True, n_buffers=1)
+    finally:
+        slm.close()
+
+
+def test_disabling_async_writes_flushes():
+    slm, lib = _make_meadowlark(write_overhead_s=0.05, async_writes=True)
+    try:
+        frames = _frames(3)
+        writes = lib.writes
+        for frame in frames:
+            slm.set_phase_async(frame, phase_correct=False)
+        t0 = time.perf_counter()
+        slm.set_async_writes(False)
+        assert lib.writes == writes + len(frames)
+        assert time.perf_counter() - t0 > 0.05
+        assert slm.async_writes is False
+        slm.set_phase(frames[0], phase_correct=False)
+        assert lib.last_frame.tobytes() == frames[0].tobytes()
+    finally:
+        slm.close()
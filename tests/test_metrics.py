@@ -0,0 +1,48 @@
+# tests/test_metrics.py
+
+"""Resetting the registry keeps the metric objects held by their owners."""
+
+import threading
+
+from executor import DeviceExecutor
+from metrics import MetricsRegistry, REGISTRY
+
+
+def test_clear_resets_in_place():
+    registry = MetricsRegistry()
+    counter, gauge = registry.counter('frames'), registry.gauge('depth')
+    histogram = registry.histogram('write_seconds')
+    counter.inc(3)
+    gauge.set(2)
+    histogram.observe(0.01)
+
+    registry.clear()
+    assert registry.counter('frames') is counter and counter.value == 0
+    assert registry.histogram('write_seconds') is histogram
+    assert histogram.count == 0 and sum(histogram.bucket_counts) == 0 and len(histogram.recent()) == 0
+    # Gauges track current state and survive a reset
+    assert registry.gauge('depth') is gauge and gauge.value == 2
+
+    counter.inc()
+    histogram.observe(0.02)
+    snapshot = registry.snapshot()
+    assert snapshot['counters']['frames'] == 1
+    assert snapshot['histograms']['write_seconds']['count'] == 1
+    assert snapshot['histograms']['write_seconds']['max'] == 0.02
+
+
+def test_executor_depth_gauge_survives_reset():
+    executor = DeviceExecutor('metrics_test')
+    release = threading.Event()
+    try:
+        executor.submit(release.wait)
+        executor.submit(lambda: None)
+        executor.submit(lambda: None)
+        REGISTRY.clear()
+        future = executor.submit(lambda: None)
+        assert REGISTRY.snapshot()['gauges']['executor_metrics_test_depth'] >= 1
+        release.set()
+        future.result(timeout=5)
+    finally:
+        release.set()
+        executor.close()
@@ -0,0 +1,113 @@
+# tests/test_phase2gray.py
+
+"""SLM._phase2gray (fixed-point index + table) against the legacy float routine."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from benchmark import _make_slm, _phase2gray_legacy
+
+SHAPE = (64, 96)
+# A prime number of samples, so no ramp value sits exactly on a rounding tie
+RAMP = np.linspace(-4 * np.pi, 4 * np.pi, 1000003)
+
+
+def _level_diff(slm, new, legacy):
+    """Per-pixel gray level difference, cyclic with period bitresolution * phase_scaling"""
+    period = slm.bitresolution * slm.phase_scaling
+    diff = np.abs(new.astype(float) - legacy.astype(float))
+    return np.rint(np.minimum(diff, np.abs(period - diff)))
+
+
+def _compare(phase_scaling, phase):
+    slm = _make_slm(SHAPE, phase_scaling)
+    legacy = _phase2gray_legacy(slm, phase.copy(), np.zeros(phase.shape, slm.dtype))
+    return slm, _level_diff(slm, slm._phase2gray(phase), legacy)
+
+
+def _random_phases():
+    rng = np.random.default_rng(0)
+    return {
+        'wrapped': rng.uniform(-20, 20, size=SHAPE),
+        'in_range': rng.uniform(0, 2 * np.pi, size=SHAPE),
+        'ramp': RAMP,
+    }
+
+
+@pytest.mark.parametrize('label', ['wrapped', 'in_range', 'ramp'])
+def test_unit_scaling_is_exact(label):
+    _, diff = _compare(1.0, _random_phases()[label])
+    assert diff.max() == 0
+
+
+def test_scaling_below_one_differs_by_one_level_at_boundaries():
+    slm, diff = _compare(0.8, RAMP)
+    assert set(np.unique(diff)) == {0, 1}
+    # Only phases within half a table step of a level boundary round differently
+    assert 0 < np.mean(diff > 0) <= 1 / slm.PHASE_LUT_OVERSAMPLING
+
+
+def test_scaling_above_one_differs_by_the_truncated_span_at_the_edge():
+    slm, diff = _compare(1.25, RAMP)
+    jump = int(np.ceil(slm.bitresolution * (slm.phase_scaling - 1))) + 1
+    assert jump == 65
+    assert set(np.unique(diff)) == {0, 1, jump}
+    assert np.mean(diff == jump) < 1e-4
+    assert np.mean(diff > 0) <= 1 / slm.PHASE_LUT_OVERSAMPLING
+
+
+@pytest.mark.parametrize('phase_scaling', [1.0, 0.8, 1.25])
+@pytest.mark.parametrize('label', ['wrapped', 'in_range'])
+def test_random_phases_within_bounds(phase_scaling, label):
+    slm, diff = _compare(phase_scaling, _random_phases()[label])
+    assert diff.max() <= max(1, int(np.ceil(slm.bitresolution * (phase_scaling - 1))) + 1)
+    assert np.mean(diff > 0) <= 1 / slm.PHASE_LUT_OVERSAMPLING
+
+
+@pytest.mark.parametrize('phase_scaling', [1.0, 0.8, 1.25])
+def test_input_is_not_modified(phase_scaling):
+    slm = _make_slm(SHAPE, phase_scaling)
+    phase = _random_phases()['wrapped']
+    before = phase.copy()
+    slm._phase2gray(phase)
+    assert np.array_equal(phase, before)
+
+
+@pytest.mark.parametrize('phase_scaling', [1.0, 0.8, 1.25])
+def test_float32_matches_float64(phase_scaling):
+    slm = _make_slm(SHAPE, phase_scaling)
+    phase = _random_phases()['wrapped']
+    diff = _level_diff(slm, slm._phase2gray(phase.astype(np.float32)), slm._phase2gray(phase))
+    # float32 rounding moves a few pixels across a level boundary
+    assert diff.max() <= 1
+    assert np.mean(diff > 0) < 1e-3
+
+
+def test_out_argument_is_filled():
+    slm = _make_slm(SHAPE, 0.8)
+    phase = _random_phases()['wrapped']
+    out = np.zeros(SHAPE, slm.dtype)
+    assert slm._phase2gray(phase, out=out) is out
+    assert np.array_equal(out, slm._phase2gray(phase))
+
+
+def test_concurrent_conversions_do_not_share_scratch():
+    slm = _make_slm((256, 384), 1.25)
+    rng = np.random.default_rng(1)
+    phases = [rng.uniform(-20, 20, size=(256, 384)) for _ in range(4)]
+    expected = [slm._phase2gray(p) for p in phases]
+    wrong = []
+
+    def convert(k):
+        for _ in range(10):
+            if not np.array_equal(slm._phase2gray(phases[k]), expected[k]):
+                wrong.append(k)
+
+    threads = [threading.Thread(target=convert, args=(k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not wrong
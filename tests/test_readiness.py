@@ -0,0 +1,91 @@
+# tests/test_readiness.py
+
+"""Device readiness tracking, DeviceNotReady and retrying failed devices."""
+
+import pytest
+
+import run_local_server as rls
+from client import HardwareClient
+from readiness import FAILED, READY, DeviceNotReady, DeviceReadiness, requires
+
+
+def _flaky(failures):
+    """init callable failing ``failures`` times, then succeeding"""
+    calls = []
+
+    def init():
+        calls.append(None)
+        if len(calls) <= failures:
+            raise RuntimeError(f"attempt {len(calls)} failed")
+    init.calls = calls
+    return init
+
+
+def test_failed_device_raises():
+    readiness = DeviceReadiness()
+    readiness.start('slm', _flaky(1))
+    assert readiness.wait_settled('slm', timeout=5)
+    assert readiness.snapshot()['slm']['state'] == FAILED
+    with pytest.raises(DeviceNotReady, match="attempt 1 failed"):
+        readiness.wait('slm', timeout=1)
+
+
+def test_retry_reruns_failed_dependents():
+    readiness = DeviceReadiness()
+    slm, ahk, sequence, scan = _flaky(1), _flaky(0), _flaky(0), _flaky(0)
+    readiness.start('slm', slm)
+    readiness.start('ahk', ahk)
+    readiness.start('sequence', sequence, requires=('slm', 'ahk'))
+    readiness.start('scan', scan, requires=('sequence',))
+    assert readiness.wait_all(timeout=5)
+    states = {name: d['state'] for name, d in readiness.snapshot().items()}
+    assert states == {'slm': FAILED, 'ahk': READY, 'sequence': FAILED, 'scan': FAILED}
+    assert sequence.calls == []
+
+    assert readiness.retry('slm') == ['slm', 'sequence', 'scan']
+    assert readiness.wait_all(timeout=5)
+    assert all(d['state'] == READY for d in readiness.snapshot().values())
+    assert (len(slm.calls), len(ahk.calls), len(sequence.calls), len(scan.calls)) == (2, 1, 1, 1)
+
+
+def test_retry_rejects_unknown_and_healthy_devices():
+    readiness = DeviceReadiness()
+    readiness.start('ahk', _flaky(0))
+    assert readiness.wait_settled('ahk', timeout=5)
+    with pytest.raises(KeyError):
+        readiness.retry('slm')
+    with pytest.raises(RuntimeError):
+        readiness.retry('ahk')
+
+
+def test_requires_waits_for_retry(monkeypatch):
+    readiness = DeviceReadiness()
+    monkeypatch.setattr('readiness.READINESS', readiness)
+    readiness.start('slm', _flaky(1))
+    assert readiness.wait_settled('slm', timeout=5)
+
+    @requires('slm')
+    def use():
+        return True
+
+    with pytest.raises(DeviceNotReady):
+        use()
+    readiness.retry('slm')
+    assert use() is True
+
+
+def test_retry_device_over_rpc():
+    srv = rls.start_background_server()
+    try:
+        with HardwareClient(port=srv.port) as c:
+            c.wait_ready(timeout=30)
+            rls.READINESS.set_failed('sequence', RuntimeError("unplugged"))
+            with pytest.raises(Exception, match="unplugged"):
+                c.sequence_is_playing()
+            assert c.retry_device('slm') is None
+            assert c.retry_device('sequence') == ('sequence',)
+            assert c.wait_ready(['sequence'], timeout=10)['sequence']['state'] == READY
+            assert c.sequence_is_playing() is False
+    finally:
+        srv.close()
+        rls.cleanup()
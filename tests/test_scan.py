@@ -0,0 +1,69 @@
+# tests/test_scan.py
+
+"""Scan spec validation and stopping all axes when one of them fails."""
+
+import pytest
+
+from scan import FAILED, ScanEngine, normalize_spec
+from thorlabs_stage import ThorlabsStage
+
+
+def test_frame_index_validation():
+    axes = [{'stage': 2, 'positions': [0.0, 0.1, 0.2]}]
+    assert normalize_spec({'axes': axes, 'frame_index': [2, 1, 0]})['frame_index'] == [2, 1, 0]
+    with pytest.raises(ValueError):
+        normalize_spec({'axes': axes, 'frame_index': [0, -1, 2]})
+    with pytest.raises(ValueError):
+        normalize_spec({'axes': axes, 'frame_index': [0, 1]})
+
+
+@pytest.fixture
+def stages():
+    stages = {stage_type: ThorlabsStage(stage_type=stage_type, simulate=True) for stage_type in (1, 2)}
+    for stage in stages.values():
+        stage.connect()
+    yield stages
+    for stage in stages.values():
+        stage.disconnect()
+
+
+def _assert_stopped_short(stage, target):
+    status = stage.status(max_age=0)
+    assert not status['moving']
+    assert status['position'] < target
+
+
+def test_timeout_stops_every_axis(stages):
+    engine = ScanEngine(None, stages, None)
+    status = engine.start({'axes': [{'stage': 1, 'positions': [5.0]}, {'stage': 2, 'positions': [6.0]}],
+                           'move_timeout_s': 0.1}, wait=True)
+    assert status['state'] == FAILED
+    _assert_stopped_short(stages[1], 5.0)
+    _assert_stopped_short(stages[2], 6.0)
+
+
+def test_failed_start_stops_started_axes(stages):
+    def refuse(*args):
+        raise RuntimeError("refused")
+    stages[1].device.MoveTo = refuse
+    engine = ScanEngine(None, stages, None)
+    # Stage 2 starts first, then stage 1 fails to start
+    status = engine.start({'axes': [{'stage': 2, 'positions': [5.0]}, {'stage': 1, 'positions': [5.0]}]},
+                          wait=True)
+    assert status['state'] == FAILED
+    assert stages[2].motion.cancelled()
+    _assert_stopped_short(stages[2], 5.0)
+
+
+def test_failed_upload_stops_axes(stages):
+    class Manager:
+        frame_banks = {'bank': [[0]]}
+
+        def upload(self, frame, verbose=True):
+            return False
+
+    engine = ScanEngine(Manager(), stages, None)
+    status = engine.start({'axes': [{'stage': 2, 'positions': [5.0]}], 'frames': 'bank'}, wait=True)
+    assert status['state'] == FAILED
+    assert status['error'] == "Frame upload failed"
+    _assert_stopped_short(stages[2], 5.0)
@@ -0,0 +1,112 @@
+# tests/test_sequence.py
+
+"""SequencePlayer storage budget and exclusion against the scan engine."""
+
+import numpy as np
+import pytest
+
+from scan import ScanEngine
+from sequence import SequencePlayer
+from thorlabs_stage import ThorlabsStage
+
+SHAPE = (8, 16)
+FRAME_BYTES = SHAPE[0] * SHAPE[1]
+
+
+class _Manager:
+    """SLMManager stand-in recording uploaded frames"""
+
+    def __init__(self):
+        self.frame_banks = {}
+        self.frames = []
+
+    def upload(self, frame, verbose=True):
+        self.frames.append(np.array(frame))
+        return True
+
+
+def _stack(n, value=0):
+    frames = np.full((n,) + SHAPE, value, np.uint8)
+    return frames.tobytes(), frames.shape, frames.dtype.str
+
+
+@pytest.fixture
+def player():
+    return SequencePlayer(_Manager(), {}, None, max_bytes=10 * FRAME_BYTES)
+
+
+def test_upload_within_budget(player):
+    first = player.upload(*_stack(4, 1))
+    second = player.upload(*_stack(4, 2))
+    assert player.stats() == {'sequences': 2, 'bytes': 8 * FRAME_BYTES,
+                              'max_bytes': 10 * FRAME_BYTES, 'evictions': 0}
+    assert player.upload(*_stack(4, 1)) == first
+    assert player.nbytes == 8 * FRAME_BYTES
+    assert player.delete(second)
+    assert not player.delete(second)
+    assert player.nbytes == 4 * FRAME_BYTES
+
+
+def test_upload_evicts_least_recently_used(player):
+    first = player.upload(*_stack(4, 1))
+    second = player.upload(*_stack(4, 2))
+    # Playing the first sequence makes the second the least recently used
+    player.play(first)
+    third = player.upload(*_stack(4, 3))
+    assert list(player.sequences) == [first, third]
+    assert player.nbytes == 8 * FRAME_BYTES
+    assert player.stats()['evictions'] == 1
+    with pytest.raises(KeyError):
+        player.play(second)
+
+
+def test_upload_larger_than_budget_rejected(player):
+    with pytest.raises(ValueError):
+        player.upload(*_stack(11))
+    assert player.nbytes == 0
+
+
+def test_playing_sequence_is_not_evicted(player):
+    playing = player.upload(*_stack(6, 1))
+    player.play(playing, dwell_s=0.5, wait=False)
+    try:
+        with pytest.raises(ValueError):
+            player.upload(*_stack(6, 2))
+        assert playing in player.sequences
+        other = player.upload(*_stack(4, 3))
+        assert list(player.sequences) == [playing, other]
+    finally:
+        player.stop()
+        player._thread.join()
+
+
+@pytest.fixture
+def stage():
+    stage = ThorlabsStage(stage_type=2, simulate=True)
+    stage.connect()
+    yield stage
+    stage.disconnect()
+
+
+def test_scan_and_sequence_exclude_each_other(stage):
+    player = SequencePlayer(_Manager(), {2: stage}, None)
+    engine = ScanEngine(player.slm_manager, {2: stage}, None, player)
+    sequence_id = player.upload(*_stack(3))
+
+    player.play(sequence_id, dwell_s=0.5, wait=False)
+    try:
+        with pytest.raises(RuntimeError, match="sequence"):
+            engine.start({'axes': [{'stage': 2, 'positions': [0.0, 0.1]}]})
+    finally:
+        player.stop()
+        player._thread.join()
+
+    engine.start({'axes': [{'stage': 2, 'positions': [0.0, 0.1, 0.2]}], 'dwell_s': 0.5})
+    try:
+        assert engine.is_running
+        with pytest.raises(RuntimeError, match="scan"):
+            player.play(sequence_id)
+    finally:
+        engine.stop()
+        engine._thread.join()
+    assert player.play(sequence_id)['completed'] == 3
@@ -0,0 +1,273 @@
+# tests/test_sim_hardware.py
+
+"""Simulated Blink SDK and Kinesis servo, and ThorlabsStage running on them."""
+
+import ctypes
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from events import BUS
+from sim_hardware import SimBlinkSDK, SimKCubeDCServo, SimMotionProfile
+from thorlabs_stage import ThorlabsStage
+
+# Fast kinematics so motions take tens of milliseconds
+VELOCITY = 10.0
+ACCELERATION = 100.0
+SETTLE_S = 0.01
+
+
+def _servo():
+    servo = SimKCubeDCServo('sim', velocity=VELOCITY, acceleration=ACCELERATION, settle_s=SETTLE_S)
+    servo.Connect('sim')
+    servo.EnableDevice()
+    return servo
+
+
+@pytest.fixture
+def stage():
+    stage = ThorlabsStage(stage_type=2, simulate=True)
+    stage.connect()
+    stage.device.velocity = VELOCITY
+    stage.device.acceleration = ACCELERATION
+    stage.device.settle_s = SETTLE_S
+    yield stage
+    stage.disconnect()
+
+
+# --- SimMotionProfile ---
+
+def test_trapezoidal_profile():
+    profile = SimMotionProfile(0.0, 2.0, velocity=1.0, acceleration=2.0, settle=0.1, t0=0.0)
+    # 0.5 s ramps covering 0.25 mm each, 1.5 mm cruise at 1 mm/s
+    assert profile.t_ramp == pytest.approx(0.5)
+    assert profile.t_cruise == pytest.approx(1.5)
+    assert profile.duration == pytest.approx(2.5)
+    assert profile.total == pytest.approx(2.6)
+    assert profile.position(-1.0) == 0.0
+    assert profile.position(0.5) == pytest.approx(0.25)
+    assert profile.position(1.0) == pytest.approx(0.75)
+    assert profile.position(2.25) == pytest.approx(2.0 - 0.0625)
+    assert profile.position(2.5) == 2.0
+    assert profile.position(10.0) == 2.0
+
+
+def test_triangular_profile_for_short_moves():
+    profile = SimMotionProfile(1.0, 0.5, velocity=1.0, acceleration=2.0, t0=0.0)
+    # Never reaches cruise velocity: two ramps of 0.25 mm
+    assert profile.t_cruise == 0.0
+    assert profile.t_ramp == pytest.approx(0.5)
+    assert profile.v_peak == pytest.approx(1.0)
+    assert profile.position(0.5) == pytest.approx(0.75)
+    assert profile.position(1.0) == 0.5
+
+
+def test_profile_is_monotonic():
+    profile = SimMotionProfile(3.0, -1.0, velocity=2.0, acceleration=5.0, t0=0.0)
+    positions = [profile.position(t) for t in np.linspace(0, profile.duration, 200)]
+    assert np.all(np.diff(positions) <= 1e-12)
+    assert positions[0] == pytest.approx(3.0)
+    assert positions[-1] == pytest.approx(-1.0)
+
+
+# --- SimKCubeDCServo ---
+
+def test_servo_requires_connection():
+    servo = SimKCubeDCServo('sim')
+    with pytest.raises(RuntimeError):
+        servo.MoveTo(1.0, 1000)
+
+
+def test_servo_blocking_move_timing():
+    servo = _servo()
+    profile = SimMotionProfile(0.0, 0.5, VELOCITY, ACCELERATION, SETTLE_S)
+    t0 = time.perf_counter()
+    servo.MoveTo(0.5, 10000)
+    elapsed = time.perf_counter() - t0
+    assert elapsed == pytest.approx(profile.total, abs=0.05)
+    assert servo.Position == 0.5
+    assert not servo.Status.IsMoving
+
+
+def test_servo_blocking_move_timeout():
+    servo = _servo()
+    with pytest.raises(TimeoutError):
+        servo.MoveTo(5.0, 50)
+    position = servo.Position
+    assert 0.0 < position < 5.0
+    assert not servo.Status.IsMoving
+
+
+def test_servo_callback_move():
+    servo = _servo()
+    done = threading.Event()
+    task_ids = []
+    task_id = servo.MoveTo(1.0, lambda tid: (task_ids.append(tid), done.set()))
+    assert servo.Status.IsMoving
+    assert 0.0 <= servo.Position < 1.0
+    assert done.wait(5)
+    assert task_ids == [task_id]
+    assert servo.Position == 1.0
+    assert not servo.Status.IsMoving
+
+
+def test_servo_stop_suppresses_callback():
+    servo = _servo()
+    called = []
+    servo.MoveTo(5.0, called.append)
+    time.sleep(0.05)
+    servo.StopImmediate()
+    position = servo.Position
+    time.sleep(0.1)
+    assert called == []
+    assert servo.Position == position
+    assert 0.0 < position < 5.0
+
+
+def test_servo_home():
+    servo = _servo()
+    servo.MoveTo(0.3, 10000)
+    assert not servo.Status.IsHomed
+    done = threading.Event()
+    servo.Home(lambda tid: done.set())
+    assert servo.Status.IsHoming
+    assert done.wait(5)
+    assert servo.Position == 0.0
+    assert servo.Status.IsHomed
+
+
+# --- SimBlinkSDK ---
+
+def _write(sdk, frame):
+    return sdk.Write_image(1, frame.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte)), frame.nbytes)
+
+
+def test_blink_write_latency():
+    sdk = SimBlinkSDK(width=64, height=32, write_overhead_s=0.02, dma_bytes_per_s=64 * 32 / 0.03)
+    frame = np.zeros((32, 64), np.uint8)
+    t0 = time.perf_counter()
+    assert _write(sdk, frame) == 0
+    assert time.perf_counter() - t0 >= 0.05
+    sdk.complete_latency_s = 0.02
+    t0 = time.perf_counter()
+    assert sdk.ImageWriteComplete(1, 1000) == 0
+    assert time.perf_counter() - t0 >= 0.02
+
+
+def test_blink_records_frames():
+    sdk = SimBlinkSDK(width=8, height=4, write_overhead_s=0.0, record=3)
+    assert sdk.last_frame is None
+    frames = [np.full((4, 8), i, np.uint8) for i in range(5)]
+    for frame in frames:
+        _write(sdk, frame)
+    assert sdk.writes == 5
+    assert len(sdk.frames) == 3
+    assert [data for _, data in sdk.frames] == [f.tobytes() for f in frames[2:]]
+    times = [t for t, _ in sdk.frames]
+    assert times == sorted(times)
+    np.testing.assert_array_equal(sdk.last_frame, frames[-1])
+    # The record is a copy: the caller may reuse its buffer
+    frames[-1][:] = 99
+    assert sdk.last_frame[0, 0] == 4
+
+
+def test_blink_sdk_queries():
+    sdk = SimBlinkSDK(width=16, height=8, depth=8)
+    boards, ok = ctypes.c_uint(0), ctypes.c_bool(False)
+    sdk.Create_SDK(ctypes.c_uint(8), ctypes.byref(boards), ctypes.byref(ok))
+    assert (boards.value, ok.value, sdk.sdk_open) == (1, True, True)
+    assert (sdk.Get_image_width(1), sdk.Get_image_height(1), sdk.Get_image_depth(1)) == (16, 8, 8)
+    assert sdk.Load_LUT_file(1, 'slm.lut') == 1
+    assert sdk.lut_path == 'slm.lut'
+    sdk.Delete_SDK()
+    assert not sdk.sdk_open
+
+
+# --- ThorlabsStage(simulate=True) ---
+
+def test_stage_move_to(stage):
+    subscription = BUS.subscribe(('stage.motion',))
+    try:
+        stage.move_to(0.4)
+        assert stage.get_position(max_age=0) == pytest.approx(0.4)
+        states = [e['state'] for e in subscription.take(1)]
+        assert states == ['started', 'done']
+    finally:
+        BUS.unsubscribe(subscription.id)
+
+
+def test_stage_move_to_timeout_fails(stage):
+    subscription = BUS.subscribe(('stage.motion',))
+    try:
+        stage.move_to(5.0, timeout_s=0.05)
+        position = stage.get_position(max_age=0)
+        assert 0.0 < position < 5.0
+        states = [e['state'] for e in subscription.take(1)]
+        assert states == ['started', 'failed']
+    finally:
+        BUS.unsubscribe(subscription.id)
+
+
+def test_stage_move_to_async(stage):
+    handle = stage.move_to_async(0.5)
+    assert not handle.done()
+    with pytest.raises(RuntimeError):
+        stage.move_to_async(1.0)
+    assert handle.wait(5)
+    assert handle.state == 'done'
+    assert handle.duration == pytest.approx(
+        SimMotionProfile(0.0, 0.5, VELOCITY, ACCELERATION, SETTLE_S).total, abs=0.05)
+    result = stage.motion_result()
+    assert result['done'] and not result['cancelled']
+    assert result['position'] == pytest.approx(0.5)
+
+
+def test_stage_move_to_async_cancel(stage):
+    handle = stage.move_to_async(5.0)
+    time.sleep(0.05)
+    assert stage.stop() is True
+    assert handle.done() and handle.cancelled()
+    assert 0.0 < stage.get_position(max_age=0) < 5.0
+
+
+def test_stage_move_to_async_timeout(stage):
+    handle = stage.move_to_async(5.0, timeout_s=0.05)
+    assert handle.wait(5)
+    assert handle.state == 'failed'
+    assert not stage.device.Status.IsMoving
+
+
+def test_stage_home_async(stage):
+    stage.move_to(0.2)
+    handle = stage.home_async()
+    assert handle.wait(5)
+    assert handle.state == 'done'
+    assert stage.status(max_age=0)['homed']
+
+
+def test_stage_status_concurrent_reads(stage):
+    handle = stage.move_to_async(1.0)
+    statuses, errors = [], []
+
+    def read():
+        try:
+            for _ in range(50):
+                statuses.append(stage.status(max_age=0))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert handle.wait(5)
+    assert errors == []
+    for status in statuses:
+        assert 0.0 <= status['position'] <= 1.0
+        assert status['age'] >= 0
+        # Velocities estimated from consecutive samples of one snapshot sequence
+        assert status['velocity'] >= -1e-9
+    final = stage.status(max_age=0)
+    assert final['position'] == pytest.approx(1.0)
+    assert not final['moving']
@@ -0,0 +1,53 @@
+# tests/test_slm_manager.py
+
+"""SLMManager.upload validates frames alike with and without an SLM."""
+
+import numpy as np
+import pytest
+
+from events import BUS
+from hardware import SLMManager
+
+SHAPE = (32, 48)
+
+
+@pytest.fixture(params=['sim_mode', 'simulate'])
+def manager(request):
+    if request.param == 'sim_mode':
+        return SLMManager(sim_mode=True, shape=SHAPE)
+    manager = SLMManager(simulate=True, shape=SHAPE, lut_path='sim.lut')
+    assert manager.is_connected
+    return manager
+
+
+def test_upload_matching_frame(manager):
+    frame = np.arange(np.prod(SHAPE), dtype=np.uint8).reshape(SHAPE)
+    assert manager.upload(frame) is True
+    np.testing.assert_array_equal(manager.display, frame)
+    assert manager.frames_written == 1
+
+
+@pytest.mark.parametrize('frame', [
+    np.zeros((SHAPE[0] - 1, SHAPE[1]), np.uint8),       # wrong shape
+    np.zeros(SHAPE, np.uint16),                         # wrong integer type
+    np.zeros(SHAPE, 'U1'),                              # not numeric
+])
+def test_upload_rejects_mismatch(manager, frame):
+    before = manager.display.copy()
+    subscription = BUS.subscribe(('slm.frame',))
+    try:
+        assert manager.upload(frame) is False
+        assert subscription.take(0.05) == []
+    finally:
+        BUS.unsubscribe(subscription.id)
+    assert manager.frames_written == 0
+    np.testing.assert_array_equal(manager.display, before)
+
+
+def test_upload_phase_frame(manager):
+    phase = np.full(SHAPE, np.pi)
+    assert manager.upload(phase) is True
+    gray = manager.display
+    assert gray.dtype == np.uint8
+    # Half a wave sits in the middle of the gray range
+    assert abs(int(gray[0, 0]) - 128) <= 1
@@ -1,7 +1,20 @@
 import sys
 import time
 import os
-import clr # pythonnet
+import logging
+import threading
+
+from events import BUS
+from executor import DeviceExecutor, serialized
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Kinesis 设备管理器 (DLL 加载, BuildDeviceList) 非线程安全, 并行连接多个设备时需串行化
+_kinesis_lock = threading.Lock()
+
+# 默认状态轮询间隔 (毫秒), 同时用于 Kinesis StartPolling 与状态缓存刷新
+DEFAULT_POLLING_MS = 250
 
 # 默认 Kinesis 安装路径
 KINESIS_PATH = r"C:\Program Files\Thorlabs\Kinesis"
@@ -10,20 +23,140 @@ KINESIS_PATH = r"C:\Program Files\Thorlabs\Kinesis"
 if KINESIS_PATH not in sys.path:
     sys.path.append(KINESIS_PATH)
 
+
+def timeout_ms(timeout=60000, timeout_s=None):
+    """
+    Kinesis 超时毫秒数
+    :param timeout: 毫秒 (原有接口)
+    :param timeout_s: 秒, 给出时优先
+    """
+    return int(timeout if timeout_s is None else timeout_s * 1000)
+
+
+class MotionHandle:
+    """
+    非阻塞运动 (move_to_async / home_async) 的完成句柄
+    由 Kinesis 完成回调置位，可用 done() 查询、wait() 等待、cancel() 急停
+    """
+
+    def __init__(self, stage, kind, target):
+        self.stage = stage
+        self.kind = kind            # 'move' 或 'home'
+        self.target = target
+        self.task_id = None
+        self.t_start = time.perf_counter()
+        self.t_done = None
+        self.state = None           # 结束后为 'done'、'cancelled' 或 'failed'
+        self._event = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def _on_kinesis_done(self, task_id=None):
+        """Kinesis 完成回调 (在 .NET 线程中调用)"""
+        self._complete('done')
+
+    def _complete(self, state):
+        """
+        结束句柄, 只有第一次调用生效 (急停后 Kinesis 回调可能仍会到达)
+        :param state: 'done'、'cancelled' 或 'failed'
+        :return: 本次调用是否结束了句柄
+        """
+        with self._callbacks_lock:
+            if self.state is not None:
+                return False
+            self.state = state
+            self.t_done = time.perf_counter()
+        if state == 'done':
+            REGISTRY.histogram(f"stage_{self.kind}_seconds").observe(self.t_done - self.t_start)
+        self.stage._refresh_status_quietly()
+        self.stage._publish_motion(self.kind, self.target, state, self.t_done - self.t_start)
+        with self._callbacks_lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn(self)
+        return True
+
+    def _expire(self, timeout_s):
+        """运动超时 (由定时器线程调用): 急停并以 'failed' 结束"""
+        if self.state is not None:
+            return
+        logger.error(f"{self.kind.capitalize()} of stage {self.stage.stage_type} "
+                     f"did not finish within {timeout_s} s, stopping.")
+        try:
+            self.stage.device.StopImmediate()
+        finally:
+            self._complete('failed')
+
+    def add_done_callback(self, fn):
+        """运动结束时调用 fn(handle); 若已结束则立即调用"""
+        with self._callbacks_lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def done(self):
+        """运动是否已结束 (完成、被取消或启动失败)"""
+        return self._event.is_set()
+
+    def cancelled(self):
+        return self.state == 'cancelled'
+
+    def wait(self, timeout=None):
+        """
+        等待运动结束
+        :param timeout: 最长等待秒数，None 为无限等待
+        :return: 结束返回 True，超时返回 False
+        """
+        return self._event.wait(timeout)
+
+    def cancel(self):
+        """
+        急停电机 (StopImmediate) 并结束句柄
+        :return: 若运动在取消前尚未完成返回 True
+        """
+        if self.state is not None:
+            return False
+        try:
+            self.stage.device.StopImmediate()
+        finally:
+            cancelled = self._complete('cancelled')
+        return cancelled
+
+    @property
+    def duration(self):
+        """运动耗时 (秒)，未结束时为 None"""
+        return None if self.t_done is None else self.t_done - self.t_start
+
+
 class ThorlabsStage:
     """
     Thorlabs KCube DC Servo 电机控制类
     支持 PRM1-Z8 (旋转) 和 Z825B (Z轴)
     """
 
-    def __init__(self, stage_type=2):
+    def __init__(self, stage_type=2, simulate=False, polling_ms=DEFAULT_POLLING_MS):
         """
         初始化控制器参数，但不立即连接硬件。
         :param stage_type: 1 = PRM1-Z8 (Rotation), 2 = Z825B (Z-Axis)
+        :param simulate: 使用 sim_hardware 中的模拟 Kinesis 设备 (无需硬件/pythonnet)
+        :param polling_ms: 状态轮询间隔 (毫秒)
         """
         self.stage_type = stage_type
+        self.simulate = simulate
+        self.polling_ms = polling_ms
         self.device = None
         self.is_connected = False
+        self.motion = None          # 最近一次非阻塞运动的 MotionHandle
+        # 状态缓存 (由轮询线程与运动完成回调更新), get_position/status 直接从内存读取
+        # 快照为 (status dict, 更新时刻 perf_counter), 整体替换, 读取方无需加锁
+        self._snapshot = None
+        self._status_lock = threading.Lock()    # 串行化设备读取与快照替换
+        self._poll_stop = threading.Event()
+        # 设备命令 (连接/运动) 在该执行器的线程中串行执行; get_position/stop 不排队
+        self.executor = DeviceExecutor(f"stage_{stage_type}")
+        self.enable_settle_s = 0 if simulate else 1
         
         # 根据类型设置序列号和配置名称
         if stage_type == 1:
@@ -40,32 +173,51 @@ class ThorlabsStage:
 
     def _load_dlls(self):
         """加载 Thorlabs .NET DLLs (内部方法)"""
+        if self.simulate:
+            from sim_hardware import SimKinesis
+            self.DeviceManagerCLI = SimKinesis.DeviceManagerCLI
+            self.DeviceSettingsSectionBase = SimKinesis.DeviceSettingsSectionBase
+            self.KCubeDCServo = SimKinesis.KCubeDCServo
+            self.KCubeMotor = SimKinesis.KCubeMotor
+            self.Decimal = SimKinesis.Decimal
+            self.to_float = float
+            self.Action = SimKinesis.Action
+            return
+
         try:
-            clr.AddReference("Thorlabs.MotionControl.DeviceManagerCLI")
-            clr.AddReference("Thorlabs.MotionControl.GenericMotorCLI")
-            clr.AddReference("Thorlabs.MotionControl.KCube.DCServoCLI")
+            with _kinesis_lock:
+                import clr  # pythonnet, 仅在连接真实硬件时需要
+                clr.AddReference("Thorlabs.MotionControl.DeviceManagerCLI")
+                clr.AddReference("Thorlabs.MotionControl.GenericMotorCLI")
+                clr.AddReference("Thorlabs.MotionControl.KCube.DCServoCLI")
             
-            # 导入命名空间
-            from Thorlabs.MotionControl.DeviceManagerCLI import DeviceManagerCLI
-            from Thorlabs.MotionControl.DeviceManagerCLI import DeviceSettingsSectionBase
-            from Thorlabs.MotionControl.KCube.DCServoCLI import KCubeDCServo
-            from Thorlabs.MotionControl.GenericMotorCLI import KCubeMotor
+                # 导入命名空间
+                from Thorlabs.MotionControl.DeviceManagerCLI import DeviceManagerCLI
+                from Thorlabs.MotionControl.DeviceManagerCLI import DeviceSettingsSectionBase
+                from Thorlabs.MotionControl.KCube.DCServoCLI import KCubeDCServo
+                from Thorlabs.MotionControl.GenericMotorCLI import KCubeMotor
+                from System import Action, Decimal, UInt64
             
-            # 保存引用以便类中其他方法使用
-            self.DeviceManagerCLI = DeviceManagerCLI
-            self.DeviceSettingsSectionBase = DeviceSettingsSectionBase
-            self.KCubeDCServo = KCubeDCServo
-            self.KCubeMotor = KCubeMotor
+                # 保存引用以便类中其他方法使用
+                self.DeviceManagerCLI = DeviceManagerCLI
+                self.DeviceSettingsSectionBase = DeviceSettingsSectionBase
+                self.KCubeDCServo = KCubeDCServo
+                self.KCubeMotor = KCubeMotor
+                self.Decimal = Decimal
+                self.to_float = Decimal.ToDouble    # .NET Decimal 转 Python float, 无需经过字符串
+                self.Action = Action[UInt64]    # Kinesis 完成回调类型
             
         except Exception as e:
             raise RuntimeError(f"DLL Load Error: {e}. Check Kinesis installation.")
 
+    @serialized()
     def connect(self):
         """连接设备并应用设置"""
-        print(f"Connecting to {self.settings_name} ({self.serial_no})...")
+        logger.info(f"Connecting to {self.settings_name} ({self.serial_no})...")
         
         # 建立设备列表
-        self.DeviceManagerCLI.BuildDeviceList()
+        with _kinesis_lock:
+            self.DeviceManagerCLI.BuildDeviceList()
         
         try:
             # 创建并连接设备
@@ -76,12 +228,12 @@ class ThorlabsStage:
             if not self.device.IsSettingsInitialized():
                 self.device.WaitForSettingsInitialized(5000)
             
-            self.device.StartPolling(250)
+            self.device.StartPolling(self.polling_ms)
             self.device.EnableDevice()
-            time.sleep(1) # 等待使能稳定
+            time.sleep(self.enable_settle_s) # 等待使能稳定
 
             # 加载电机配置 (LoadMotorConfiguration)
-            print("Loading motor configuration...")
+            logger.info("Loading motor configuration...")
             motor_config = self.device.LoadMotorConfiguration(self.serial_no)
             
             # 设置加载选项为 UseFileSettings (对应 MATLAB optionTypeEnums.Get(1))
@@ -94,64 +246,243 @@ class ThorlabsStage:
             self.device.SetSettings(factory.GetSettings(motor_config), True, False)
             
             self.is_connected = True
-            print("Device connected and settings loaded.")
+            self._start_status_poller()
+            logger.info("Device connected and settings loaded.")
             
         except Exception as e:
             self.is_connected = False
-            print(f"Connection failed: {e}")
+            logger.error(f"Connection failed: {e}")
             raise
 
-    def home(self, timeout=60000):
-        """执行回零操作"""
+    @serialized()
+    def home(self, timeout=60000, timeout_s=None):
+        """
+        执行回零操作
+        :param timeout: 超时毫秒数 (Kinesis 原生单位)
+        :param timeout_s: 超时秒数, 给出时代替 timeout
+        """
         if not self.is_connected:
             raise ConnectionError("Device not connected.")
         
-        print("Homing stage...")
+        logger.info("Homing stage...")
+        self._publish_motion('home', None, 'started')
+        t0 = time.perf_counter()
+        state = 'done'
         try:
-            self.device.Home(timeout)
-            print("Homing complete.")
+            with REGISTRY.timer("stage_home_seconds", "Kinesis Home"):
+                self.device.Home(timeout_ms(timeout, timeout_s))
+            logger.info("Homing complete.")
         except Exception as e:
-            print(f"Homing failed: {e}")
+            state = 'failed'
+            logger.error(f"Homing failed: {e}")
+        self._refresh_status_quietly()
+        self._publish_motion('home', None, state, time.perf_counter() - t0)
 
-    def get_position(self):
-        """获取当前位置 (返回 float)"""
+    def _read_status(self):
+        """
+        从设备读取位置与状态并替换缓存快照 (调用 .NET)
+        Position 读取的是 Kinesis 按 polling_ms 轮询得到的缓存值, 不产生 USB 通信
+        """
+        with self._status_lock:
+            t = time.perf_counter()
+            position = self.to_float(self.device.Position)
+            device_status = self.device.Status
+            velocity = getattr(device_status, 'Velocity', None)
+            previous = self._snapshot
+            if velocity is not None:
+                velocity = self.to_float(velocity)
+            elif previous is not None and t > previous[1]:
+                # 设备未提供速度时由相邻两次采样估计
+                velocity = (position - previous[0]['position']) / (t - previous[1])
+            else:
+                velocity = 0.0
+            homed = getattr(device_status, 'IsHomed', None)
+            status = {
+                'position': position,
+                'moving': bool(device_status.IsMoving),
+                'homing': bool(getattr(device_status, 'IsHoming', False)),
+                'homed': None if homed is None else bool(homed),
+                'velocity': velocity,
+                'timestamp': time.time(),
+            }
+            self._snapshot = (status, t)
+        # 仅在位置或状态变化时发布事件
+        if previous is None or any(previous[0][k] != status[k]
+                                   for k in ('position', 'moving', 'homing', 'homed')):
+            BUS.publish('stage.position', source=f"stage_{self.stage_type}", coalesce=True, **status)
+        return status
+
+    def _publish_motion(self, kind, target, state, duration=None):
+        """发布运动事件: state 为 started / done / cancelled / failed"""
+        BUS.publish('stage.motion', source=f"stage_{self.stage_type}", kind=kind, target=target,
+                    state=state, duration=duration,
+                    position=None if self._snapshot is None else self._snapshot[0]['position'])
+
+    def _refresh_status_quietly(self):
+        """运动完成等事件触发的状态刷新, 失败时仅记录"""
+        if self.is_connected and self.device is not None:
+            try:
+                self._read_status()
+            except Exception as e:
+                logger.debug(f"Status refresh failed: {e}")
+
+    def _start_status_poller(self):
+        self._poll_stop.clear()
+        self._read_status()
+        threading.Thread(target=self._poll_status, name=f"stage-{self.stage_type}-status",
+                         daemon=True).start()
+
+    def _poll_status(self):
+        """按 polling_ms 周期刷新状态缓存, 直到断开连接"""
+        stop = self._poll_stop
+        while not stop.wait(self.polling_ms / 1000):
+            self._refresh_status_quietly()
+
+    def status(self, max_age=None):
+        """
+        获取缓存的状态 (不调用 .NET, 除非缓存过旧)
+        :param max_age: 缓存最长允许年龄 (秒), None 表示总是使用缓存
+        :return: dict: position, moving, homing, homed, velocity, timestamp, age; 未连接时为 None
+        """
         if not self.is_connected:
             return None
-        # .NET Decimal 转 Python float
-        return float(str(self.device.Position))
+        snapshot = self._snapshot
+        if snapshot is None or (max_age is not None and time.perf_counter() - snapshot[1] > max_age):
+            self._read_status()
+            snapshot = self._snapshot
+        status, t = snapshot
+        return dict(status, age=time.perf_counter() - t)
 
-    def move_to(self, position, timeout=60000):
+    def set_polling_interval(self, polling_ms):
+        """修改状态轮询间隔 (毫秒); 已连接时同时重启 Kinesis 轮询"""
+        polling_ms = int(polling_ms)
+        if polling_ms <= 0:
+            raise ValueError("polling_ms must be positive")
+        self.polling_ms = polling_ms
+        if self.is_connected:
+            self.device.StopPolling()
+            self.device.StartPolling(polling_ms)
+
+    def get_position(self, max_age=None):
+        """获取当前位置 (返回 float), 默认来自状态缓存; max_age=0 强制读取设备"""
+        status = self.status(max_age)
+        return None if status is None else status['position']
+
+    @serialized()
+    def move_to(self, position, timeout=60000, timeout_s=None):
         """
         移动到绝对位置
         :param position: 目标位置 (度或毫米)
+        :param timeout: 超时毫秒数 (Kinesis 原生单位)
+        :param timeout_s: 超时秒数, 给出时代替 timeout
         """
         if not self.is_connected:
             raise ConnectionError("Device not connected.")
             
-        print(f"Moving to {position}...")
+        logger.debug(f"Moving to {position}...")
+        self._publish_motion('move', float(position), 'started')
+        t0 = time.perf_counter()
+        state = 'done'
         # 注意：MoveTo 需要 Decimal 类型，但 pythonnet通常能自动处理 float
         try:
-            from System import Decimal
-            target = Decimal(position)
-            self.device.MoveTo(target, timeout)
-            print(f"Moved to {position}.")
+            target = self.Decimal(position)
+            with REGISTRY.timer("stage_move_seconds", "Kinesis MoveTo"):
+                self.device.MoveTo(target, timeout_ms(timeout, timeout_s))
+            logger.debug(f"Moved to {position}.")
         except Exception as e:
-            print(f"Move failed: {e}")
+            state = 'failed'
+            logger.error(f"Move failed: {e}")
+        self._refresh_status_quietly()
+        self._publish_motion('move', float(position), state, time.perf_counter() - t0)
 
+    def _start_motion(self, kind, target, start, timeout_s=None):
+        """
+        启动非阻塞运动，start(callback) 向 Kinesis 发出带完成回调的命令
+        :param timeout_s: 超时秒数, 超时后急停并以 'failed' 结束; None 不限时
+        """
+        if not self.is_connected:
+            raise ConnectionError("Device not connected.")
+        if self.motion is not None and not self.motion.done():
+            raise RuntimeError(f"Stage {self.stage_type} is still executing a {self.motion.kind}")
+
+        handle = MotionHandle(self, kind, target)
+        self.motion = handle
+        self._publish_motion(kind, target, 'started')
+        try:
+            handle.task_id = start(self.Action(handle._on_kinesis_done))
+        except Exception:
+            handle._complete('failed')
+            raise
+        if timeout_s is not None:
+            timer = threading.Timer(timeout_s, handle._expire, args=(timeout_s,))
+            timer.daemon = True
+            timer.start()
+            handle.add_done_callback(lambda h: timer.cancel())
+        return handle
+
+    @serialized()
+    def move_to_async(self, position, timeout_s=None):
+        """
+        非阻塞移动到绝对位置，立即返回
+        :param position: 目标位置 (度或毫米)
+        :param timeout_s: 超时秒数, 超时后急停; None 不限时
+        :return: MotionHandle
+        """
+        position = float(position)
+        target = self.Decimal(position)
+        return self._start_motion('move', position, lambda callback: self.device.MoveTo(target, callback),
+                                  timeout_s)
+
+    @serialized()
+    def home_async(self, timeout_s=None):
+        """
+        非阻塞回零，立即返回
+        :param timeout_s: 超时秒数, 超时后急停; None 不限时
+        :return: MotionHandle
+        """
+        return self._start_motion('home', None, lambda callback: self.device.Home(callback), timeout_s)
+
+    def stop(self):
+        """急停当前运动并丢弃排队中的命令，返回是否确有运动被取消 (不经过执行器队列)"""
+        self.executor.cancel_pending()
+        if self.motion is not None and self.motion.cancel():
+            return True
+        if self.is_connected:
+            self.device.StopImmediate()
+        return False
+
+    @serialized()
     def disconnect(self):
         """断开连接并停止轮询"""
         if self.device and self.is_connected:
-            print(f"Disconnecting {self.serial_no}...")
+            logger.info(f"Disconnecting {self.serial_no}...")
+            self._poll_stop.set()
             try:
                 self.device.StopPolling()
                 self.device.Disconnect()
             except Exception as e:
-                print(f"Error during disconnect: {e}")
+                logger.error(f"Error during disconnect: {e}")
             finally:
                 self.is_connected = False
                 self.device = None
         else:
-            print("Device already disconnected or never connected.")
+            logger.warning("Device already disconnected or never connected.")
+
+    def motion_result(self, handle=None):
+        """
+        运动结果摘要
+        :param handle: MotionHandle, 默认为最近一次运动
+        :return: dict: target, done, state, cancelled, duration (秒), position
+        """
+        handle = self.motion if handle is None else handle
+        return {
+            'target': None if handle is None else handle.target,
+            'done': handle is None or handle.done(),
+            'state': None if handle is None else handle.state,
+            'cancelled': handle is not None and handle.cancelled(),
+            'duration': None if handle is None else handle.duration,
+            'position': self.get_position(),
+        }
 
     # --- 上下文管理器支持 (Context Manager) ---
     # 这允许你使用 'with' 语句，自动处理关闭
@@ -160,4 +491,51 @@ class ThorlabsStage:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.disconnect()
\ No newline at end of file
+        self.disconnect()
+
+def move_many(stages, targets, timeout_s=None, wait='all', timeout=None):
+    """
+    多轴协同移动: 同时启动各轴运动, 统一等待全部 (或任一) 结束
+    :param stages: dict: 轴号 -> 已连接的 ThorlabsStage
+    :param targets: dict: 轴号 -> 目标位置 (度或毫米)
+    :param timeout_s: 最长等待秒数, None 为无限等待; 超时不会停止运动
+    :param wait: 'all' 等待全部轴, 'any' 任一轴结束即返回
+    :param timeout: timeout_s 的旧名 (秒)
+    :return: dict: completed (是否在超时前满足等待条件), elapsed (秒), axes (轴号 -> motion_result)
+    """
+    if timeout_s is None:
+        timeout_s = timeout
+    if wait not in ('all', 'any'):
+        raise ValueError(f"wait must be 'all' or 'any', got {wait!r}")
+    targets = {axis: float(position) for axis, position in dict(targets).items()}
+    for axis in targets:
+        stage = stages.get(axis)
+        if stage is None or not stage.is_connected:
+            raise ConnectionError(f"Stage {axis} not connected.")
+
+    t0 = time.perf_counter()
+    finished = threading.Semaphore(0)
+    handles = {}
+    try:
+        for axis, position in targets.items():
+            handles[axis] = stages[axis].move_to_async(position)
+            handles[axis].add_done_callback(lambda handle: finished.release())
+    except Exception:
+        # 部分轴启动失败时急停已启动的轴, 避免只走一半
+        for handle in handles.values():
+            handle.cancel()
+        raise
+
+    needed = len(handles) if wait == 'all' else min(len(handles), 1)
+    deadline = None if timeout_s is None else t0 + timeout_s
+    completed = True
+    for _ in range(needed):
+        remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+        if not finished.acquire(timeout=remaining):
+            completed = False
+            break
+    return {
+        'completed': completed,
+        'elapsed': time.perf_counter() - t0,
+        'axes': {axis: stages[axis].motion_result(handle) for axis, handle in handles.items()},
+    }
@@ -0,0 +1,152 @@
+# trigger.py
+
+"""
+Server-side display-then-trigger: show a frame, wait until the SLM has written
+it and settled, then fire a camera trigger from the same thread.
+
+Doing this on the server removes the network round trip between "frame shown"
+and "take the exposure", and lets the settle wait be timed precisely: the bulk
+of it is slept and the last SPIN_MARGIN_S are busy-waited on perf_counter.
+
+Triggers are small objects with a ``fire()`` method:
+
+    NoTrigger         only timestamps, for measuring display latency
+    ClickTrigger      mouse click through AHKManager (e.g. a GUI "snap" button)
+    CallbackTrigger   any Python callable (TTL line, camera SDK, ...)
+
+make_trigger() builds one from a spec that can be sent over rpyc:
+None / 'none', or ('click', x, y).
+"""
+
+import time
+
+from metrics import REGISTRY
+
+# Final part of a settle wait that is busy-waited instead of slept
+SPIN_MARGIN_S = 2e-3
+
+
+def wait_until(deadline):
+    """Sleep until shortly before ``deadline`` (perf_counter seconds), then spin"""
+    remaining = deadline - time.perf_counter()
+    if remaining > SPIN_MARGIN_S:
+        time.sleep(remaining - SPIN_MARGIN_S)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class Trigger:
+    """Base class of the trigger backends"""
+
+    name = None
+
+    def fire(self):
+        """Fire the trigger. Raises on failure."""
+        raise NotImplementedError
+
+
+class NoTrigger(Trigger):
+    name = 'none'
+
+    def fire(self):
+        pass
+
+
+class ClickTrigger(Trigger):
+    """Clicks at a fixed screen position through the AHK manager's input driver"""
+
+    name = 'click'
+
+    def __init__(self, ahk_manager, x, y):
+        self.ahk_manager = ahk_manager
+        self.x = int(x)
+        self.y = int(y)
+
+    def fire(self):
+        if not self.ahk_manager.click_at(self.x, self.y):
+            raise RuntimeError(f"Trigger click at ({self.x}, {self.y}) failed")
+
+
+class CallbackTrigger(Trigger):
+    """Calls ``fn()`` to fire, for custom hardware triggers"""
+
+    name = 'callback'
+
+    def __init__(self, fn, name=None):
+        self.fn = fn
+        if name is not None:
+            self.name = name
+
+    def fire(self):
+        self.fn()
+
+
+def make_trigger(spec, ahk_manager=None):
+    """
+    Build a trigger from a spec.
+
+    Args:
+        spec: None or 'none', ('click', x, y), or a Trigger instance
+        ahk_manager: AHKManager used by click triggers
+
+    Returns:
+        Trigger
+
+    Raises:
+        ValueError: For unknown specs
+    """
+    if isinstance(spec, Trigger):
+        return spec
+    if spec is None or spec == 'none':
+        return NoTrigger()
+    spec = tuple(spec)
+    if spec[0] == 'click' and len(spec) == 3:
+        if ahk_manager is None:
+            raise ValueError("Click triggers need an AHK manager")
+        return ClickTrigger(ahk_manager, spec[1], spec[2])
+    raise ValueError(f"Unknown trigger spec {spec!r}, expected None, 'none' or ('click', x, y)")
+
+
+def display_then_trigger(slm_manager, show, trigger, settle_s=None):
+    """
+    Display a frame, wait for the write to complete plus the settle time, fire.
+
+    Args:
+        slm_manager: SLMManager displaying the frame
+        show: Callable uploading the frame, returns False on failure
+        trigger: Trigger to fire
+        settle_s: Settle time after write completion, defaults to the SLM's
+            settle_time_s
+
+    Returns:
+        dict: Timings in seconds: upload_s (until ImageWriteComplete), settle_s,
+        delay_s (write complete to trigger), jitter_s (delay_s - settle_s),
+        trigger_s (duration of fire()), total_s
+
+    Raises:
+        RuntimeError: If the upload fails (the trigger is not fired)
+    """
+    settle_s = slm_manager.settle_time_s if settle_s is None else float(settle_s)
+    t0 = time.perf_counter()
+    if not show():
+        raise RuntimeError("Frame upload failed, trigger not fired")
+    # With synchronous writes upload() already returned after ImageWriteComplete
+    slm_manager.flush()
+    t_written = time.perf_counter()
+
+    wait_until(t_written + settle_s)
+    t_fire = time.perf_counter()
+    trigger.fire()
+    t_done = time.perf_counter()
+
+    jitter_s = t_fire - t_written - settle_s
+    REGISTRY.histogram("trigger_jitter_seconds", "Display-to-trigger delay beyond the settle time").observe(jitter_s)
+    return {
+        'trigger': trigger.name,
+        'upload_s': t_written - t0,
+        'settle_s': settle_s,
+        'delay_s': t_fire - t_written,
+        'jitter_s': jitter_s,
+        'trigger_s': t_done - t_fire,
+        'total_s': t_done - t0,
+    }